@@ -2,20 +2,50 @@
 
 import os
 import os.path
+import contextlib
+import errno
 from operator import itemgetter
 
 import yaml
 from slugify import slugify
 
-from config import Team, Themes
+from jicagile.config import Team, Themes
+from jicagile.storage import DirectoryStorage, move_destination, task_fpaths
+from jicagile.layout import task_directory
+from jicagile.locking import ProjectLocks
+from jicagile.profiling import phase
+from jicagile.metrics import increment
 
 __version__ = "0.4.0"
 
+#: Number of slugs remembered by :func:`slug`.
+SLUG_CACHE_SIZE = 100000
+
+_slugs = {}
+
+
+def slug(title):
+    """Return the slug of a title, as used in task file names.
+
+    Slugs are remembered, as transliterating titles is slow.
+    """
+    try:
+        return _slugs[title]
+    except KeyError:
+        pass
+    if len(_slugs) >= SLUG_CACHE_SIZE:
+        _slugs.clear()
+    increment("slugs_computed")
+    value = slugify(title)
+    _slugs[title] = value
+    return value
+
 
 class Task(dict):
     """Task."""
 
-    def __init__(self, title, storypoints, primary_contact=None, theme=None):
+    def __init__(self, title, storypoints, primary_contact=None, theme=None,
+                 id=None):
         self["title"] = title
         self["storypoints"] = storypoints
         self["primary_contact"] = primary_contact
@@ -23,17 +53,23 @@ class Task(dict):
             self["theme"] = theme
         else:
             self["theme"] = ""
+        if id is not None:
+            self["id"] = str(id)
 
     @staticmethod
     def from_file(fpath):
         """Return a task read in from file."""
-        data = yaml.load(file(fpath))
+        with open(fpath) as fh:
+            text = fh.read()
+        increment("files_parsed")
+        increment("bytes_read", len(text))
+        data = yaml.load(text, Loader=yaml.Loader)
         return Task(**data)
 
     @property
     def fname(self):
         """Return the task file name."""
-        return "{}.yml".format(slugify(self["title"]))
+        return "{}.yml".format(slug(self["title"]))
 
     def fpath(self, directory):
         """Return the task file path."""
@@ -44,15 +80,32 @@ class TaskCollection(list):
     """Class for storing a collection of tasks."""
 
     @classmethod
-    def from_directory(cls, directory):
+    def from_directory(cls, directory, max_workers=1):
+        """Return the tasks in a directory.
+
+        With max_workers above one the files are read concurrently.
+        """
         task_collection = cls()
-        fpaths = [os.path.join(directory, fn)
-                  for fn in os.listdir(directory)
-                  if fn.endswith(".yml") or fn.endswith(".yaml")]
-        for fp in fpaths:
-            task_collection.append(Task.from_file(fp))
+        with phase("tasks.scan"):
+            fpaths = task_fpaths(directory)
+        with phase("tasks.parse", items=len(fpaths)):
+            if max_workers > 1:
+                from jicagile.loading import read_tasks
+                task_collection.extend(read_tasks(fpaths, max_workers))
+            else:
+                for fp in fpaths:
+                    task_collection.append(Task.from_file(fp))
         return task_collection
 
+    @classmethod
+    def afrom_directory(cls, directory, executor=None, loop=None):
+        """Return asyncio future of the tasks in a directory.
+
+        The files are listed, read and parsed in the executor.
+        """
+        from jicagile.loading import afrom_directory
+        return afrom_directory(directory, executor, loop, cls)
+
     @property
     def primary_contacts(self):
         """Return set of primary contacts."""
@@ -76,27 +129,77 @@ class TaskCollection(list):
 class Project(object):
     """Agile project management class."""
 
-    def __init__(self, directory, team_fpath=".team.yml", themes_fpath=".themes.yml"):
-        self.team = Team()
-        if os.path.isfile(team_fpath):
-            self.team = Team.from_file(team_fpath)
-        self.themes = Themes()
-        if os.path.isfile(themes_fpath):
-            self.themes = Themes.from_file(themes_fpath)
+    def __init__(self, directory, team_fpath=".team.yml", themes_fpath=".themes.yml",
+                 storage=None):
+        if storage is None:
+            storage = DirectoryStorage(team_fpath, themes_fpath)
+        self.storage = storage
+        self._catalog = None
+        self.reload_config()
 
         self.directory = directory
-        if not os.path.isdir(self.backlog_directory):
-            os.mkdir(self.backlog_directory)
-        if not os.path.isdir(self.current_sprint_directory):
-            os.mkdir(self.current_sprint_directory)
-        if not os.path.isdir(self.current_todo_directory):
-            os.mkdir(self.current_todo_directory)
-        if not os.path.isdir(self.current_done_directory):
-            os.mkdir(self.current_done_directory)
+        self.locks = ProjectLocks(directory if storage.persistent else None)
+        with phase("project.directories"):
+            storage.makedirs(self.backlog_directory)
+            storage.makedirs(self.current_sprint_directory)
+            storage.makedirs(self.current_todo_directory)
+            storage.makedirs(self.current_done_directory)
 
     def __eq__(self, other):
         return self.directory == other.directory
 
+    def reload_config(self):
+        """Read the team and themes from the storage."""
+        with phase("project.config"):
+            self.team = self.storage.read_team()
+            self.themes = self.storage.read_themes()
+
+    @property
+    def catalog(self):
+        """Return the :class:`jicagile.catalog.Catalog` of the tasks by ID.
+
+        It is built from the tasks the first time it is needed.
+        """
+        if self._catalog is None:
+            from jicagile.catalog import Catalog
+            catalog = Catalog.open(self.directory, self.storage)
+            if catalog.needs_build:
+                with phase("catalog.build"):
+                    catalog.build(self.storage, self.directory)
+            self._catalog = catalog
+        return self._catalog
+
+    def clashing_fpath(self, fpath):
+        """Return the path to a task with the same file name as fpath.
+
+        Only tasks in the backlog and the current sprint are considered.
+        Returns None if there is no such task.
+        """
+        if self.storage.exists(fpath):
+            return fpath
+        from jicagile.catalog import task_name
+        states = [os.path.normpath(d) for d in (self.backlog_directory,
+                                                self.current_todo_directory,
+                                                self.current_done_directory)]
+        for other in self.catalog.named(task_name(fpath)):
+            if task_directory(other) not in states:
+                continue
+            if self.storage.exists(other):
+                return other
+            # Removed without agl.
+            self.catalog.remove(other)
+        return None
+
+    def task_fpath(self, task_id):
+        """Return the path to the task with the ID or None if there is none."""
+        fpath = self.catalog.fpath_of(task_id)
+        if fpath is not None and not self.storage.exists(fpath):
+            # Moved without agl, e.g. by hand or by a git pull.
+            with phase("catalog.build"):
+                self.catalog.build(self.storage, self.directory)
+            fpath = self.catalog.fpath_of(task_id)
+        return fpath
+
     @property
     def backlog_directory(self):
         """Return the path to the backlog directory."""
@@ -125,15 +228,25 @@ class Project(object):
                  current=False):
         """Add a task to the backlog.
 
+        The task is given a new ID. Raises IOError if there already is a
+        task with the same file name in the backlog or current sprint.
+
         :returns: :class:`jicagile.Task` and fpath
         """
-        task = Task(title, storypoints, primary_contact=primary_contact, theme=theme)
+        task = Task(title, storypoints, primary_contact=primary_contact, theme=theme,
+                    id=self.catalog.new_id())
         directory = self.backlog_directory
         if current:
             directory = self.current_todo_directory
-        fpath = task.fpath(directory)
-        with open(fpath, "w") as fh:
-            yaml.dump(task, fh, explicit_start=True, default_flow_style=False)
+        fpath = self.storage.layout.fpath(directory, task.fname)
+        with self.locks.writing(fpath):
+            clash = self.clashing_fpath(fpath)
+            if clash is not None:
+                raise(IOError(errno.EEXIST, "Task with the same file name exists",
+                              clash))
+            with phase("project.write"):
+                self.storage.write_task(task, fpath)
+            self.catalog.add(task["id"], fpath)
         return task, fpath
 
     def edit_task(self,
@@ -144,24 +257,138 @@ class Project(object):
                   theme=None):
         """Edit an exiting task.
 
-        If the title is changed the fpath returned is the suggested new name of
-        the file. However, the changes are made to the old file name and it is
-        up to the caller to make the change to the file name.
+        The task keeps its file name, and ID, when the title is changed.
+        The file is only written if a value has changed.
 
         :returns: :class:`jicagile.Task` and fpath
         """
-        task = Task.from_file(fpath)
-        new_fpath = fpath
-        if title is not None:
-            task["title"] = title
-            directory = os.path.dirname(fpath)
-            new_fpath = task.fpath(directory)
-        if storypoints is not None:
-            task["storypoints"] = storypoints
-        if primary_contact is not None:
-            task["primary_contact"] = primary_contact
-        if theme is not None:
-            task["theme"] = theme
-        with open(fpath, "w") as fh:
-            yaml.dump(task, fh, explicit_start=True, default_flow_style=False)
-        return task, new_fpath
+        task, changed = self.update_task(fpath,
+                                         title=title,
+                                         storypoints=storypoints,
+                                         primary_contact=primary_contact,
+                                         theme=theme)
+        return task, fpath
+
+    def update_task(self, fpath, **values):
+        """Set the values of a task, ignoring those that are None.
+
+        The task is only written if a value differs from the stored one, in
+        which case the lines holding the other values are left as they are.
+        Tasks without an ID are given one when they are written.
+
+        :returns: :class:`jicagile.Task` and sorted list of the keys changed
+        """
+        with self.locks.writing(fpath):
+            return self._update_task(fpath, values)
+
+    def _update_task(self, fpath, values):
+        with phase("project.read"):
+            task = self.storage.read_task(fpath)
+        changed = sorted(key for key, value in values.items()
+                         if value is not None and task.get(key) != value)
+        if not changed:
+            return task, changed
+        for key in changed:
+            task[key] = values[key]
+        if "id" not in task:
+            task["id"] = self.catalog.new_id()
+            self.catalog.add(task["id"], fpath)
+            changed.append("id")
+        with phase("project.write"):
+            self.storage.write_task(task, fpath, changed)
+        return task, changed
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        with phase("project.tasks"), self.locks.reading():
+            return self.storage.tasks(directory)
+
+    @classmethod
+    def aopen(cls, *args, **kwargs):
+        """Return asyncio future of a project created in an executor.
+
+        Takes the arguments of :class:`Project` and optionally the
+        executor and loop to use.
+        """
+        from jicagile.loading import aopen_project
+        executor = kwargs.pop("executor", None)
+        loop = kwargs.pop("loop", None)
+        return aopen_project(args, kwargs, executor, loop)
+
+    def atasks(self, directory, executor=None, loop=None):
+        """Return asyncio future of the tasks in a directory."""
+        from jicagile.loading import aproject_tasks
+        return aproject_tasks(self, directory, executor, loop)
+
+    def move_task(self, src, dest):
+        """Move a task, or a directory of tasks, to a new location."""
+        if self.storage.is_directory(src):
+            lock = self.locks.exclusive()
+        else:
+            lock = self.locks.writing(src)
+        with lock:
+            final = move_destination(self.storage, src, dest)
+            self.storage.move(src, dest)
+            self.moved(src, final)
+
+    @contextlib.contextmanager
+    def transaction(self, stage=None):
+        """Return context manager making the changes within it all at once.
+
+        Tasks added, edited and moved, and team and themes written, through
+        the project or its storage are only stored when the block exits,
+        with the task files written atomically; nothing is stored if it
+        raises. The stage function, e.g. :meth:`jicagile.cli.CLI.stage`,
+        is then called once with the paths to stage in version control.
+        """
+        from jicagile.transaction import TransactionStorage
+        storage = self.storage
+        if isinstance(storage, TransactionStorage):
+            # Part of the enclosing transaction.
+            yield
+            return
+        catalog = self.catalog
+        overlay = TransactionStorage(storage, self.directory)
+        self.storage = overlay
+        with catalog.batch():
+            try:
+                yield
+            finally:
+                self.storage = storage
+            fpaths = overlay.changed_fpaths
+            with phase("transaction.commit", items=len(overlay.ops)):
+                with self.locks.exclusive():
+                    overlay.commit()
+        if overlay.config_written:
+            self.reload_config()
+        if stage is not None and fpaths:
+            stage(fpaths)
+
+    def moved(self, src, dest):
+        """Record that a task, or directory of tasks, has been moved to dest.
+
+        For moves made outside the storage, e.g. with ``git mv``.
+        """
+        from jicagile.catalog import Catalog
+        if self._catalog is None and not Catalog.exists(self.directory, self.storage):
+            # Built with the tasks in their new place when first needed.
+            return
+        self.catalog.moved(src, dest)
+
+    def moved_all(self, moves):
+        """Record that several tasks, given as (src, dest), have been moved."""
+        from jicagile.catalog import Catalog
+        if self._catalog is None and not Catalog.exists(self.directory, self.storage):
+            return
+        with self.catalog.batch():
+            for src, dest in moves:
+                self.catalog.moved(src, dest)
+
+    def removed_all(self, fpaths):
+        """Record that several tasks have been removed, e.g. packed into an archive."""
+        from jicagile.catalog import Catalog
+        if self._catalog is None and not Catalog.exists(self.directory, self.storage):
+            return
+        with self.catalog.batch():
+            for fpath in fpaths:
+                self.catalog.remove(fpath)
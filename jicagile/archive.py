@@ -0,0 +1,174 @@
+"""Packed archives of past sprints.
+
+Years of past sprints mean a great many small task files. With ``agl
+archive pack`` each past sprint directory is replaced by a single gzipped
+JSON lines file, e.g. ``past_sprints/2016-01-04.jsonl.gz``. Its first line
+is a header with the totals of the sprint::
+
+    {"sprint": "2016-01-04", "storypoints": 8, "tasks": 2, "version": 1}
+
+and each following line is a task::
+
+    {"fname": "write-report.yml", "task": {"title": "Write report", ...}}
+
+The totals are read from the header alone, and the tasks are streamed one
+line at a time, so packs are never extracted to be read. ``agl archive
+unpack`` writes the task files back, in the layout of the project; comments
+in the original files are not kept.
+"""
+
+import os
+import os.path
+import gzip
+import json
+import uuid
+
+import yaml
+
+import jicagile
+from jicagile.locking import atomic_write, makedirs
+from jicagile.storage import task_fpaths
+
+PACK_SUFFIX = ".jsonl.gz"
+
+#: Version of the pack format, stored in the header.
+PACK_VERSION = 1
+
+
+def is_pack(fpath):
+    """Return True if the path is that of a sprint pack."""
+    return fpath.endswith(PACK_SUFFIX)
+
+
+def pack_fpath(directory):
+    """Return the path to the pack of a sprint directory."""
+    return os.path.normpath(directory) + PACK_SUFFIX
+
+
+def sprint_name(fpath):
+    """Return the name of the sprint in a pack."""
+    return os.path.basename(fpath)[:-len(PACK_SUFFIX)]
+
+
+def _line(data):
+    return (json.dumps(data, sort_keys=True) + "\n").encode("utf-8")
+
+
+def write_pack(directory, fpath=None):
+    """Write the tasks in a sprint directory to a pack.
+
+    The pack is written to a temporary file that is renamed into place, so
+    the directory can be removed once this returns.
+
+    :returns: path to the pack and its header
+    """
+    if fpath is None:
+        fpath = pack_fpath(directory)
+    fpaths = task_fpaths(directory)
+    tasks = [(os.path.basename(fp), jicagile.Task.from_file(fp)) for fp in fpaths]
+    header = dict(sprint=sprint_name(fpath),
+                  tasks=len(tasks),
+                  storypoints=sum(task["storypoints"] for fname, task in tasks),
+                  version=PACK_VERSION)
+
+    parent, fname = os.path.split(fpath)
+    tmp_fpath = os.path.join(parent, ".{}.{}.tmp".format(fname, uuid.uuid4().hex))
+    fd = os.open(tmp_fpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            with gzip.GzipFile(fileobj=fh, mode="wb",
+                               filename=fname[:-len(".gz")]) as gz:
+                gz.write(_line(header))
+                for fname, task in tasks:
+                    gz.write(_line(dict(fname=fname, task=task)))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(tmp_fpath, fpath)
+    except:
+        if os.path.exists(tmp_fpath):
+            os.unlink(tmp_fpath)
+        raise
+    return fpath, header
+
+
+def _native(data):
+    """Return data decoded from JSON with its ASCII strings as native strings.
+
+    This is how they are read from YAML, so that tasks written back out
+    do not have their strings tagged as unicode under Python 2.
+    """
+    if isinstance(data, dict):
+        return dict((_native(key), _native(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [_native(value) for value in data]
+    if isinstance(data, type(u"")) and not isinstance(data, str):
+        try:
+            return data.encode("ascii")
+        except UnicodeEncodeError:
+            pass
+    return data
+
+
+def _read_header(gz, fpath):
+    header = json.loads(gz.readline().decode("utf-8"))
+    if header.get("version") != PACK_VERSION:
+        raise(IOError("Unsupported pack version {} in {}".format(
+            header.get("version"), fpath)))
+    return header
+
+
+def read_header(fpath):
+    """Return the header of a pack, without reading its tasks."""
+    with gzip.open(fpath, "rb") as gz:
+        return _read_header(gz, fpath)
+
+
+def iter_tasks(fpath):
+    """Yield the file name and :class:`jicagile.Task` of each task in a pack."""
+    with gzip.open(fpath, "rb") as gz:
+        _read_header(gz, fpath)
+        for line in gz:
+            data = _native(json.loads(line.decode("utf-8")))
+            yield data["fname"], jicagile.Task(**data["task"])
+
+
+def task_collection(fpath):
+    """Return the :class:`jicagile.TaskCollection` in a pack."""
+    tasks = jicagile.TaskCollection()
+    tasks.extend(task for fname, task in iter_tasks(fpath))
+    return tasks
+
+
+def remove_directory(directory):
+    """Remove the task files of a packed sprint, and the directory if it is then empty.
+
+    :returns: list of the paths removed
+    """
+    fpaths = task_fpaths(directory)
+    for fpath in fpaths:
+        os.unlink(fpath)
+    for shard in sorted(set(os.path.dirname(fp) for fp in fpaths)):
+        if shard != directory and not os.listdir(shard):
+            os.rmdir(shard)
+    if not os.listdir(directory):
+        os.rmdir(directory)
+    return fpaths
+
+
+def unpack(fpath, layout):
+    """Write the tasks in a pack back to a sprint directory and remove the pack.
+
+    :returns: list of the :class:`jicagile.Task` and path of the tasks written
+    """
+    directory = fpath[:-len(PACK_SUFFIX)]
+    if os.path.exists(directory):
+        raise(IOError("Already exists: {}".format(directory)))
+    written = []
+    for fname, task in iter_tasks(fpath):
+        task_fpath = layout.fpath(directory, fname)
+        makedirs(os.path.dirname(task_fpath))
+        atomic_write(task_fpath, yaml.dump(task, explicit_start=True,
+                                           default_flow_style=False))
+        written.append((task, task_fpath))
+    os.unlink(fpath)
+    return written
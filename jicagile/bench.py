@@ -0,0 +1,262 @@
+"""Benchmark the core operations of jicagile.
+
+Run the benchmarks and save the results::
+
+    python -m jicagile.bench --sizes 1000,10000 --output bench.json
+
+Compare a later run against the saved results, failing if any benchmark is
+more than 20% slower::
+
+    python -m jicagile.bench --sizes 1000,10000 --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+    import resource
+
+import jicagile
+from jicagile.synthetic import SyntheticProject
+
+#: Maximum number of add and edit operations timed per project size.
+MAX_OPS = 1000
+
+
+class Benchmark(object):
+    """A benchmarked operation.
+
+    :param name: name of the benchmark
+    :param setup: function taking a size and a work directory returning the
+                  arguments to pass to run
+    :param run: function doing the work and returning the number of items
+                processed
+    """
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+    def measure(self, size, workdir, repeat=3):
+        """Return dictionary with the best timing over a number of repeats."""
+        best = None
+        for i in range(repeat):
+            args = self.setup(size, workdir)
+            start_memory_tracking()
+            start = time.time()
+            num_items = self.run(*args)
+            seconds = time.time() - start
+            peak = stop_memory_tracking()
+            if best is None or seconds < best["seconds"]:
+                best = dict(name=self.name,
+                            size=size,
+                            items=num_items,
+                            seconds=seconds,
+                            throughput=num_items / max(seconds, 1e-9),
+                            peak_memory_kb=peak)
+        return best
+
+
+def start_memory_tracking():
+    """Start tracking memory allocations if tracemalloc is available."""
+    if tracemalloc is not None:
+        tracemalloc.start()
+
+
+def stop_memory_tracking():
+    """Return the peak memory in kB.
+
+    Without tracemalloc this is the high water mark of the whole process.
+    """
+    if tracemalloc is not None:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak // 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def project_directory(size, workdir, num_past_sprints=0):
+    """Return path to a synthetic project on disk, creating it if needed."""
+    directory = os.path.join(workdir, "project-{}-{}".format(size, num_past_sprints))
+    if not os.path.isdir(directory):
+        synthetic = SyntheticProject(num_tasks=size,
+                                     num_past_sprints=num_past_sprints)
+        synthetic.write(directory)
+    return directory
+
+
+def setup_from_directory(size, workdir):
+    directory = project_directory(size, workdir)
+    return (os.path.join(directory, "backlog"),)
+
+
+def run_from_directory(directory):
+    return len(jicagile.TaskCollection.from_directory(directory))
+
+
+def setup_render(size, workdir):
+    from jicagile.cli import list_template
+    project = SyntheticProject(num_tasks=size).in_memory()
+    tasks = project.tasks(project.backlog_directory)
+    return list_template, tasks, project.team
+
+
+def run_render(template, tasks, team):
+    template.render(tasks=tasks, directory="backlog", team=team)
+    return len(tasks)
+
+
+def setup_add_task(size, workdir):
+    directory = os.path.join(workdir, "add-task")
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    shutil.copytree(project_directory(size, workdir), directory)
+    project = jicagile.Project(directory)
+    # Build the catalog of task IDs outside the timed part.
+    project.catalog
+    return project, min(size, MAX_OPS)
+
+
+def run_add_task(project, num_ops):
+    for i in range(num_ops):
+        project.add_task("Benchmark task {}".format(i), 3,
+                         primary_contact="TO", theme="admin")
+    return num_ops
+
+
+def setup_edit_task(size, workdir):
+    # Edited on a copy, so that every repeat changes the story points.
+    directory = os.path.join(workdir, "edit-task")
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    shutil.copytree(project_directory(size, workdir), directory)
+    project = jicagile.Project(directory)
+    edits = []
+    for fpath in project.storage.fpaths(project.backlog_directory)[:MAX_OPS]:
+        storypoints = project.storage.read_task(fpath)["storypoints"]
+        edits.append((fpath, 3 if storypoints == 5 else 5))
+    return project, edits
+
+
+def run_edit_task(project, edits):
+    for fpath, storypoints in edits:
+        project.edit_task(fpath, storypoints=storypoints)
+    return len(edits)
+
+
+def setup_history(size, workdir):
+    sprint_size = 20
+    num_past_sprints = max(1, size // sprint_size - 1)
+    directory = project_directory(size, workdir, num_past_sprints)
+    return (os.path.join(directory, "past_sprints"), num_past_sprints)
+
+
+def run_history(directory, num_past_sprints):
+    from jicagile.history import yield_historical_data
+    for line in yield_historical_data(directory):
+        pass
+    return num_past_sprints
+
+
+BENCHMARKS = [
+    Benchmark("TaskCollection.from_directory", setup_from_directory, run_from_directory),
+    Benchmark("list.jinja2", setup_render, run_render),
+    Benchmark("Project.add_task", setup_add_task, run_add_task),
+    Benchmark("Project.edit_task", setup_edit_task, run_edit_task),
+    Benchmark("history.yield_historical_data", setup_history, run_history),
+]
+
+
+def run_benchmarks(sizes, workdir, repeat=3, names=None, out=sys.stdout):
+    """Return list of results for all the benchmarks and sizes."""
+    results = []
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+        for size in sizes:
+            result = benchmark.measure(size, workdir, repeat)
+            out.write("{name:32} {size:>8d} {seconds:>10.4f}s "
+                      "{throughput:>12.1f} items/s {peak_memory_kb:>10d} kB\n".format(**result))
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return list of (result, baseline result, ratio) for regressions.
+
+    A regression is a benchmark that takes more than (1 + threshold) times
+    as long as in the baseline.
+    """
+    lookup = dict(((r["name"], r["size"]), r) for r in baseline["results"])
+    regressions = []
+    for result in results:
+        key = (result["name"], result["size"])
+        if key not in lookup:
+            continue
+        ratio = result["seconds"] / max(lookup[key]["seconds"], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append((result, lookup[key], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="Comma separated project sizes (default: 1000,10000)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of repeats, the best is kept (default: 3)")
+    parser.add_argument("--only", action="append",
+                        help="Only run the named benchmark (can be repeated)")
+    parser.add_argument("--workdir",
+                        help="Directory for generated projects (default: temporary)")
+    parser.add_argument("--output", help="Write results to JSON file")
+    parser.add_argument("--baseline", help="JSON file with baseline results")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slow down relative to baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    workdir = args.workdir
+    if workdir is None:
+        workdir = tempfile.mkdtemp()
+    elif not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    try:
+        results = run_benchmarks(sizes, workdir, args.repeat, args.only)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(dict(version=jicagile.__version__,
+                           python=platform.python_version(),
+                           timestamp=time.time(),
+                           results=results), fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        for result, base, ratio in regressions:
+            print("REGRESSION {} [{}]: {:.4f}s vs {:.4f}s ({:.0%} slower)".format(
+                result["name"], result["size"], result["seconds"],
+                base["seconds"], ratio - 1))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
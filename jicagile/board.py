@@ -0,0 +1,242 @@
+"""Interactive kanban board, as shown by ``agl board``.
+
+The board shows the backlog, todo and done directories as columns of tasks
+grouped by primary contact. The project is loaded once into a watched
+:class:`jicagile.index.IndexedStorage`, so changes made elsewhere show up
+without reloading it.
+
+Moving a task between columns only changes the board; the files are moved
+when the board is saved, with one ``git mv`` per destination directory.
+Changes to story points and themes are written straight away and staged
+in one ``git add`` when the board is saved.
+"""
+
+import curses
+import locale
+
+from jicagile.index import IndexedStorage
+from jicagile.watch import watcher_for
+
+STORYPOINT_KEYS = dict((ord(str(n)), n) for n in [1, 3, 5, 8])
+
+HELP = ("arrows/hjkl: select  </>: move  1/3/5/8: story points  "
+        "t: theme  s: save  q: save and quit")
+
+
+def screen_text(text):
+    """Return text as curses takes it, i.e. encoded under Python 2."""
+    if isinstance(text, str):
+        return text
+    return text.encode(locale.getpreferredencoding() or "utf-8", "replace")
+
+
+class Board(object):
+    """Columns of tasks with moves waiting to be saved."""
+
+    def __init__(self, cli):
+        self.cli = cli
+        project = cli.project
+        self.project = project
+        self.columns = [("backlog", project.backlog_directory),
+                        ("todo", project.current_todo_directory),
+                        ("done", project.current_done_directory)]
+
+        storage = project.storage
+        if not isinstance(storage, IndexedStorage):
+            storage = IndexedStorage(storage)
+            project.storage = storage
+        if storage.uses_files and storage.watcher is None:
+            storage.watch(watcher_for([d for n, d in self.columns]))
+        self.storage = storage
+
+        #: Tasks moved on the board, from fpath to column index.
+        self.moves = {}
+        #: Tasks whose files have been edited but not staged.
+        self.edited = set()
+        self.column = 0
+        self.row = 0
+
+    def tasks(self, column):
+        """Return list of (fpath, task) in the column of the board."""
+        items = []
+        for index, (name, directory) in enumerate(self.columns):
+            for fpath, task in self.storage.refresh(directory).items():
+                if self.moves.get(fpath, index) == column:
+                    items.append((fpath, task))
+        return sorted(items, key=lambda i: (i[1]["primary_contact"],
+                                            i[1]["theme"],
+                                            i[1]["storypoints"],
+                                            i[0]))
+
+    def lines(self, column):
+        """Return list of (text, fpath) to show in a column.
+
+        The fpath is None for the lines that are not tasks.
+        """
+        tasks = self.tasks(column)
+        name = self.columns[column][0]
+        total = sum(task["storypoints"] for fpath, task in tasks)
+        lines = [(u"# {} [{}]".format(name.upper(), total), None)]
+        contacts = sorted(set(task["primary_contact"] for fpath, task in tasks))
+        for pcontact in contacts:
+            group = [(f, t) for f, t in tasks if t["primary_contact"] == pcontact]
+            lines.append(("", None))
+            lines.append((u"## {} [{}]".format(
+                self.project.team.name(pcontact),
+                sum(t["storypoints"] for f, t in group)), None))
+            for fpath, task in group:
+                marker = "*" if fpath in self.moves or fpath in self.edited else " "
+                lines.append((u"{}[{}] {} [{}]".format(
+                    marker, task["theme"], task["title"], task["storypoints"]),
+                    fpath))
+        return lines
+
+    def selected(self):
+        """Return the fpath of the selected task or None."""
+        fpaths = [fpath for text, fpath in self.lines(self.column) if fpath]
+        if not fpaths:
+            return None
+        self.row = min(self.row, len(fpaths) - 1)
+        return fpaths[self.row]
+
+    def select(self, columns=0, rows=0):
+        """Move the selection."""
+        self.column = min(max(self.column + columns, 0), len(self.columns) - 1)
+        self.row = max(self.row + rows, 0)
+        self.selected()
+
+    def move(self, fpath, offset):
+        """Move a task to a neighbouring column on the board."""
+        origin = self.origin(fpath)
+        column = min(max(self.moves.get(fpath, origin) + offset, 0),
+                     len(self.columns) - 1)
+        if column == origin:
+            self.moves.pop(fpath, None)
+        else:
+            self.moves[fpath] = column
+        return column
+
+    def origin(self, fpath):
+        """Return the index of the column the task is stored in."""
+        for index, (name, directory) in enumerate(self.columns):
+            if fpath in self.storage.refresh(directory):
+                return index
+        raise(KeyError(fpath))
+
+    def edit(self, fpath, storypoints=None, theme=None):
+        """Change the story points or theme of a task."""
+        task, changed = self.project.update_task(fpath, storypoints=storypoints,
+                                                 theme=theme)
+        if changed:
+            self.edited.add(fpath)
+
+    def next_theme(self, fpath):
+        """Return the theme after the one of the task."""
+        themes = [""] + sorted(self.project.themes.lookups)
+        task = self.storage.refresh(self.origin_directory(fpath))[fpath]
+        index = themes.index(task["theme"]) if task["theme"] in themes else 0
+        return themes[(index + 1) % len(themes)]
+
+    def origin_directory(self, fpath):
+        """Return the directory the task is stored in."""
+        return self.columns[self.origin(fpath)][1]
+
+    def save(self):
+        """Stage the edits and move the files of the moved tasks."""
+        storage = self.storage
+        if self.edited:
+            if storage.uses_files:
+                if self.cli.is_git_repo:
+                    self.cli.call(["git", "add"] + sorted(self.edited))
+            else:
+                self.cli.git_add(storage.vcs_fpath(sorted(self.edited)[0]))
+            self.edited = set()
+
+        destinations = {}
+        for fpath, column in self.moves.items():
+            destinations.setdefault(self.columns[column][1], []).append(fpath)
+        for dest in sorted(destinations):
+            self.cli.move_tasks(sorted(destinations[dest]), dest)
+        self.moves = {}
+
+    def handle(self, key):
+        """Act on a key press. Returns False if the board should close."""
+        fpath = self.selected()
+        if key in (ord("q"), 27):
+            self.save()
+            return False
+        elif key in (curses.KEY_LEFT, ord("h")):
+            self.select(columns=-1)
+        elif key in (curses.KEY_RIGHT, ord("l")):
+            self.select(columns=1)
+        elif key in (curses.KEY_UP, ord("k")):
+            self.select(rows=-1)
+        elif key in (curses.KEY_DOWN, ord("j")):
+            self.select(rows=1)
+        elif key == ord("s"):
+            self.save()
+        elif fpath is None:
+            pass
+        elif key in (ord("<"), ord(">")):
+            self.column = self.move(fpath, -1 if key == ord("<") else 1)
+            fpaths = [f for t, f in self.lines(self.column) if f]
+            self.row = fpaths.index(fpath)
+        elif key in STORYPOINT_KEYS:
+            self.edit(fpath, storypoints=STORYPOINT_KEYS[key])
+        elif key == ord("t"):
+            self.edit(fpath, theme=self.next_theme(fpath))
+        return True
+
+    def draw(self, screen):
+        """Draw the board on a curses screen."""
+        screen.erase()
+        height, width = screen.getmaxyx()
+        column_width = width // len(self.columns)
+        selected = self.selected()
+        for index in range(len(self.columns)):
+            lines = self.lines(index)
+            # Scroll the column to keep the selected task in view.
+            first = 0
+            rows = [i for i, (text, fpath) in enumerate(lines) if fpath == selected]
+            if rows and rows[0] >= height - 2:
+                first = rows[0] - (height - 3)
+            for y, (text, fpath) in enumerate(lines[first:first + height - 2]):
+                attr = curses.A_NORMAL
+                if fpath is None:
+                    attr = curses.A_BOLD
+                elif fpath == selected and index == self.column:
+                    attr = curses.A_REVERSE
+                screen.addnstr(y, index * column_width, screen_text(text),
+                               column_width - 1, attr)
+        status = HELP
+        if self.moves or self.edited:
+            status = "{} unsaved  {}".format(len(self.moves) + len(self.edited),
+                                             HELP)
+        screen.addnstr(height - 1, 0, status, width - 1, curses.A_REVERSE)
+        screen.refresh()
+
+    def run(self, screen):
+        """Show the board until it is closed."""
+        curses.curs_set(0)
+        screen.keypad(1)
+        screen.timeout(1000)
+        try:
+            while True:
+                self.draw(screen)
+                key = screen.getch()
+                if key == -1:
+                    # No key pressed; redraw to show changes made elsewhere.
+                    continue
+                if not self.handle(key):
+                    break
+        finally:
+            if self.storage.watcher is not None:
+                self.storage.watcher.close()
+
+
+def main(cli):
+    """Show the board of the project of the command line interface."""
+    board = Board(cli)
+    # For curses to show non-ASCII titles and names.
+    locale.setlocale(locale.LC_ALL, "")
+    curses.wrapper(board.run)
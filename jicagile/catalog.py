@@ -0,0 +1,238 @@
+"""Catalog of the tasks of a project by stable ID and by file name.
+
+Each task added by agl carries a short random ID, stored in its file under
+``id``. The catalog maps the IDs to the paths of the task files, so that a
+task can be found by its ID without scanning the project, and so that an ID
+can be checked for collisions before it is handed out. Tasks keep their
+file name, and ID, when their title is edited.
+
+The catalog also maps the file names of the tasks, i.e. the slugs of their
+titles, to their paths, so that a new task whose file name clashes with a
+task anywhere in the project is found without listing any directory.
+
+For storage backends that persist the tasks the catalog is kept in the
+SQLite file ``.agl/catalog.sqlite``; otherwise it is kept in memory. It is
+built from the task files the first time it is needed and kept up to date
+by :class:`jicagile.Project` and the ``agl`` commands.
+"""
+
+import os
+import os.path
+import contextlib
+import sqlite3
+import uuid
+
+from jicagile.locking import make_state_directory
+
+STATE_DIRNAME = ".agl"
+CATALOG_FNAME = "catalog.sqlite"
+
+#: Number of hexadecimal digits in a task ID.
+ID_LENGTH = 8
+
+#: Shortest prefix of a task ID accepted in its place.
+MIN_ID_PREFIX_LENGTH = 4
+
+#: Version of the database layout; older catalogs are rebuilt.
+SCHEMA_VERSION = 2
+
+
+def catalog_fpath(directory):
+    """Return the path to the catalog of the project directory."""
+    return os.path.join(directory, STATE_DIRNAME, CATALOG_FNAME)
+
+
+def task_name(fpath):
+    """Return the file name of a task without its extension."""
+    return os.path.splitext(os.path.basename(fpath))[0]
+
+
+def is_id_prefix(text):
+    """Return True if the text could be the start of a task ID."""
+    return (MIN_ID_PREFIX_LENGTH <= len(text) <= ID_LENGTH and
+            all(c in "0123456789abcdef" for c in text))
+
+
+def random_id():
+    """Return a new random task ID."""
+    return uuid.uuid4().hex[:ID_LENGTH]
+
+
+@contextlib.contextmanager
+def _deferred():
+    yield
+
+
+class Catalog(object):
+    """Map from task IDs and file names to task file paths.
+
+    The paths are stored relative to the root directory of the project.
+    """
+
+    schema = """
+CREATE TABLE IF NOT EXISTS tasks (
+    fpath TEXT PRIMARY KEY,
+    id TEXT,
+    name TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_id ON tasks (id);
+CREATE INDEX IF NOT EXISTS tasks_name ON tasks (name);
+"""
+
+    def __init__(self, fpath=":memory:", root="."):
+        self.fpath = fpath
+        self.root = root
+        self.connection = sqlite3.connect(fpath)
+        self._batched = False
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS ids;"
+                "DROP TABLE IF EXISTS tasks;"
+                "PRAGMA user_version = 0;")
+        self.connection.executescript(self.schema)
+
+    @classmethod
+    def open(cls, directory, storage):
+        """Return the catalog of the project in the directory."""
+        if not storage.persistent:
+            return cls(root=directory)
+        make_state_directory(directory)
+        return cls(catalog_fpath(directory), directory)
+
+    @staticmethod
+    def exists(directory, storage):
+        """Return True if the project in the directory has a stored catalog."""
+        return storage.persistent and os.path.isfile(catalog_fpath(directory))
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    @property
+    def needs_build(self):
+        """Return True if the catalog has to be built before it can be used."""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        return version != SCHEMA_VERSION
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Return context manager committing the changes made within it at once.
+
+        The changes are rolled back if an exception is raised.
+        """
+        self._batched = True
+        try:
+            yield
+        except:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+        finally:
+            self._batched = False
+
+    def _writing(self):
+        """Return context manager for a change, committed unless batched."""
+        if self._batched:
+            return _deferred()
+        return self.connection
+
+    def _key(self, path):
+        return os.path.normpath(os.path.relpath(os.path.abspath(path),
+                                                os.path.abspath(self.root)))
+
+    def _path(self, key):
+        return os.path.normpath(os.path.join(self.root, key))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def __contains__(self, task_id):
+        return self.fpath_of(task_id) is not None
+
+    def fpath_of(self, task_id):
+        """Return the path to the task with the ID or None if it is unknown."""
+        row = self.connection.execute(
+            "SELECT fpath FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return self._path(row[0])
+
+    def ids_with_prefix(self, prefix):
+        """Return sorted list of (id, fpath) of the IDs starting with prefix."""
+        cursor = self.connection.execute(
+            "SELECT id, fpath FROM tasks WHERE id >= ? AND id < ? ORDER BY id",
+            (prefix, prefix + u"\uffff"))
+        return [(task_id, self._path(key)) for task_id, key in cursor]
+
+    def named(self, name):
+        """Return sorted list of the paths to the tasks with the file name.
+
+        The name is without the extension, i.e. the slug of the title.
+        """
+        cursor = self.connection.execute(
+            "SELECT fpath FROM tasks WHERE name = ? ORDER BY fpath", (name,))
+        return [self._path(key) for (key,) in cursor]
+
+    def new_id(self):
+        """Return a random ID not used by any task in the catalog."""
+        while True:
+            task_id = random_id()
+            if task_id not in self:
+                return task_id
+
+    def _insert(self, task_id, fpath):
+        key = self._key(fpath)
+        self.connection.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?)",
+                                (key, task_id, task_name(key)))
+
+    def add(self, task_id, fpath):
+        """Record the path of the task with the ID, which may be None.
+
+        Raises IOError if another task already has the ID.
+        """
+        if task_id is not None:
+            existing = self.fpath_of(task_id)
+            if existing is not None and existing != self._path(self._key(fpath)):
+                raise(IOError("Task ID {} already used by {}".format(task_id, existing)))
+        with self._writing():
+            self._insert(task_id, fpath)
+
+    def remove(self, fpath):
+        """Forget the task at the fpath."""
+        with self._writing():
+            self.connection.execute("DELETE FROM tasks WHERE fpath = ?",
+                                    (self._key(fpath),))
+
+    def moved(self, src, dest):
+        """Update the paths of a task, or directory of tasks, moved to dest."""
+        src = self._key(src)
+        dest = self._key(dest)
+        prefix = src + os.sep
+        with self._writing():
+            rows = self.connection.execute(
+                "SELECT fpath FROM tasks WHERE fpath = ? OR "
+                "(fpath >= ? AND fpath < ?)",
+                (src, prefix, prefix + u"\uffff")).fetchall()
+            for (key,) in rows:
+                new_key = dest + key[len(src):]
+                self.connection.execute(
+                    "UPDATE tasks SET fpath = ?, name = ? WHERE fpath = ?",
+                    (new_key, task_name(new_key), key))
+
+    def build(self, storage, root="."):
+        """Catalog all the tasks in the storage below root."""
+        with self._writing():
+            self.connection.execute("DELETE FROM tasks")
+            seen = set()
+            for directory in storage.directories(root):
+                for fpath in storage.fpaths(directory):
+                    task_id = storage.read_task(fpath).get("id")
+                    if task_id in seen:
+                        # Copied by hand; only the first copy is found by ID.
+                        task_id = None
+                    seen.add(task_id)
+                    self._insert(task_id, fpath)
+            self.connection.execute(
+                "PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
@@ -3,7 +3,12 @@
 import sys
 import os
 import argparse
+import errno
+import fnmatch
+import glob
+import json
 import subprocess
+from collections import OrderedDict
 
 import colorama
 from termcolor import colored
@@ -11,6 +16,12 @@ from jinja2 import Environment, FileSystemLoader
 
 import jicagile
 import jicagile.config
+import jicagile.layout
+import jicagile.locking
+import jicagile.storage
+import jicagile.metrics
+import jicagile.telemetry
+from jicagile.profiling import phase, tracer
 
 colorama.init()
 
@@ -24,16 +35,21 @@ list_template = env.get_template("list.jinja2")
 class CLI(object):
     """Command line interface class."""
 
-    def __init__(self):
-        self.project = jicagile.Project(".")
+    def __init__(self, project=None):
+        if project is None:
+            project = jicagile.Project(".",
+                                       storage=jicagile.storage.storage_for("."))
+        self.project = project
 
     @property
     def is_git_repo(self):
         """Return True if the project directory is under Git version control."""
-        process = subprocess.Popen(["git", "rev-parse"],
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
+        jicagile.metrics.increment("git_subprocesses")
+        with phase("git.rev-parse"):
+            process = subprocess.Popen(["git", "rev-parse"],
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
         if process.returncode != 0:
             return False
         return True
@@ -41,6 +57,7 @@ class CLI(object):
     def parse_args(self, args):
         """Return parsed arguments."""
         parser = argparse.ArgumentParser()
+        add_profile_arguments(parser)
         subparsers = parser.add_subparsers(dest="command")
 
         # The "add" command.
@@ -59,7 +76,7 @@ class CLI(object):
 
         # The "edit" command.
         edit_parser = subparsers.add_parser("edit", help="Edit a task")
-        edit_parser.add_argument("fpath", help="Path to task file")
+        edit_parser.add_argument("fpath", help="Path to task file, its ID, or part of its name or title")
         edit_parser.add_argument("-t", "--title", help="Task description")
         edit_parser.add_argument("-s", "--storypoints",
                                  type=int, help="Number of storypoints")
@@ -72,15 +89,56 @@ class CLI(object):
 
         # The "list" command.
         list_parser = subparsers.add_parser("list", help="List the tasks")
-        list_parser.add_argument("directory",
+        list_parser.add_argument("directory", nargs="?",
                                  help="Path to directory with tasks")
+        list_parser.add_argument("directories", nargs="*", metavar="directory",
+                                 help="More directories to list")
+        list_parser.add_argument("-a", "--all", action="store_true",
+                                 help="List the backlog, todo and done directories")
         list_parser.add_argument("-p", "--primary-contact",
                                  help="Primary contact")
+        list_parser.add_argument("-w", "--watch", action="store_true",
+                                 help="Keep the list on screen and update it as tasks change")
 
         # The "mv" command.
-        mv_parser = subparsers.add_parser("mv", help="Move a task or a directory of tasks")
-        mv_parser.add_argument("src", help="File or directory to move")
-        mv_parser.add_argument("dest", help="Destination to move to")
+        mv_parser = subparsers.add_parser("mv", help="Move tasks or directories of tasks")
+        mv_parser.add_argument("src", nargs="+", help="File or directory to move, a glob such as current/done/*.yml, or the ID or part of the name or title of a task")
+        mv_parser.add_argument("dest", help="Destination to move to; a directory when moving several tasks")
+
+        # The "multi" command.
+        multi_parser = subparsers.add_parser("multi", help="Aggregate the tasks of several projects")
+        multi_subparsers = multi_parser.add_subparsers(dest="subcommand")
+        multi_list_parser = multi_subparsers.add_parser("list", help="List the tasks of all the projects")
+        multi_list_parser.add_argument("directories", nargs="*", metavar="directory",
+                                       help="Directories to list: backlog, todo or done (default: all)")
+        multi_list_parser.add_argument("-p", "--primary-contact",
+                                       help="Primary contact")
+        multi_stats_parser = multi_subparsers.add_parser("stats", help="Story points per project and primary contact")
+        multi_stats_parser.add_argument("--json", action="store_true",
+                                        help="Output in JSON format")
+        for p in [multi_list_parser, multi_stats_parser]:
+            p.add_argument("--projects", nargs="+", required=True, metavar="PATH",
+                           help="Project directories, or a file listing them")
+
+        # The "search" command.
+        search_parser = subparsers.add_parser("search", help="Search the titles of the tasks")
+        search_parser.add_argument("terms", nargs="+", help="Words, or starts of words, to search for")
+        search_parser.add_argument("-n", "--limit", type=int, default=20,
+                                   help="Maximum number of tasks to show")
+        search_parser.add_argument("--rebuild", action="store_true",
+                                   help="Rebuild the index from the task files")
+        search_parser.add_argument("--json", action="store_true",
+                                   help="Output in JSON format")
+
+        # The "board" command.
+        subparsers.add_parser("board", help="Interactive board of the backlog and current sprint")
+
+        # The "serve" command.
+        serve_parser = subparsers.add_parser("serve", help="Serve a JSON API to the project on localhost")
+        serve_parser.add_argument("--port", type=int, default=8080,
+                                  help="Port to listen on")
+        serve_parser.add_argument("--past-sprints", metavar="DIRECTORY",
+                                  help="Directory with the past sprints (default: past_sprints)")
 
         # The "theme" command.
         theme_parser = subparsers.add_parser("theme", help="Add or remove themes")
@@ -101,123 +159,829 @@ class CLI(object):
         teammember_rm_parser = teammember_subparser.add_parser("rm", help="Remove a team member")
         teammember_rm_parser.add_argument("lookup", help="Lookup alias")
 
-        return parser.parse_args(args)
+        # The "stats" command.
+        stats_parser = subparsers.add_parser("stats", help="Show project statistics")
+        stats_parser.add_argument("--internals", action="store_true",
+                                  help="Include counters of the work done by agl")
+        stats_parser.add_argument("--json", action="store_true",
+                                  help="Output in JSON format")
+
+        # The "perf" command.
+        perf_parser = subparsers.add_parser("perf", help="Local per command telemetry")
+        perf_subparsers = perf_parser.add_subparsers(dest="subcommand")
+        perf_subparsers.add_parser("enable", help="Start logging invocations to .agl/")
+        perf_subparsers.add_parser("disable", help="Stop logging invocations")
+        perf_report_parser = perf_subparsers.add_parser("report", help="Summarise the logged invocations")
+        perf_report_parser.add_argument("--by", choices=sorted(jicagile.telemetry.PERIODS),
+                                        default="week", help="Period to group by")
+        perf_report_parser.add_argument("--json", action="store_true",
+                                        help="Output in JSON format")
+
+        # The "sqlite" command.
+        sqlite_parser = subparsers.add_parser("sqlite", help="Import or export a SQLite project file")
+        sqlite_subparsers = sqlite_parser.add_subparsers(dest="subcommand")
+        sqlite_subparsers.add_parser("import", help="Import the YAML files into {}".format(jicagile.storage.SQLITE_FNAME))
+        sqlite_subparsers.add_parser("export", help="Export {} to YAML files".format(jicagile.storage.SQLITE_FNAME))
+
+        # The "layout" command.
+        layout_parser = subparsers.add_parser("layout", help="Show or convert the layout of the task files")
+        layout_parser.add_argument("shards", nargs="?",
+                                   choices=["flat"] + list(jicagile.layout.SCHEMES),
+                                   help="Layout to convert the project to: flat, or sharded by hash or prefix of the file names")
+
+        # The "archive" command.
+        archive_parser = subparsers.add_parser("archive", help="Pack past sprints into compressed archives")
+        archive_subparsers = archive_parser.add_subparsers(dest="subcommand")
+        archive_pack_parser = archive_subparsers.add_parser("pack", help="Pack past sprint directories")
+        archive_pack_parser.add_argument("sprints", nargs="*",
+                                         help="Sprint directories to pack (default: all the past sprints)")
+        archive_unpack_parser = archive_subparsers.add_parser("unpack", help="Unpack a past sprint")
+        archive_unpack_parser.add_argument("pack", help="Pack to unpack")
+        archive_list_parser = archive_subparsers.add_parser("list", help="List the packed sprints and their totals")
+        for sprints_parser in (archive_pack_parser, archive_list_parser):
+            sprints_parser.add_argument("--past-sprints", metavar="DIRECTORY", default="past_sprints",
+                                help="Directory with the past sprints (default: past_sprints)")
+
+        # The "daemon" command.
+        daemon_parser = subparsers.add_parser("daemon", help="Keep the project loaded in a resident process")
+        daemon_subparsers = daemon_parser.add_subparsers(dest="subcommand")
+        daemon_subparsers.add_parser("start", help="Serve agl commands until stopped")
+        daemon_subparsers.add_parser("stop", help="Stop the running daemon")
+        daemon_subparsers.add_parser("status", help="Report whether a daemon is running")
+
+        args = parser.parse_args(args)
+        if args.command == "list":
+            if args.directory is None and not args.all:
+                list_parser.error("a directory or --all is required")
+            if args.watch and (args.all or args.directories):
+                list_parser.error("--watch takes a single directory")
+        if args.command == "multi" and args.subcommand == "list":
+            from jicagile.multi import DIRECTORY_NAMES
+            for name in args.directories:
+                if name not in DIRECTORY_NAMES:
+                    multi_list_parser.error("invalid directory: {} (choose from {})".format(
+                        name, ", ".join(DIRECTORY_NAMES)))
+        return args
 
 
     def run(self, args):
         """Run the specified command."""
         func = getattr(self, args.command)
-        func(args)
-
-    def add(self, args):
-        """Add a task."""
-        task, fpath = self.project.add_task(args.title,
-                                            args.storypoints,
-                                            args.primary_contact,
-                                            args.theme,
-                                            args.current)
-        if self.is_git_repo:
-            process = subprocess.Popen(["git", "add", fpath])
+        with phase("cli.{}".format(args.command)):
+            func(args)
+
+    def call(self, cmd):
+        """Run a command in a subprocess, e.g. a Git command."""
+        name = cmd[0]
+        if name == "git":
+            name = "git.{}".format(cmd[1])
+            jicagile.metrics.increment("git_subprocesses")
+        with phase(name):
+            process = subprocess.Popen(cmd)
             process.communicate()
 
-
-    def edit(self, args):
-        """Edit a task."""
-        task, fpath = self.project.edit_task(args.fpath,
-                                             args.title,
-                                             args.storypoints,
-                                             args.primary_contact,
-                                             args.theme)
+    def git_add(self, fpath):
+        """Stage a file if the project is under Git version control."""
         if self.is_git_repo:
-            process = subprocess.Popen(["git", "add", args.fpath])
-            process.communicate()
-
-        if fpath != args.fpath:
+            self.call(["git", "add", fpath])
+
+    def stage(self, fpaths):
+        """Stage added, changed and removed files in one Git command."""
+        if self.is_git_repo and fpaths:
+            self.call(["git", "update-index", "--add", "--remove", "--"] +
+                      sorted(fpaths))
+
+    def search_index(self):
+        """Return the search index of the project or None if there is none."""
+        import jicagile.search
+        index = jicagile.search.SearchIndex.open(self.project.directory)
+        if index is not None and index.needs_build:
+            index.close()
+            return None
+        return index
+
+    def resolve_task(self, reference):
+        """Return the path to the task a reference, e.g. part of a title, refers to.
+
+        Paths that exist are returned as they are, followed by task IDs and
+        their prefixes. If the reference matches several tasks they are
+        listed and None is returned.
+        """
+        import jicagile.catalog
+        import jicagile.search
+        storage = self.project.storage
+        if storage.exists(reference) or storage.is_directory(reference):
+            return reference
+        argument = reference
+        if isinstance(reference, bytes):
+            # Command line arguments under Python 2.
+            reference = reference.decode("utf-8")
+        candidates = []
+        if jicagile.catalog.is_id_prefix(reference):
+            with phase("catalog.lookup"):
+                fpath = self.project.task_fpath(reference)
+                if fpath is not None:
+                    return fpath
+                candidates = [(task_id, fp) for task_id, fp
+                              in self.project.catalog.ids_with_prefix(reference)
+                              if storage.exists(fp)]
+        if len(candidates) == 1:
+            return candidates[0][1]
+        if candidates:
+            print(u"Ambiguous task ID: {}".format(reference))
+            print("Matching tasks:")
+            for task_id, fp in candidates:
+                print(u"  {}  {}  {}".format(task_id, fp, storage.read_task(fp)["title"]))
+            return None
+        with phase("search.resolve"):
+            index = jicagile.search.SearchIndex.open(self.project.directory,
+                                                     create=True)
+            try:
+                if index.needs_build:
+                    index.build(storage, self.project.directory)
+                matches = [m for m in index.resolve(reference)
+                           if storage.exists(m[0])]
+            finally:
+                index.close()
+        if len(matches) == 1:
+            return matches[0][0]
+        if not matches:
+            # Let the command report the missing file.
+            return argument
+        print(u"Ambiguous task reference: {}".format(reference))
+        print("Matching tasks:")
+        for fpath, title in matches:
+            print(u"  {}  {}".format(fpath, title))
+        return None
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks using the project storage."""
+        final = jicagile.storage.move_destination(self.project.storage, src, dest)
+        if not self.project.storage.uses_files:
+            self.project.move_task(src, dest)
+            self.git_add(self.project.storage.vcs_fpath(dest))
+        else:
+            if self.project.storage.is_directory(src):
+                lock = self.project.locks.exclusive()
+            else:
+                lock = self.project.locks.writing(src)
+            target = dest
+            if jicagile.layout.task_directory(final) != os.path.dirname(final):
+                # Into its shard.
+                jicagile.locking.makedirs(os.path.dirname(final))
+                target = final
             l = []
             if self.is_git_repo:
                 l = ["git"]
-            l.extend(["mv", args.fpath, fpath])
-            process = subprocess.Popen(l)
-            process.communicate()
+            l.extend(["mv", src, target])
+            with lock:
+                self.call(l)
+                self.project.moved(src, final)
+
+        index = self.search_index()
+        if index is not None:
+            index.moved(src, final)
+            index.close()
+
+    def move_tasks(self, fpaths, dest):
+        """Move several tasks, or directories of tasks, into a directory at once.
+
+        Under Git they are moved with one ``git mv``, otherwise they are
+        renamed. Tasks going into shards are renamed and then staged with
+        one Git command. The catalog and search index are updated in one
+        step each.
+        """
+        storage = self.project.storage
+        moves = [(fpath, jicagile.storage.move_destination(storage, fpath, dest))
+                 for fpath in fpaths]
+        if not storage.uses_files:
+            with self.project.transaction():
+                for fpath in fpaths:
+                    self.project.move_task(fpath, dest)
+            self.git_add(storage.vcs_fpath(dest))
+        else:
+            is_git_repo = self.is_git_repo
+            sharded = []
+            others = []
+            for src, final in moves:
+                if jicagile.layout.task_directory(final) != os.path.dirname(final):
+                    sharded.append((src, final))
+                else:
+                    others.append(src)
+            moved_by_git = set(others) if is_git_repo else set()
+            with self.project.locks.exclusive():
+                if moved_by_git:
+                    self.call(["git", "mv"] + others + [dest])
+                with phase("mv.rename", items=len(moves)):
+                    for src, final in moves:
+                        if src in moved_by_git:
+                            continue
+                        jicagile.locking.makedirs(os.path.dirname(final))
+                        os.rename(src, final)
+                if is_git_repo and sharded:
+                    self.stage([p for move in sharded for p in move])
+                self.project.moved_all(moves)
+            if hasattr(storage, "invalidate"):
+                for src, final in moves:
+                    storage.invalidate(jicagile.layout.task_directory(src))
+                storage.invalidate(dest)
+
+        index = self.search_index()
+        if index is not None:
+            index.moved_all(moves)
+            index.close()
 
+    def add(self, args):
+        """Add a task."""
+        try:
+            task, fpath = self.project.add_task(args.title,
+                                                args.storypoints,
+                                                args.primary_contact,
+                                                args.theme,
+                                                args.current)
+        except IOError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            print("Task with the same file name exists: {}".format(e.filename))
+            return
+        self.git_add(self.project.storage.vcs_fpath(fpath))
+
+        index = self.search_index()
+        if index is not None:
+            index.add(fpath, task["title"])
+            index.close()
 
-    def list(self, args):
-        """List tasks."""
-        directory = args.directory
-        if args.directory == "todo":
+
+    def edit(self, args):
+        """Edit a task."""
+        args.fpath = self.resolve_task(args.fpath)
+        if args.fpath is None:
+            return
+        task, changed = self.project.update_task(args.fpath,
+                                                 title=args.title,
+                                                 storypoints=args.storypoints,
+                                                 primary_contact=args.primary_contact,
+                                                 theme=args.theme)
+        if not changed:
+            return
+        self.git_add(self.project.storage.vcs_fpath(args.fpath))
+
+        if "title" in changed:
+            index = self.search_index()
+            if index is not None:
+                index.add(args.fpath, task["title"])
+                index.close()
+
+
+    def resolve_directory(self, directory):
+        """Return the path to a directory, resolving the todo and done aliases."""
+        if directory == "todo":
             directory = self.project.current_todo_directory
-        if args.directory == "done":
+        if directory == "done":
             directory = self.project.current_done_directory
 
         if directory.endswith("/"):
             directory = directory[:-1]
+        return directory
 
-        tasks = jicagile.TaskCollection.from_directory(directory)
+    def list(self, args):
+        """List tasks."""
+        import jicagile.archive
+        if args.all or args.directories:
+            self.list_directories(args)
+            return
+
+        directory = self.resolve_directory(args.directory)
+
+        if args.watch:
+            from jicagile.live import LiveList
+            live_list = LiveList(self.project, directory, list_template,
+                                 args.primary_contact)
+            try:
+                live_list.run()
+            except KeyboardInterrupt:
+                pass
+            return
+
+        if jicagile.archive.is_pack(directory):
+            tasks = jicagile.archive.task_collection(directory)
+            directory = jicagile.archive.sprint_name(directory)
+        else:
+            tasks = self.project.tasks(directory)
         if args.primary_contact:
             tasks = tasks.tasks_for(args.primary_contact)
 
         directory = os.path.basename(directory)
-        print(list_template.render(tasks=tasks,
-                                              directory=directory,
-                                              team=self.project.team))
+        jicagile.metrics.increment("template_renders")
+        with phase("template.render", items=len(tasks)):
+            text = list_template.render(tasks=tasks,
+                                        directory=directory,
+                                        team=self.project.team)
+        print(text)
+
+    def list_directories(self, args):
+        """List the tasks in several directories, loading them together."""
+        import jicagile.archive
+        from jicagile.loading import load_directories
+        if args.all:
+            directories = [self.project.backlog_directory,
+                           self.project.current_todo_directory,
+                           self.project.current_done_directory]
+        else:
+            directories = [self.resolve_directory(d)
+                           for d in [args.directory] + args.directories]
+
+        unpacked = [d for d in directories if not jicagile.archive.is_pack(d)]
+        with phase("project.tasks", items=len(directories)):
+            with self.project.locks.reading():
+                loaded = dict(zip(unpacked, load_directories(self.project.storage,
+                                                             unpacked)))
+        collections = [jicagile.archive.task_collection(d) if d not in loaded
+                       else loaded[d] for d in directories]
+
+        texts = []
+        storypoints = 0
+        for directory, tasks in zip(directories, collections):
+            if jicagile.archive.is_pack(directory):
+                directory = jicagile.archive.sprint_name(directory)
+            if args.primary_contact:
+                tasks = tasks.tasks_for(args.primary_contact)
+            storypoints += tasks.storypoints
+            jicagile.metrics.increment("template_renders")
+            with phase("template.render", items=len(tasks)):
+                texts.append(list_template.render(
+                    tasks=tasks,
+                    directory=os.path.basename(directory),
+                    team=self.project.team))
+        texts.append(list_template.module.total(storypoints))
+        print("\n\n".join(texts))
+
+    def multi(self, args):
+        """List or summarise the tasks of several projects."""
+        import jicagile.multi
+        roots = jicagile.multi.project_roots(args.projects)
+        labels = jicagile.multi.project_labels(roots)
+        with phase("multi.open", items=len(roots)):
+            try:
+                projects = jicagile.multi.open_projects(roots)
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                print("No such project directory: {}".format(e.filename))
+                return
+        names = jicagile.multi.DIRECTORY_NAMES
+        if args.subcommand == "list" and args.directories:
+            names = args.directories
+        with phase("multi.load", items=len(roots)):
+            loaded = jicagile.multi.load_projects(projects, names)
+
+        if args.subcommand == "stats":
+            data = jicagile.multi.stats(labels, loaded)
+            if args.json:
+                print(json.dumps(data, indent=2, separators=(",", ": ")))
+                return
+            team = jicagile.multi.merged_team(projects)
+            header = "{:20}" + " {:>8}" * len(names)
+            row = "{:20}" + " {:>8d}" * len(names)
+            print(header.format("project", *names))
+            for label, entry in data["projects"].items():
+                print(row.format(label, *[entry[n]["storypoints"] for n in names]))
+            print("")
+            print(header.format("primary contact", *names))
+            for pcontact, entry in data["contacts"].items():
+                print(row.format(team.name(pcontact), *[entry[n] for n in names]))
+            return
+
+        team = jicagile.multi.merged_team(projects)
+        texts = []
+        storypoints = 0
+        for name in names:
+            tasks = jicagile.multi.labelled_tasks(labels, loaded, name)
+            if args.primary_contact:
+                tasks = tasks.tasks_for(args.primary_contact)
+            storypoints += tasks.storypoints
+            jicagile.metrics.increment("template_renders")
+            with phase("template.render", items=len(tasks)):
+                texts.append(list_template.render(tasks=tasks,
+                                                  directory=name,
+                                                  team=team))
+        texts.append(list_template.module.total(storypoints))
+        print("\n\n".join(texts))
+
+    def expand_sources(self, references):
+        """Return list of the tasks and directories the references refer to.
+
+        References may be globs, e.g. ``current/done/*.yml``. If a
+        reference matches nothing, or is ambiguous, the problem is printed
+        and None is returned.
+        """
+        storage = self.project.storage
+        sources = []
+        seen = set()
+        for reference in references:
+            if glob.has_magic(reference):
+                matches = self.glob_tasks(reference)
+                if not matches:
+                    print("No tasks match: {}".format(reference))
+                    return None
+            else:
+                fpath = self.resolve_task(reference)
+                if fpath is None:
+                    return None
+                if not storage.exists(fpath) and not storage.is_directory(fpath):
+                    print("No such task: {}".format(reference))
+                    return None
+                matches = [fpath]
+            for fpath in matches:
+                if os.path.normpath(fpath) not in seen:
+                    seen.add(os.path.normpath(fpath))
+                    sources.append(fpath)
+        return sources
+
+    def glob_tasks(self, pattern):
+        """Return sorted list of the tasks and directories matching a glob."""
+        storage = self.project.storage
+        if storage.uses_files:
+            return sorted(fp for fp in glob.glob(pattern)
+                          if storage.exists(fp) or storage.is_directory(fp))
+        pattern = os.path.normpath(pattern)
+        matches = []
+        for directory in storage.directories(self.project.directory):
+            for path in [directory] + storage.fpaths(directory):
+                if fnmatch.fnmatch(os.path.normpath(path), pattern):
+                    matches.append(path)
+        return sorted(matches)
 
     def mv(self, args):
-        """Move a task or a directory of tasks."""
-        l = []
+        """Move tasks or directories of tasks.
+
+        Several tasks, or globs matching them, are checked before any of
+        them is moved, and then moved together.
+        """
+        if len(args.src) == 1 and not glob.has_magic(args.src[0]):
+            src = self.resolve_task(args.src[0])
+            if src is None:
+                return
+            self.move(src, args.dest)
+            return
+
+        sources = self.expand_sources(args.src)
+        if sources is None:
+            return
+        storage = self.project.storage
+        if not storage.is_directory(args.dest):
+            print("Not a directory: {}".format(args.dest))
+            return
+        fpaths = []
+        finals = set()
+        moving = set(os.path.normpath(src) for src in sources)
+        for src in sources:
+            final = os.path.normpath(
+                jicagile.storage.move_destination(storage, src, args.dest))
+            if final in finals:
+                print("Several tasks would be moved to: {}".format(final))
+                return
+            finals.add(final)
+            if final == os.path.normpath(src):
+                # Already there.
+                continue
+            if final not in moving and (storage.exists(final)
+                                        or storage.is_directory(final)):
+                print("Already exists: {}".format(final))
+                return
+            fpaths.append(src)
+        if fpaths:
+            self.move_tasks(fpaths, args.dest)
+
+    def archive(self, args):
+        """Pack past sprints into archives, unpack them or list them."""
+        import jicagile.archive
+        storage = self.project.storage
+        if args.subcommand == "list":
+            root = args.past_sprints
+            fnames = sorted(os.listdir(root)) if os.path.isdir(root) else []
+            for fname in fnames:
+                if jicagile.archive.is_pack(fname):
+                    header = jicagile.archive.read_header(os.path.join(root, fname))
+                    print("{}  {:d} tasks  {:d} storypoints".format(
+                        header["sprint"], header["tasks"], header["storypoints"]))
+            return
+        if not storage.uses_files:
+            print("Only projects stored as files can be archived")
+            return
+
+        if args.subcommand == "unpack":
+            if not os.path.isfile(args.pack):
+                print("No such pack: {}".format(args.pack))
+                return
+            with self.project.locks.exclusive():
+                written = jicagile.archive.unpack(args.pack, storage.layout)
+                with self.project.catalog.batch():
+                    for task, fpath in written:
+                        self.project.catalog.add(task.get("id"), fpath)
+            if hasattr(storage, "invalidate"):
+                storage.invalidate()
+            self.stage([args.pack] + [fpath for task, fpath in written])
+
+            index = self.search_index()
+            if index is not None:
+                for task, fpath in written:
+                    index.add(fpath, task["title"])
+                index.close()
+            print("Unpacked {:d} tasks".format(len(written)))
+            return
+
+        sprints = args.sprints
+        if not sprints and os.path.isdir(args.past_sprints):
+            sprints = [os.path.join(args.past_sprints, d)
+                       for d in sorted(os.listdir(args.past_sprints))
+                       if os.path.isdir(os.path.join(args.past_sprints, d))]
+        changed = []
+        removed = []
+        with self.project.locks.exclusive():
+            for directory in sprints:
+                if not os.path.isdir(directory):
+                    print("Not a directory: {}".format(directory))
+                    continue
+                if os.path.exists(jicagile.archive.pack_fpath(directory)):
+                    print("Already exists: {}".format(jicagile.archive.pack_fpath(directory)))
+                    continue
+                with phase("archive.pack"):
+                    fpath, header = jicagile.archive.write_pack(directory)
+                    fpaths = jicagile.archive.remove_directory(directory)
+                changed.append(fpath)
+                removed.extend(fpaths)
+                print("Packed {:d} tasks into {}".format(header["tasks"], fpath))
+            self.project.removed_all(removed)
+        if hasattr(storage, "invalidate"):
+            storage.invalidate()
+        self.stage(changed + removed)
+
+        index = self.search_index()
+        if index is not None:
+            index.remove_all(removed)
+            index.close()
+
+    def layout(self, args):
+        """Show the layout of the task files or convert the project to another."""
+        storage = self.project.storage
+        if args.shards is None:
+            print(storage.layout.name)
+            return
+        if not storage.uses_files:
+            print("Only projects stored as files have a layout")
+            return
+        layout = jicagile.layout.Layout(None if args.shards == "flat" else args.shards)
+        with phase("layout.migrate"):
+            moves = jicagile.layout.migrate(self.project, layout)
         if self.is_git_repo:
-            l = ["git"]
-        l.extend(["mv", args.src, args.dest])
-
-        process = subprocess.Popen(l)
-        process.communicate()
+            self.stage([os.path.normpath(p) for move in moves for p in move] +
+                       [os.path.normpath(storage.layout_fpath)])
+
+        index = self.search_index()
+        if index is not None:
+            index.moved_all(moves)
+            index.close()
+        print("Moved {:d} tasks into the {} layout".format(len(moves), layout.name))
+
+    def search(self, args):
+        """Search the titles of the tasks."""
+        import jicagile.search
+        storage = self.project.storage
+        index = jicagile.search.SearchIndex.open(self.project.directory,
+                                                 create=True)
+        if index.needs_build or args.rebuild:
+            with phase("search.build"):
+                index.build(storage, self.project.directory)
+        try:
+            with phase("search.query"):
+                results = index.search(" ".join(args.terms), args.limit)
+            hits = []
+            for score, fpath, title in results:
+                if not storage.exists(fpath):
+                    # Removed without agl; forget about it.
+                    index.remove(fpath)
+                    continue
+                hits.append(OrderedDict([("fpath", fpath),
+                                         ("title", title),
+                                         ("score", round(score, 3))]))
+        finally:
+            index.close()
+
+        if args.json:
+            print(json.dumps(hits, indent=2, separators=(",", ": ")))
+            return
+        for hit in hits:
+            print(u"{}  {}".format(hit["fpath"], hit["title"]))
+
+    def board(self, args):
+        """Show the interactive board."""
+        import jicagile.board
+        try:
+            jicagile.board.main(self)
+        except KeyboardInterrupt:
+            pass
+
+    def serve(self, args):
+        """Serve a JSON API to the project until interrupted."""
+        import jicagile.server
+        server = jicagile.server.make_server(self.project, args.port,
+                                             args.past_sprints)
+        print("Serving on http://{}:{}/".format(*server.server_address))
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
 
     def theme(self, args):
         """Add or remove a theme from the .theme.yml file."""
-        fpath = os.path.join(self.project.directory, ".themes.yml")
-        themes = jicagile.config.Themes()
-        if os.path.isfile(fpath):
-            themes = jicagile.config.Themes.from_file(fpath)
-
-        if args.subcommand == "add":
-            themes.add_member(args.name, args.description)
-            themes.to_file(fpath)
-        elif args.subcommand == "rm":
-            if args.name not in themes:
-                print("No theme named: {}".format(args.name))
-                print("Existing themes: {}".format(", ".join(themes.lookups)))
-                return
-            del themes[args.name]
-            themes.to_file(fpath)
-
-        if self.is_git_repo:
-            process = subprocess.Popen(["git", "add", fpath])
-            process.communicate()
+        storage = self.project.storage
+        with self.project.locks.writing(storage.themes_fpath):
+            themes = storage.read_themes()
+            if args.subcommand == "add":
+                themes.add_member(args.name, args.description)
+                storage.write_themes(themes)
+            elif args.subcommand == "rm":
+                if args.name not in themes:
+                    print("No theme named: {}".format(args.name))
+                    print("Existing themes: {}".format(", ".join(themes.lookups)))
+                    return
+                del themes[args.name]
+                storage.write_themes(themes)
+
+        self.git_add(storage.themes_fpath)
 
     def teammember(self, args):
         """Add, remove or edit a team memebr from the .team.yml file."""
-        fpath = os.path.join(self.project.directory, ".team.yml")
-        team = jicagile.config.Team()
-        if os.path.isfile(fpath):
-            team = jicagile.config.Team.from_file(fpath)
-        if args.subcommand == "add":
-            team.add_member(args.lookup,
-                            args.first_name,
-                            args.last_name)
-            team.to_file(fpath)
-        elif args.subcommand == "rm":
-            if args.lookup not in team:
-                print("No team member lookup alias: {}".format(args.lookup))
-                print("Existing lookup aliases: {}".format(", ".join(team.lookups)))
+        storage = self.project.storage
+        with self.project.locks.writing(storage.team_fpath):
+            team = storage.read_team()
+            if args.subcommand == "add":
+                team.add_member(args.lookup,
+                                args.first_name,
+                                args.last_name)
+                storage.write_team(team)
+            elif args.subcommand == "rm":
+                if args.lookup not in team:
+                    print("No team member lookup alias: {}".format(args.lookup))
+                    print("Existing lookup aliases: {}".format(", ".join(team.lookups)))
+                    return
+                del team[args.lookup]
+                storage.write_team(team)
+
+        self.git_add(storage.team_fpath)
+
+    def stats(self, args):
+        """Show the number of tasks and story points in the project."""
+        stats = OrderedDict()
+        for name, directory in [("backlog", self.project.backlog_directory),
+                                ("todo", self.project.current_todo_directory),
+                                ("done", self.project.current_done_directory)]:
+            tasks = self.project.tasks(directory)
+            stats[name] = OrderedDict([("tasks", len(tasks)),
+                                       ("storypoints", tasks.storypoints)])
+        data = OrderedDict([("stats", stats)])
+        if args.internals:
+            data["internals"] = jicagile.metrics.snapshot()
+
+        if args.json:
+            print(json.dumps(data, indent=2, separators=(",", ": ")))
+            return
+        for name, entry in stats.items():
+            print("{:8} {:>6d} tasks {:>6d} storypoints".format(
+                name, entry["tasks"], entry["storypoints"]))
+        if args.internals:
+            print("")
+            for name, value in data["internals"].items():
+                print("{:20} {:>10d}".format(name, value))
+
+    def perf(self, args):
+        """Enable, disable or report the local telemetry log."""
+        directory = self.project.directory
+        if args.subcommand == "enable":
+            jicagile.telemetry.enable(directory)
+        elif args.subcommand == "disable":
+            jicagile.telemetry.disable(directory)
+        elif args.subcommand == "report":
+            records = jicagile.telemetry.read_records(directory)
+            summaries = jicagile.telemetry.summarise(records, args.by)
+            if args.json:
+                print(json.dumps(summaries, indent=2, separators=(",", ": ")))
                 return
-            del team[args.lookup]
-            team.to_file(fpath)
-
-        if self.is_git_repo:
-            process = subprocess.Popen(["git", "add", fpath])
-            process.communicate()
+            print("{:20} {:10} {:>6} {:>9} {:>9} {:>9} {:>8}".format(
+                "command", "period", "count", "p50 ms", "p95 ms", "max ms", "size"))
+            for s in summaries:
+                print("{:20} {:10} {:>6d} {:>9.1f} {:>9.1f} {:>9.1f} {:>8d}".format(
+                    s["command"], s["period"], s["count"], s["p50"] * 1000,
+                    s["p95"] * 1000, s["max"] * 1000, s["project_size"]))
+
+    def sqlite(self, args):
+        """Import the YAML files into, or export them from, a SQLite file."""
+        directory = self.project.directory
+        directory_storage = jicagile.storage.DirectoryStorage(
+            os.path.join(directory, ".team.yml"),
+            os.path.join(directory, ".themes.yml"))
+        sqlite_storage = jicagile.storage.SQLiteStorage(
+            os.path.join(directory, jicagile.storage.SQLITE_FNAME),
+            root=directory)
+        if args.subcommand == "import":
+            jicagile.storage.copy_project(directory_storage,
+                                          sqlite_storage,
+                                          directory)
+            self.git_add(sqlite_storage.fpath)
+        elif args.subcommand == "export":
+            jicagile.storage.copy_project(sqlite_storage,
+                                          directory_storage,
+                                          directory)
+
+    def daemon(self, args):
+        """Start, stop or query the resident daemon."""
+        import jicagile.daemon
+        directory = self.project.directory
+        if args.subcommand == "start":
+            jicagile.daemon.Daemon(directory).serve_forever()
+        elif args.subcommand == "stop":
+            if not jicagile.daemon.stop(directory):
+                print("No daemon running")
+        elif args.subcommand == "status":
+            if jicagile.daemon.is_running(directory):
+                print("Daemon running: {}".format(
+                    jicagile.daemon.socket_fpath(directory)))
+            else:
+                print("No daemon running")
+
+
+def add_profile_arguments(parser):
+    """Add the global profiling arguments to a parser."""
+    parser.add_argument("--profile", action="store_true",
+                        help="Print time spent in each phase to stderr (or set AGL_TRACE=1)")
+    parser.add_argument("--profile-output", metavar="FPATH",
+                        help="Write cProfile stats to file")
+
+
+def execute(argv, cli=None, environ=None):
+    """Run the command line arguments.
+
+    An existing :class:`CLI`, e.g. kept by :mod:`jicagile.daemon`, is
+    reused after re-reading the team and themes.
+    """
+    if environ is None:
+        environ = os.environ
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    add_profile_arguments(profile_parser)
+    profile_args, argv = profile_parser.parse_known_args(argv)
+    show_profile = profile_args.profile or environ.get("AGL_TRACE") == "1"
+    telemetry = jicagile.telemetry.is_enabled(".", environ)
+    tracer.reset()
+    if show_profile or telemetry:
+        tracer.enable()
+    else:
+        tracer.disable()
+    jicagile.metrics.reset()
+
+    profiler = None
+    if profile_args.profile_output:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    args = None
+    status = "error"
+    try:
+        with phase("cli.init"):
+            if cli is None:
+                cli = CLI()
+            else:
+                cli.project.reload_config()
+        with phase("cli.parse_args"):
+            args = cli.parse_args(argv)
+        cli.run(args)
+        status = "ok"
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_args.profile_output)
+        if show_profile:
+            tracer.report(sys.stderr)
+        if telemetry and args is not None and args.command != "perf":
+            entry = jicagile.telemetry.entry(args,
+                                             cli.project,
+                                             tracer.total_seconds,
+                                             tracer.phases,
+                                             status)
+            jicagile.telemetry.record(cli.project.directory, entry)
 
 
 def main():
-    cli = CLI()
-    args = cli.parse_args(sys.argv[1:])
-    cli.run(args)
+    import jicagile.daemon
+    status = jicagile.daemon.forward(".", sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+    execute(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,16 @@
 
 import yaml
 
+from jicagile.locking import atomic_write
+from jicagile.metrics import increment
+
 class _Config(dict):
     """Class representing a configuration."""
 
     @classmethod
     def from_yaml(cls, yaml_str):
         """Return a configuration created from a yaml string."""
-        data = yaml.load(yaml_str)
+        data = yaml.load(yaml_str, Loader=yaml.Loader)
         conf = cls()
         if data is None:
             return conf
@@ -19,7 +22,11 @@ class _Config(dict):
     @classmethod
     def from_file(cls, fpath):
         """Return a configuration read in from file."""
-        return cls.from_yaml(file(fpath))
+        with open(fpath) as fh:
+            text = fh.read()
+        increment("files_parsed")
+        increment("bytes_read", len(text))
+        return cls.from_yaml(text)
 
     @property
     def lookups(self):
@@ -63,14 +70,19 @@ class Team(_Config):
             return self[lookup].first_name
         return lookup
 
+    def to_yaml(self):
+        """Return the configuration as a yaml string."""
+        lines = ["---\n"]
+        for m in self.values():
+            lines.append("- lookup: {}\n".format(m.lookup))
+            lines.append("  first_name: {}\n".format(m.first_name))
+            lines.append("  last_name: {}\n".format(m.last_name))
+        return "".join(lines)
+
     def to_file(self, fpath):
-        """Write a configuration to file."""
-        with open(fpath, "w") as fh:
-            fh.write("---\n")
-            for m in self.values():
-                fh.write("- lookup: {}\n".format(m.lookup))
-                fh.write("  first_name: {}\n".format(m.first_name))
-                fh.write("  last_name: {}\n".format(m.last_name))
+        """Write a configuration to file, replacing it in one step."""
+        increment("files_written")
+        atomic_write(fpath, self.to_yaml())
 
 
 class Themes(_Config):
@@ -86,10 +98,15 @@ class Themes(_Config):
             self.lookup = lookup
             self.description = description
 
+    def to_yaml(self):
+        """Return the configuration as a yaml string."""
+        lines = ["---\n"]
+        for m in self.values():
+            lines.append("- lookup: {}\n".format(m.lookup))
+            lines.append("  description: {}\n".format(m.description))
+        return "".join(lines)
+
     def to_file(self, fpath):
-        """Write a configuration to file."""
-        with open(fpath, "w") as fh:
-            fh.write("---\n")
-            for m in self.values():
-                fh.write("- lookup: {}\n".format(m.lookup))
-                fh.write("  description: {}\n".format(m.description))
+        """Write a configuration to file, replacing it in one step."""
+        increment("files_written")
+        atomic_write(fpath, self.to_yaml())
@@ -0,0 +1,216 @@
+"""Resident daemon serving agl commands over a unix socket.
+
+``agl daemon start`` loads the project in the current directory once and
+keeps the tasks, team, themes and compiled templates in memory, watching
+the backlog and current sprint for changes made by hand. It listens
+on the unix socket ``.agl/daemon.sock``. While it is running the ``agl``
+command forwards its arguments to the daemon and prints the response,
+instead of loading the project itself.
+
+Set ``AGL_NO_DAEMON=1`` to bypass a running daemon.
+"""
+
+import json
+import os
+import os.path
+import socket
+import sys
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+STATE_DIRNAME = ".agl"
+SOCKET_FNAME = "daemon.sock"
+
+#: Commands that are always run by the agl process itself.
+LOCAL_COMMANDS = [["daemon"], ["board"], ["serve"]]
+
+#: Environment variables passed on from the client to the daemon.
+FORWARDED_ENVIRONMENT = ["AGL_TRACE", "AGL_TELEMETRY", "ANSI_COLORS_DISABLED"]
+
+
+def socket_fpath(directory):
+    """Return the path to the socket of the daemon serving the directory."""
+    return os.path.join(directory, STATE_DIRNAME, SOCKET_FNAME)
+
+
+def native_str(text):
+    """Return text as a native string, i.e. encoded as UTF-8 under Python 2.
+
+    Arguments decoded from JSON are unicode, whereas those given on the
+    command line are native strings; tasks are written the same either way.
+    """
+    if isinstance(text, str):
+        return text
+    return text.encode("utf-8")
+
+
+def receive(sock):
+    """Return the JSON message read from the socket until end of file."""
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode("utf-8"))
+
+
+def send(directory, request):
+    """Send a request to the daemon and return its response.
+
+    Returns None if no daemon is listening.
+    """
+    fpath = socket_fpath(directory)
+    if not os.path.exists(fpath):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(fpath)
+    except socket.error:
+        sock.close()
+        return None
+    try:
+        sock.sendall(json.dumps(request).encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        return receive(sock)
+    finally:
+        sock.close()
+
+
+def forward(directory, argv):
+    """Run the command in a daemon if one is serving the directory.
+
+    Returns the exit status of the command, or None if it was not run.
+    """
+    if os.environ.get("AGL_NO_DAEMON") == "1":
+        return None
+    if argv[:1] in LOCAL_COMMANDS or "--watch" in argv or "-w" in argv:
+        # Long running commands would keep the daemon from serving others.
+        return None
+    environ = dict((k, os.environ[k]) for k in FORWARDED_ENVIRONMENT
+                   if k in os.environ)
+    response = send(directory, dict(argv=argv, cwd=os.getcwd(), environ=environ))
+    if response is None or response["status"] is None:
+        return None
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+def is_running(directory):
+    """Return True if a daemon is serving the directory."""
+    response = send(directory, dict(ping=True))
+    return response is not None
+
+
+def stop(directory):
+    """Ask the daemon serving the directory to stop.
+
+    Returns False if there was no daemon running.
+    """
+    return send(directory, dict(stop=True)) is not None
+
+
+class Daemon(object):
+    """Serve agl commands for the project in a directory."""
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self.cli = None
+        self.running = False
+
+    def load(self):
+        """Load the project, its tasks and the templates into memory."""
+        import jicagile
+        import jicagile.cli
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import storage_for
+        from jicagile.watch import watcher_for
+        storage = IndexedStorage(storage_for(self.directory))
+        project = jicagile.Project(self.directory, storage=storage)
+        directories = [project.backlog_directory,
+                       project.current_todo_directory,
+                       project.current_done_directory]
+        if storage.uses_files:
+            storage.watch(watcher_for(directories))
+        for directory in directories:
+            project.tasks(directory)
+        self.cli = jicagile.cli.CLI(project=project)
+
+    def handle(self, request):
+        """Return the response to a request."""
+        response = dict(status=0, stdout="", stderr="")
+        if request.get("ping"):
+            return response
+        if request.get("stop"):
+            self.running = False
+            return response
+        if os.path.realpath(request["cwd"]) != os.path.realpath(self.directory):
+            response["status"] = None
+            return response
+
+        from jicagile.cli import execute
+        environ = dict(os.environ)
+        for key in FORWARDED_ENVIRONMENT:
+            environ.pop(key, None)
+        environ.update(request.get("environ", {}))
+
+        stdout, stderr = StringIO(), StringIO()
+        current_out, current_err = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = stdout, stderr
+        try:
+            execute([native_str(arg) for arg in request["argv"]], self.cli, environ)
+        except SystemExit as e:
+            if e.code is None:
+                response["status"] = 0
+            elif isinstance(e.code, int):
+                response["status"] = e.code
+            else:
+                stderr.write("{}\n".format(e.code))
+                response["status"] = 1
+        except Exception:
+            traceback.print_exc()
+            response["status"] = 1
+        finally:
+            sys.stdout, sys.stderr = current_out, current_err
+        response["stdout"] = stdout.getvalue()
+        response["stderr"] = stderr.getvalue()
+        return response
+
+    def serve_forever(self):
+        """Listen on the socket and handle requests until asked to stop."""
+        from jicagile.locking import make_state_directory
+        make_state_directory(self.directory)
+        fpath = socket_fpath(self.directory)
+        if is_running(self.directory):
+            raise(RuntimeError("A daemon is already serving {}".format(
+                os.path.abspath(self.directory))))
+        if os.path.exists(fpath):
+            os.unlink(fpath)
+
+        self.load()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(fpath)
+        server.listen(16)
+        self.running = True
+        try:
+            while self.running:
+                conn, address = server.accept()
+                try:
+                    request = receive(conn)
+                    response = self.handle(request)
+                    conn.sendall(json.dumps(response).encode("utf-8"))
+                except (ValueError, socket.error):
+                    pass
+                finally:
+                    conn.close()
+        finally:
+            server.close()
+            if self.cli.project.storage.watcher is not None:
+                self.cli.project.storage.watcher.close()
+            if os.path.exists(fpath):
+                os.unlink(fpath)
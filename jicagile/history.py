@@ -1,10 +1,16 @@
-"""Write out csv format of historical data."""
+"""Write out csv format of historical data.
+
+Past sprints are either directories of task files or packs written by
+``agl archive pack``, whose totals are read from their headers.
+"""
 
 import argparse
 import os
 import os.path
 
 import jicagile
+from jicagile.archive import is_pack, read_header, sprint_name
+from jicagile.storage import task_fpaths
 
 
 def yield_date_and_subdir(parent_dir):
@@ -14,22 +20,31 @@ def yield_date_and_subdir(parent_dir):
             yield subdir, path
 
 
+def yield_date_and_sprint(parent_dir):
+    """Yield the name and path of each past sprint, directory or pack."""
+    sprints = list(yield_date_and_subdir(parent_dir))
+    sprints.extend((sprint_name(fn), os.path.join(parent_dir, fn))
+                   for fn in os.listdir(parent_dir) if is_pack(fn))
+    for date, path in sorted(sprints):
+        yield date, path
+
+
 def task_collection_from_directory(directory):
     """Return a TaskCollection from a directory."""
     task_collection = jicagile.TaskCollection()
-    fpaths = [os.path.join(directory, fn)
-              for fn in os.listdir(directory)
-              if fn.endswith(".yml") or fn.endswith(".yaml")]
-    for fp in fpaths:
+    for fp in task_fpaths(directory):
         task_collection.append(jicagile.Task.from_file(fp))
     return task_collection
 
 
 def yield_historical_data(directory):
     """Yield historical data as csv strings."""
-    for date, subdir in yield_date_and_subdir(directory):
-        tasks = task_collection_from_directory(subdir)
-        yield "{},{:d}".format(date, tasks.storypoints)
+    for date, path in yield_date_and_sprint(directory):
+        if is_pack(path):
+            storypoints = read_header(path)["storypoints"]
+        else:
+            storypoints = task_collection_from_directory(path).storypoints
+        yield "{},{:d}".format(date, storypoints)
 
 
 def main():
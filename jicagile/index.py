@@ -0,0 +1,279 @@
+"""In-memory index of the tasks of a project.
+
+:class:`IndexedStorage` wraps another storage backend and keeps the tasks,
+team and themes it has read in memory. Before serving a directory from
+memory it checks the modification times and sizes of the files, so only
+files that have changed since they were last read are parsed again.
+
+Given a watcher from :mod:`jicagile.watch`, the watched directories are
+instead kept up to date by applying the changes the watcher reports, so
+they need not be listed and their files need not be checked at all.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+
+import jicagile
+from jicagile.metrics import increment
+from jicagile.layout import task_directory
+from jicagile.storage import sort_fpaths, task_fpaths
+
+
+def file_stamp(fpath):
+    """Return (mtime, size) of the file or None if it does not exist."""
+    increment("files_stat")
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class IndexedStorage(object):
+    """Storage backend keeping the tasks of another backend in memory.
+
+    The tasks returned by :meth:`tasks` are shared with the index and must
+    not be modified; use :meth:`read_task` to get a copy to edit.
+    """
+
+    def __init__(self, backing):
+        self.backing = backing
+        self._directories = {}
+        self._stamps = {}
+        self._config = {}
+        self._fingerprints = {}
+        self.watcher = None
+
+    def __getattr__(self, name):
+        # Delegate attributes such as uses_files and team_fpath.
+        if name == "backing":
+            raise(AttributeError(name))
+        return getattr(self.backing, name)
+
+    def _dkey(self, directory):
+        return os.path.normpath(directory)
+
+    def _backing_stamp(self):
+        """Return stamp of the file of a backend not using one file per task."""
+        fpath = getattr(self.backing, "fpath", None)
+        if fpath is None:
+            return None
+        return file_stamp(fpath)
+
+    def invalidate(self, directory=None):
+        """Forget the tasks in a directory and below, or all tasks."""
+        if directory is None:
+            self._directories = {}
+            self._stamps = {}
+            self._config = {}
+            self._fingerprints = {}
+            return
+        key = self._dkey(directory)
+        prefix = key + os.sep
+        for d in list(self._directories):
+            if d == key or d.startswith(prefix):
+                self._fingerprints.pop(d, None)
+                for fpath in self._directories.pop(d):
+                    self._stamps.pop(fpath, None)
+
+    def _changed(self, fpath):
+        """Forget the fingerprint of the directory of a changed task."""
+        self._fingerprints.pop(self._dkey(task_directory(fpath)), None)
+
+    def _load(self, directory):
+        """Read all the tasks in a directory from the backing storage."""
+        tasks = {}
+        for fpath in self.backing.fpaths(directory):
+            increment("cache_misses")
+            fpath = os.path.normpath(fpath)
+            tasks[fpath] = self.backing.read_task(fpath)
+            if self.backing.uses_files:
+                self._stamps[fpath] = file_stamp(fpath)
+        self._directories[self._dkey(directory)] = tasks
+        self._fingerprints.pop(self._dkey(directory), None)
+        if not self.backing.uses_files:
+            self._stamps[self._dkey(directory)] = self._backing_stamp()
+        return tasks
+
+    def _revalidate(self, directory, tasks):
+        """Re-read the files in the directory that have changed."""
+        directory = self._dkey(directory)
+        fpaths = task_fpaths(directory)
+        for fpath in set(tasks) - set(fpaths):
+            del tasks[fpath]
+            self._stamps.pop(fpath, None)
+            self._changed(fpath)
+        for fpath in fpaths:
+            stamp = file_stamp(fpath)
+            if fpath in tasks and self._stamps.get(fpath) == stamp:
+                increment("cache_hits")
+                continue
+            increment("cache_misses")
+            tasks[fpath] = self.backing.read_task(fpath)
+            self._stamps[fpath] = stamp
+            self._changed(fpath)
+        return tasks
+
+    def watch(self, watcher):
+        """Keep the directories watched by the watcher up to date using it."""
+        self.watcher = watcher
+        for directory in watcher.directories:
+            self.invalidate(directory)
+
+    def apply(self, events):
+        """Update the index with the changes reported by a watcher."""
+        for event in events:
+            if event.kind == "invalidated":
+                self.invalidate(event.fpath)
+                continue
+            fpath = os.path.normpath(event.fpath)
+            tasks = self._directories.get(self._dkey(task_directory(fpath)))
+            if event.kind == "moved":
+                dest = os.path.normpath(event.dest)
+                dest_tasks = self._directories.get(
+                    self._dkey(task_directory(dest)))
+                task = None
+                if tasks is not None:
+                    task = tasks.pop(fpath, None)
+                stamp = self._stamps.pop(fpath, None)
+                self._changed(fpath)
+                if dest_tasks is None:
+                    continue
+                if task is not None and file_stamp(dest) == stamp:
+                    # The parsed task moves along with the file.
+                    increment("cache_hits")
+                    dest_tasks[dest] = task
+                    self._stamps[dest] = stamp
+                    self._changed(dest)
+                else:
+                    self._reread(dest_tasks, dest)
+            elif tasks is None:
+                continue
+            elif event.kind == "deleted":
+                tasks.pop(fpath, None)
+                self._stamps.pop(fpath, None)
+                self._changed(fpath)
+            elif fpath in tasks and file_stamp(fpath) == self._stamps.get(fpath):
+                # Written through the index, which is already up to date.
+                increment("cache_hits")
+            else:
+                self._reread(tasks, fpath)
+
+    def _reread(self, tasks, fpath):
+        increment("cache_misses")
+        self._changed(fpath)
+        try:
+            tasks[fpath] = self.backing.read_task(fpath)
+        except IOError:
+            # Deleted again before the change was applied.
+            tasks.pop(fpath, None)
+            self._stamps.pop(fpath, None)
+            return
+        self._stamps[fpath] = file_stamp(fpath)
+
+    def refresh(self, directory):
+        """Return the up to date dictionary of tasks in a directory."""
+        key = self._dkey(directory)
+        watched = False
+        if self.watcher is not None:
+            self.apply(self.watcher.poll(0))
+            watched = self.watcher.is_watching(key)
+        tasks = self._directories.get(key)
+        if tasks is None:
+            return self._load(directory)
+        if watched:
+            increment("cache_hits", len(tasks))
+            return tasks
+        if self.backing.uses_files:
+            return self._revalidate(directory, tasks)
+        if self._stamps.get(key) != self._backing_stamp():
+            self.invalidate()
+            return self._load(directory)
+        increment("cache_hits", len(tasks))
+        return tasks
+
+    def fpaths(self, directory):
+        """Return sorted list of the task file paths in a directory."""
+        return sort_fpaths(self.refresh(directory))
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        tasks = self.refresh(directory)
+        return jicagile.TaskCollection([tasks[fp] for fp in sort_fpaths(tasks)])
+
+    def read_task(self, fpath):
+        """Return a copy of the task stored at the fpath."""
+        return self.backing.read_task(fpath)
+
+    def write_task(self, task, fpath, keys=None):
+        """Store the task at the fpath."""
+        self.backing.write_task(task, fpath, keys)
+        fpath = os.path.normpath(fpath)
+        tasks = self._directories.get(self._dkey(task_directory(fpath)))
+        if tasks is None:
+            return
+        tasks[fpath] = jicagile.Task(**task)
+        self._changed(fpath)
+        if self.backing.uses_files:
+            self._stamps[fpath] = file_stamp(fpath)
+        else:
+            self._stamps[self._dkey(task_directory(fpath))] = self._backing_stamp()
+
+    def fingerprint(self, directory):
+        """Return a hash of the content of the tasks in a directory.
+
+        The hash is only computed again after the tasks have changed.
+        """
+        tasks = self.refresh(directory)
+        key = self._dkey(directory)
+        if key not in self._fingerprints:
+            data = json.dumps(sorted(tasks.items()), sort_keys=True)
+            self._fingerprints[key] = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return self._fingerprints[key]
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks."""
+        self.backing.move(src, dest)
+        self.moved(src, dest)
+
+    def moved(self, src, dest):
+        """Update the index after a task or directory was moved elsewhere."""
+        if self.backing.uses_files:
+            # Picked up when the directories are next revalidated.
+            return
+        for path in (src, dest):
+            self.invalidate(path)
+            self.invalidate(os.path.dirname(path))
+
+    def _read_config(self, name, fpath, read):
+        stamp = file_stamp(fpath) if fpath else None
+        cached = self._config.get(name)
+        if cached is not None and cached[0] == stamp:
+            increment("cache_hits")
+            return cached[1]
+        increment("cache_misses")
+        config = read()
+        self._config[name] = (stamp, config)
+        return config
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        return self._read_config("team", self.backing.team_fpath,
+                                 self.backing.read_team)
+
+    def write_team(self, team):
+        """Store the :class:`jicagile.config.Team`."""
+        self.backing.write_team(team)
+        self._config.pop("team", None)
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        return self._read_config("themes", self.backing.themes_fpath,
+                                 self.backing.read_themes)
+
+    def write_themes(self, themes):
+        """Store the :class:`jicagile.config.Themes`."""
+        self.backing.write_themes(themes)
+        self._config.pop("themes", None)
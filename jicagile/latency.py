@@ -0,0 +1,233 @@
+"""Measure the per invocation latency of the agl command line tool.
+
+Each subcommand is run many times as a real subprocess against synthetic
+projects, with and without Git, and the p50/p95 wall times are reported
+together with a breakdown of the time spent importing modules::
+
+    python -m jicagile.latency --sizes 1000 --runs 20 --output latency.json
+    python -m jicagile.latency --sizes 1000 --baseline latency.json
+"""
+
+import argparse
+import json
+import os
+import os.path
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import jicagile
+from jicagile.bench import compare, project_directory
+from jicagile.metrics import percentile
+
+COMMANDS = ["add", "edit", "list", "mv", "theme", "teammember"]
+
+#: Modules timed when the interpreter does not support ``-X importtime``.
+IMPORTED_MODULES = ["yaml", "slugify", "jinja2", "colorama", "termcolor",
+                    "jicagile", "jicagile.cli"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def agl_command(args):
+    """Return the command line running agl with the given arguments."""
+    return [sys.executable, "-m", "jicagile.cli"] + list(args)
+
+
+def agl_environment():
+    """Return environment making subprocesses import this copy of jicagile."""
+    env = dict(os.environ)
+    parent = os.path.dirname(os.path.dirname(os.path.abspath(jicagile.__file__)))
+    paths = [parent]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def command_args(command, i, task_fpath):
+    """Return the arguments for the i-th invocation of a subcommand.
+
+    Invocations alternate so that every one of them succeeds and, apart
+    from ``add``, which adds a task each time, the project stays the same
+    size.
+    """
+    if command == "add":
+        return ["add", "Latency task {}".format(i), "3"]
+    if command == "edit":
+        return ["edit", task_fpath, "-s", str([3, 5][i % 2])]
+    if command == "list":
+        return ["list", "backlog"]
+    if command == "mv":
+        if i % 2 == 0:
+            return ["mv", task_fpath, os.path.join("current", "todo")]
+        return ["mv", os.path.join("current", "todo", os.path.basename(task_fpath)),
+                "backlog"]
+    if command == "theme":
+        if i % 2 == 0:
+            return ["theme", "add", "latency", "latency testing"]
+        return ["theme", "rm", "latency"]
+    if command == "teammember":
+        if i % 2 == 0:
+            return ["teammember", "add", "LT", "Latency", "Tester"]
+        return ["teammember", "rm", "LT"]
+    raise(ValueError("Unknown command: {}".format(command)))
+
+
+def prepare_project(size, workdir, git):
+    """Return path to a fresh copy of a synthetic project."""
+    directory = os.path.join(workdir, "latency-{}-{}".format(size, "git" if git else "nogit"))
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    shutil.copytree(project_directory(size, workdir), directory)
+    if git:
+        for cmd in (["git", "init", "-q"],
+                    ["git", "add", "-A"],
+                    ["git", "-c", "user.name=agl", "-c", "user.email=agl@localhost",
+                     "commit", "-q", "-m", "Synthetic project"]):
+            subprocess.check_call(cmd, cwd=directory)
+    return directory
+
+
+def time_command(command, directory, runs):
+    """Return list of wall times of running the subcommand in the project."""
+    backlog = os.path.join(directory, "backlog")
+    task_fpath = os.path.join("backlog", sorted(os.listdir(backlog))[0])
+    env = agl_environment()
+    devnull = open(os.devnull, "w")
+    times = []
+    try:
+        for i in range(runs):
+            cmd = agl_command(command_args(command, i, task_fpath))
+            start = time.time()
+            returncode = subprocess.call(cmd, cwd=directory, env=env,
+                                         stdout=devnull, stderr=devnull)
+            times.append(time.time() - start)
+            if returncode != 0:
+                raise(RuntimeError("Command failed: {}".format(" ".join(cmd))))
+    finally:
+        devnull.close()
+    return times
+
+
+def import_times(directory):
+    """Return list of (module, cumulative seconds) sorted slowest first.
+
+    Uses ``-X importtime`` where the interpreter supports it and otherwise
+    times the import of the main dependencies one after the other.
+    """
+    if sys.version_info >= (3, 7):
+        cmd = [sys.executable, "-X", "importtime", "-m", "jicagile.cli", "list", "backlog"]
+        process = subprocess.Popen(cmd, cwd=directory, env=agl_environment(),
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        timings = []
+        for line in stderr.decode("utf-8").splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match and len(match.group(3)) <= 1:
+                timings.append((match.group(4), int(match.group(2)) / 1e6))
+        return sorted(timings, key=lambda t: -t[1])
+
+    script = "; ".join(["import time, json", "t = {}"] +
+                       ["s = time.time(); import {0}; t['{0}'] = time.time() - s".format(m)
+                        for m in IMPORTED_MODULES] +
+                       ["print(json.dumps(t))"])
+    process = subprocess.Popen([sys.executable, "-c", script], cwd=directory,
+                               env=agl_environment(), stdout=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    timings = json.loads(stdout.decode("utf-8"))
+    return sorted(timings.items(), key=lambda t: -t[1])
+
+
+def run_latency(sizes, workdir, runs=20, commands=COMMANDS, git_modes=(False, True),
+                out=sys.stdout):
+    """Return list of latency results for all commands, sizes and Git modes."""
+    results = []
+    for size in sizes:
+        for git in git_modes:
+            directory = prepare_project(size, workdir, git)
+            for command in commands:
+                times = time_command(command, directory, runs)
+                result = dict(name="agl {}{}".format(command, " [git]" if git else ""),
+                              size=size,
+                              runs=runs,
+                              seconds=percentile(times, 50),
+                              p50=percentile(times, 50),
+                              p95=percentile(times, 95))
+                out.write("{name:24} {size:>8d} p50 {p50:>8.4f}s p95 {p95:>8.4f}s\n".format(**result))
+                results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000",
+                        help="Comma separated project sizes (default: 1000)")
+    parser.add_argument("--runs", type=int, default=20,
+                        help="Number of invocations per command (default: 20)")
+    parser.add_argument("--commands", default=",".join(COMMANDS),
+                        help="Comma separated subcommands (default: all)")
+    parser.add_argument("--git", choices=["both", "yes", "no"], default="both",
+                        help="Run with and/or without Git (default: both)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Number of slowest imports to show (default: 10)")
+    parser.add_argument("--workdir",
+                        help="Directory for generated projects (default: temporary)")
+    parser.add_argument("--output", help="Write results to JSON file")
+    parser.add_argument("--baseline", help="JSON file with baseline results")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slow down of p50 relative to baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    commands = args.commands.split(",")
+    for command in commands:
+        if command not in COMMANDS:
+            parser.error("Unknown command: {}".format(command))
+    git_modes = {"both": (False, True), "yes": (True,), "no": (False,)}[args.git]
+
+    workdir = args.workdir
+    if workdir is None:
+        workdir = tempfile.mkdtemp()
+    elif not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    try:
+        results = run_latency(sizes, workdir, args.runs, commands, git_modes)
+        imports = import_times(project_directory(sizes[0], workdir))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir)
+
+    print("")
+    print("Slowest imports (cumulative):")
+    for module, seconds in imports[:args.top]:
+        print("{:32} {:>8.4f}s".format(module, seconds))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(dict(version=jicagile.__version__,
+                           python=platform.python_version(),
+                           timestamp=time.time(),
+                           results=results,
+                           imports=imports), fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        for result, base, ratio in regressions:
+            print("REGRESSION {} [{}]: p50 {:.4f}s vs {:.4f}s ({:.0%} slower)".format(
+                result["name"], result["size"], result["seconds"],
+                base["seconds"], ratio - 1))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Sharded layout of the task files, for very large projects.
+
+By default the task files of a directory are kept in the directory itself.
+With tens of thousands of tasks listing such a directory, and running Git
+on it, becomes slow, so the files can instead be spread over subdirectories,
+called shards, e.g. ``backlog/_3f/write-report.yml``. Shards are named with
+an underscore followed by two characters, taken either from the hash of the
+file name or from its first two characters.
+
+The layout is stored in the ``.layout.yml`` file next to ``.team.yml``::
+
+    ---
+    shards: hash
+
+Task directories are listed with their shards whatever the layout, so a
+project can be converted, with ``agl layout hash``, ``agl layout prefix`` or
+``agl layout flat``, without anything else having to change.
+"""
+
+import os
+import os.path
+import hashlib
+import re
+
+import yaml
+
+from jicagile.locking import atomic_write, makedirs
+
+LAYOUT_FNAME = ".layout.yml"
+
+SHARD_PREFIX = "_"
+
+#: The ways of choosing the shard of a task file.
+SCHEMES = ("hash", "prefix")
+
+
+def is_shard_name(name):
+    """Return True if the name is that of a shard directory."""
+    return len(name) == 3 and name.startswith(SHARD_PREFIX)
+
+
+def shard_name(fname, scheme):
+    """Return the name of the shard holding the task file of the scheme."""
+    stem = os.path.splitext(fname)[0]
+    if not isinstance(stem, bytes):
+        stem = stem.encode("utf-8")
+    if scheme == "hash":
+        return SHARD_PREFIX + hashlib.md5(stem).hexdigest()[:2]
+    key = re.sub(r"[^0-9a-z]", "_", stem.decode("utf-8").lower()[:2])
+    return SHARD_PREFIX + key.ljust(2, "_")
+
+
+def task_directory(fpath):
+    """Return the directory of a task, i.e. that of its shard if it has one."""
+    directory = os.path.dirname(fpath)
+    if is_shard_name(os.path.basename(directory)):
+        return os.path.dirname(directory)
+    return directory
+
+
+class Layout(object):
+    """Where the task files in a directory go."""
+
+    def __init__(self, shards=None):
+        if shards is not None and shards not in SCHEMES:
+            raise(ValueError("Unknown shard scheme: {}".format(shards)))
+        self.shards = shards
+
+    def __eq__(self, other):
+        return self.shards == other.shards
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def name(self):
+        """Return the name of the layout, i.e. the scheme or "flat"."""
+        return self.shards or "flat"
+
+    @classmethod
+    def from_file(cls, fpath):
+        """Return the layout read in from file, or the flat layout."""
+        if not os.path.isfile(fpath):
+            return cls()
+        with open(fpath) as fh:
+            data = yaml.load(fh.read(), Loader=yaml.Loader)
+        return cls((data or {}).get("shards"))
+
+    def to_file(self, fpath):
+        """Write the layout to file, replacing it in one step."""
+        atomic_write(fpath, "---\nshards: {}\n".format(self.shards))
+
+    def fpath(self, directory, fname):
+        """Return the path to the task file in the directory."""
+        if self.shards is None:
+            return os.path.join(directory, fname)
+        return os.path.join(directory, shard_name(fname, self.shards), fname)
+
+
+def migrate(project, layout):
+    """Move the task files of a project into the layout.
+
+    Shards left empty are removed. Returns list of the (src, dest) of the
+    files moved.
+    """
+    storage = project.storage
+    with project.locks.exclusive():
+        moves = []
+        for directory in storage.directories(project.directory):
+            for fpath in storage.fpaths(directory):
+                dest = layout.fpath(directory, os.path.basename(fpath))
+                if os.path.normpath(dest) != os.path.normpath(fpath):
+                    moves.append((fpath, dest))
+        shards = set()
+        for src, dest in moves:
+            makedirs(os.path.dirname(dest))
+            os.rename(src, dest)
+            if is_shard_name(os.path.basename(os.path.dirname(src))):
+                shards.add(os.path.dirname(src))
+        for shard in sorted(shards):
+            if not os.listdir(shard):
+                os.rmdir(shard)
+
+        if layout.shards is not None:
+            layout.to_file(storage.layout_fpath)
+        elif os.path.isfile(storage.layout_fpath):
+            os.unlink(storage.layout_fpath)
+        if hasattr(storage, "invalidate"):
+            storage.invalidate()
+        project.moved_all(moves)
+    return moves
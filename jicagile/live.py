@@ -0,0 +1,125 @@
+"""Live view of the tasks in a directory, as shown by ``agl list --watch``.
+
+The tasks are kept in a :class:`jicagile.index.IndexedStorage`, so only the
+files that change are read again, and the output is kept as one rendered
+piece per primary contact, so only the groups of the primary contacts whose
+tasks changed are rendered again.
+"""
+
+import os.path
+import sys
+import time
+
+import jicagile
+from jicagile.index import IndexedStorage
+from jicagile.metrics import increment
+from jicagile.profiling import phase
+from jicagile.watch import watcher_for
+
+CLEAR_SCREEN = "\033[H\033[2J"
+
+
+class LiveList(object):
+    """Rendered list of the tasks in a directory kept up to date."""
+
+    def __init__(self, project, directory, template, primary_contact=None,
+                 interval=1.0):
+        self.project = project
+        self.directory = directory
+        self.template = template
+        self.primary_contact = primary_contact
+        self.interval = interval
+
+        storage = project.storage
+        if not isinstance(storage, IndexedStorage):
+            storage = IndexedStorage(storage)
+        if storage.uses_files and storage.watcher is None:
+            storage.watch(watcher_for([directory], interval))
+        self.storage = storage
+
+        self._tasks = {}
+        self._team = None
+        self._storypoints = None
+        self._header = None
+        self._groups = {}
+
+    def _current_tasks(self):
+        tasks = self.storage.refresh(self.directory)
+        if self.primary_contact is None:
+            return dict(tasks)
+        return dict((fpath, task) for fpath, task in tasks.items()
+                    if task["primary_contact"] == self.primary_contact)
+
+    def update(self):
+        """Render the parts of the list that have changed.
+
+        Returns True if the list has changed.
+        """
+        tasks = self._current_tasks()
+        team = self.storage.read_team()
+        if team is not self._team:
+            self._team = team
+            self._groups = {}
+            affected = set(task["primary_contact"] for task in tasks.values())
+        else:
+            affected = set()
+            for fpath in set(tasks) | set(self._tasks):
+                old, new = self._tasks.get(fpath), tasks.get(fpath)
+                if old != new:
+                    affected.update(t["primary_contact"] for t in (old, new) if t)
+        self._tasks = tasks
+
+        collection = jicagile.TaskCollection(tasks[fp] for fp in sorted(tasks))
+        changed = bool(affected)
+        with phase("template.render", items=len(affected)):
+            for pcontact in affected:
+                group = collection.tasks_for(pcontact)
+                if len(group) == 0:
+                    self._groups.pop(pcontact, None)
+                    continue
+                increment("template_renders")
+                self._groups[pcontact] = self.template.module.contact_group(
+                    pcontact, group, team)
+            if collection.storypoints != self._storypoints or self._header is None:
+                increment("template_renders")
+                self._storypoints = collection.storypoints
+                self._header = self.template.module.header(
+                    os.path.basename(self.directory), collection)
+                changed = True
+        return changed
+
+    @property
+    def text(self):
+        """Return the rendered list."""
+        return self._header + u"".join(self._groups[pcontact]
+                                       for pcontact in sorted(self._groups))
+
+    def draw(self, out=sys.stdout):
+        """Write the list, clearing the screen first if out is a terminal."""
+        if getattr(out, "isatty", lambda: False)():
+            out.write(CLEAR_SCREEN)
+        out.write(self.text + u"\n")
+        out.flush()
+
+    def wait(self):
+        """Wait for changes to the directory.
+
+        Returns False if nothing changed.
+        """
+        watcher = self.storage.watcher
+        if watcher is None:
+            time.sleep(self.interval)
+            return True
+        events = watcher.poll(self.interval)
+        self.storage.apply(events)
+        return bool(events)
+
+    def run(self, out=sys.stdout, iterations=None):
+        """Draw the list and redraw it whenever it changes."""
+        self.update()
+        self.draw(out)
+        count = 0
+        while iterations is None or count < iterations:
+            count += 1
+            if self.wait() and self.update():
+                self.draw(out)
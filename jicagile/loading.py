@@ -0,0 +1,176 @@
+"""Load tasks concurrently.
+
+Reading task files is dominated by waiting for the file system, in
+particular on network drives, so reading them from a pool of threads lets
+the reads overlap. The number of threads bounds the number of files read at
+the same time::
+
+    >>> from jicagile.loading import read_tasks
+    >>> tasks = read_tasks(["backlog/a.yml", "backlog/b.yml"], max_workers=4)
+
+On Python 3 the asyncio variants return futures that can be awaited from a
+coroutine without blocking the event loop::
+
+    tasks = await jicagile.TaskCollection.afrom_directory("backlog")
+    project = await jicagile.Project.aopen(".")
+    todo = await project.atasks(project.current_todo_directory)
+
+The reads and parses then run in an executor, by default the default
+executor of the event loop, whose number of workers bounds the concurrency.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import jicagile
+from jicagile.storage import task_fpaths
+
+#: Default number of files read at the same time.
+DEFAULT_WORKERS = 8
+
+
+def read_tasks(fpaths, max_workers=DEFAULT_WORKERS, read=None):
+    """Return list of the tasks read from the fpaths, in the same order.
+
+    The files are read by up to max_workers threads at a time.
+    """
+    if read is None:
+        read = jicagile.Task.from_file
+    fpaths = list(fpaths)
+    if max_workers <= 1 or len(fpaths) <= 1:
+        return [read(fp) for fp in fpaths]
+    pool = ThreadPool(min(max_workers, len(fpaths)))
+    try:
+        return pool.map(read, fpaths)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def load_directories(storage, directories, max_workers=DEFAULT_WORKERS):
+    """Return list of the :class:`jicagile.TaskCollection` in the directories.
+
+    For storage backends with one file per task the files of all the
+    directories are read concurrently. Other backends, and indexes already
+    holding the tasks in memory, are read directly.
+    """
+    from jicagile.index import IndexedStorage
+    if not storage.uses_files or isinstance(storage, IndexedStorage):
+        return [storage.tasks(d) for d in directories]
+    listings = [storage.fpaths(d) for d in directories]
+    tasks = read_tasks([fp for fpaths in listings for fp in fpaths],
+                       max_workers, storage.read_task)
+    collections = []
+    start = 0
+    for fpaths in listings:
+        collections.append(jicagile.TaskCollection(tasks[start:start + len(fpaths)]))
+        start += len(fpaths)
+    return collections
+
+
+def _asyncio():
+    try:
+        import asyncio
+    except ImportError:
+        raise(RuntimeError("The asynchronous API requires asyncio (Python 3)"))
+    return asyncio
+
+
+def _copy_outcome(source, destination):
+    """Give the destination future the outcome of the source future."""
+    if destination.done():
+        return
+    if source.cancelled():
+        destination.cancel()
+    elif source.exception() is not None:
+        destination.set_exception(source.exception())
+    else:
+        destination.set_result(source.result())
+
+
+def _then(loop, future, func):
+    """Return future of func applied to the result of the future.
+
+    If func returns a future, the returned future has its outcome.
+    """
+    asyncio = _asyncio()
+    outer = loop.create_future()
+
+    def done(f):
+        if f.cancelled() or f.exception() is not None:
+            _copy_outcome(f, outer)
+            return
+        try:
+            value = func(f.result())
+        except Exception as e:
+            outer.set_exception(e)
+            return
+        if asyncio.isfuture(value):
+            value.add_done_callback(lambda v: _copy_outcome(v, outer))
+        else:
+            outer.set_result(value)
+
+    future.add_done_callback(done)
+    return outer
+
+
+def _run(loop, executor, func, *args):
+    return loop.run_in_executor(executor, func, *args)
+
+
+def aread_tasks(fpaths, executor=None, loop=None, read=None):
+    """Return future of the list of tasks read from the fpaths."""
+    asyncio = _asyncio()
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if read is None:
+        read = jicagile.Task.from_file
+    futures = [_run(loop, executor, read, fp) for fp in fpaths]
+    if not futures:
+        empty = loop.create_future()
+        empty.set_result([])
+        return empty
+    return _then(loop, asyncio.gather(*futures), list)
+
+
+def afrom_directory(directory, executor=None, loop=None,
+                    collection=None):
+    """Return future of the :class:`jicagile.TaskCollection` in a directory."""
+    asyncio = _asyncio()
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if collection is None:
+        collection = jicagile.TaskCollection
+    listing = _run(loop, executor, task_fpaths, directory)
+    tasks = _then(loop, listing,
+                  lambda fpaths: aread_tasks(fpaths, executor, loop))
+    return _then(loop, tasks, collection)
+
+
+def aproject_tasks(project, directory, executor=None, loop=None):
+    """Return future of the :class:`jicagile.TaskCollection` in a directory."""
+    asyncio = _asyncio()
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    storage = project.storage
+    if not storage.uses_files:
+        # Backends such as SQLite must be used from the thread that opened them.
+        future = loop.create_future()
+        future.set_result(project.tasks(directory))
+        return future
+    listing = _run(loop, executor, storage.fpaths, directory)
+    tasks = _then(loop, listing, lambda fpaths: aread_tasks(
+        fpaths, executor, loop, storage.read_task))
+    return _then(loop, tasks, jicagile.TaskCollection)
+
+
+def aopen_project(args, kwargs, executor=None, loop=None):
+    """Return future of a :class:`jicagile.Project` created in the executor."""
+    asyncio = _asyncio()
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    storage = kwargs.get("storage")
+    if storage is not None and not storage.uses_files:
+        future = loop.create_future()
+        future.set_result(jicagile.Project(*args, **kwargs))
+        return future
+    return _run(loop, executor, lambda: jicagile.Project(*args, **kwargs))
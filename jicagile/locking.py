@@ -0,0 +1,232 @@
+"""File locks and atomic writes, so that several agl processes can share a project.
+
+Each project has a reader/writer lock, the file ``.agl/locks/project.lock``.
+Reading tasks holds it shared, so readers never wait for each other.
+Changing a single task also holds it shared, along with an exclusive lock
+on the task, so that different tasks are changed in parallel. Changing many
+tasks at once, i.e. moving a directory or committing a transaction, holds it
+exclusively.
+
+The task locks are striped: a task is locked through one of
+:data:`TASK_LOCK_STRIPES` lock files, chosen from its file name, so that the
+number of lock files stays bounded and tasks with the same file name, which
+clash, share a lock.
+
+Files are written with :func:`atomic_write`, i.e. to a temporary file that
+is renamed over the old one, so readers see either the old or the new
+content but never a partly written file.
+
+The lock files are opened read-only, so that the users sharing a checkout
+share its locks whoever created them. Where they can not be created, e.g.
+in a read-only checkout, readers go unlocked.
+
+The locks use ``fcntl.flock``; where it is not available, e.g. on Windows,
+they do nothing. They coordinate processes; the threads of a process share
+its locks.
+"""
+
+import os
+import os.path
+import contextlib
+import errno
+import stat
+import threading
+import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STATE_DIRNAME = ".agl"
+GITIGNORE_FNAME = ".gitignore"
+LOCKS_DIRNAME = "locks"
+PROJECT_LOCK_FNAME = "project.lock"
+
+#: Number of lock files shared by the tasks of a project.
+TASK_LOCK_STRIPES = 64
+
+#: Errors opening a lock file on which readers go unlocked.
+_UNLOCKABLE_ERRNOS = (errno.EACCES, errno.EPERM, errno.EROFS)
+
+
+def makedirs(directory):
+    """Create a directory, unless another process has just done so."""
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(directory):
+            raise
+
+
+def make_state_directory(directory):
+    """Create the state directory of the project directory, unless it exists.
+
+    A new state directory is given a ``.gitignore`` file ignoring all of it,
+    so that the catalog, indexes and locks stay out of git.
+
+    :returns: path to the state directory
+    """
+    state_dir = os.path.join(directory, STATE_DIRNAME)
+    if os.path.isdir(state_dir):
+        return state_dir
+    try:
+        os.makedirs(state_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(state_dir):
+            raise
+        # Created, and ignored, by another process.
+        return state_dir
+    atomic_write(os.path.join(state_dir, GITIGNORE_FNAME), "*\n")
+    return state_dir
+
+
+def _replace(src, dest):
+    try:
+        os.rename(src, dest)
+    except OSError:
+        if os.name != "nt" or not os.path.exists(dest):
+            raise
+        # Windows does not rename over existing files.
+        os.remove(dest)
+        os.rename(src, dest)
+
+
+def atomic_write(fpath, text):
+    """Write text to the file, replacing any previous content in one step."""
+    directory, fname = os.path.split(fpath)
+    tmp_fpath = os.path.join(directory, ".{}.{}.tmp".format(fname, uuid.uuid4().hex))
+    fd = os.open(tmp_fpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "w") as fh:
+            fh.write(text)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if os.path.exists(fpath):
+            os.chmod(tmp_fpath, stat.S_IMODE(os.stat(fpath).st_mode))
+        _replace(tmp_fpath, fpath)
+    except:
+        if os.path.exists(tmp_fpath):
+            os.unlink(tmp_fpath)
+        raise
+
+
+def task_stripe(fpath):
+    """Return the number of the lock file of the task at fpath."""
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    if not isinstance(name, bytes):
+        name = name.encode("utf-8")
+    return (zlib.crc32(name) & 0xffffffff) % TASK_LOCK_STRIPES
+
+
+class _FileLock(object):
+    """Lock on a file, reentrant within a process."""
+
+    def __init__(self, fpath, directory):
+        self.fpath = fpath
+        self.directory = directory
+        self._fd = None
+        self._shared = 0
+        self._exclusive = 0
+        self._mutex = threading.Lock()
+
+    def _flock(self, operation):
+        if self._fd is None:
+            make_state_directory(self.directory)
+            makedirs(os.path.dirname(self.fpath))
+            self._fd = os.open(self.fpath, os.O_RDONLY | os.O_CREAT, 0o666)
+        fcntl.flock(self._fd, getattr(fcntl, operation))
+
+    def _release(self):
+        if self._fd is None:
+            # Shared without a lock file.
+            return
+        if self._shared:
+            self._flock("LOCK_SH")
+        else:
+            os.close(self._fd)
+            self._fd = None
+
+    @contextlib.contextmanager
+    def shared(self):
+        """Return context manager holding the lock shared."""
+        with self._mutex:
+            if not self._shared and not self._exclusive:
+                try:
+                    self._flock("LOCK_SH")
+                except (IOError, OSError) as e:
+                    if e.errno not in _UNLOCKABLE_ERRNOS:
+                        raise
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._mutex:
+                self._shared -= 1
+                if not self._shared and not self._exclusive:
+                    self._release()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Return context manager holding the lock exclusively."""
+        with self._mutex:
+            if not self._exclusive:
+                self._flock("LOCK_EX")
+            self._exclusive += 1
+        try:
+            yield
+        finally:
+            with self._mutex:
+                self._exclusive -= 1
+                if not self._exclusive:
+                    self._release()
+
+
+@contextlib.contextmanager
+def _unlocked():
+    yield
+
+
+class ProjectLocks(object):
+    """The project and task locks of a project directory.
+
+    Without a directory, e.g. for projects kept in memory, nothing is locked.
+    """
+
+    def __init__(self, directory=None):
+        self.enabled = directory is not None and fcntl is not None
+        if directory is None:
+            return
+        self.project_directory = directory
+        self.directory = os.path.join(directory, STATE_DIRNAME, LOCKS_DIRNAME)
+        self._project = _FileLock(os.path.join(self.directory, PROJECT_LOCK_FNAME),
+                                  directory)
+        self._tasks = {}
+
+    def reading(self):
+        """Return context manager for reading tasks."""
+        if not self.enabled:
+            return _unlocked()
+        return self._project.shared()
+
+    @contextlib.contextmanager
+    def writing(self, fpath):
+        """Return context manager for changing the task, or file, at fpath."""
+        if not self.enabled:
+            yield
+            return
+        stripe = task_stripe(fpath)
+        if stripe not in self._tasks:
+            self._tasks[stripe] = _FileLock(os.path.join(
+                self.directory, "task-{:02d}.lock".format(stripe)),
+                self.project_directory)
+        with self._project.shared():
+            with self._tasks[stripe].exclusive():
+                yield
+
+    def exclusive(self):
+        """Return context manager for changing any number of tasks."""
+        if not self.enabled:
+            return _unlocked()
+        return self._project.exclusive()
@@ -0,0 +1,81 @@
+"""Counters describing the work done by jicagile in the current process.
+
+The counters are always on; incrementing one is a dictionary update under a
+lock, so that tasks loaded by several threads are counted correctly. Use
+:func:`snapshot` to read them and :func:`reset` to start counting afresh::
+
+    >>> import jicagile.metrics
+    >>> jicagile.metrics.reset()
+    >>> jicagile.metrics.increment("files_parsed")
+    >>> jicagile.metrics.snapshot()["files_parsed"]
+    1
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+#: Names of the counters kept.
+COUNTERS = [
+    "files_stat",
+    "directories_listed",
+    "files_parsed",
+    "bytes_read",
+    "files_written",
+    "cache_hits",
+    "cache_misses",
+    "git_subprocesses",
+    "template_renders",
+    "slugs_computed",
+]
+
+
+class Metrics(object):
+    """Collection of named counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set all counters to zero."""
+        self.counters = OrderedDict((name, 0) for name in COUNTERS)
+
+    def increment(self, name, n=1):
+        """Increment a counter."""
+        if name not in self.counters:
+            raise(KeyError("Unknown counter: {}".format(name)))
+        with self._lock:
+            self.counters[name] += n
+
+    def snapshot(self):
+        """Return a copy of the counters."""
+        return OrderedDict(self.counters)
+
+
+#: The metrics kept throughout jicagile.
+metrics = Metrics()
+
+
+def increment(name, n=1):
+    """Increment a counter of the module metrics."""
+    metrics.increment(name, n)
+
+
+def snapshot():
+    """Return a copy of the counters of the module metrics."""
+    return metrics.snapshot()
+
+
+def reset():
+    """Set all counters of the module metrics to zero."""
+    metrics.reset()
+
+
+def percentile(values, q):
+    """Return the q-th percentile of the values using the nearest rank."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = int(math.ceil(q / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
@@ -0,0 +1,176 @@
+"""Aggregate the tasks of several projects, as done by ``agl multi``.
+
+The projects are opened with their team and themes read once per file, so
+projects sharing a configuration file, e.g. through a symbolic link, parse
+it only once. The task files of all the projects are then read together by
+a pool of threads.
+"""
+
+import os
+import os.path
+import errno
+import threading
+from collections import OrderedDict
+
+import jicagile
+from jicagile.config import Team
+from jicagile.loading import DEFAULT_WORKERS, read_tasks
+from jicagile.storage import storage_for
+
+DIRECTORY_NAMES = ["backlog", "todo", "done"]
+
+
+def project_roots(paths):
+    """Return list of project roots.
+
+    A single path to a file is read as a list of project roots, one per
+    line; blank lines and lines starting with # are skipped.
+    """
+    if len(paths) == 1 and os.path.isfile(paths[0]):
+        with open(paths[0]) as fh:
+            return [line.strip() for line in fh
+                    if line.strip() and not line.strip().startswith("#")]
+    return list(paths)
+
+
+def project_labels(roots):
+    """Return list of short labels for the project roots."""
+    names = [os.path.basename(os.path.abspath(r)) for r in roots]
+    return [name if names.count(name) == 1 else root
+            for name, root in zip(names, roots)]
+
+
+class ConfigCache(object):
+    """Team and themes read at most once per file."""
+
+    def __init__(self):
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    def read(self, kind, fpath, read):
+        """Return the configuration of the kind stored at the fpath."""
+        if fpath is None:
+            return read()
+        key = (kind, os.path.realpath(fpath))
+        with self._lock:
+            if key not in self._configs:
+                self._configs[key] = read()
+            return self._configs[key]
+
+
+class SharedConfigStorage(object):
+    """Storage backend reading the team and themes through a cache."""
+
+    def __init__(self, backing, cache):
+        self.backing = backing
+        self.cache = cache
+
+    def __getattr__(self, name):
+        if name == "backing":
+            raise(AttributeError(name))
+        return getattr(self.backing, name)
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        return self.cache.read("team", self.backing.team_fpath,
+                               self.backing.read_team)
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        return self.cache.read("themes", self.backing.themes_fpath,
+                               self.backing.read_themes)
+
+
+def open_projects(roots, cache=None):
+    """Return list of the :class:`jicagile.Project` at the roots.
+
+    Raises IOError if a root is not an existing directory, rather than
+    creating a new project there.
+    """
+    for root in roots:
+        if not os.path.isdir(root):
+            raise(IOError(errno.ENOENT, "No such project directory", root))
+    if cache is None:
+        cache = ConfigCache()
+    return [jicagile.Project(root,
+                             storage=SharedConfigStorage(storage_for(root), cache))
+            for root in roots]
+
+
+def project_directories(project):
+    """Return list of the backlog, todo and done directories of a project."""
+    return [project.backlog_directory,
+            project.current_todo_directory,
+            project.current_done_directory]
+
+
+def load_projects(projects, names=DIRECTORY_NAMES, max_workers=DEFAULT_WORKERS):
+    """Return list with a dictionary of task collections per project.
+
+    The dictionaries map the directory names to :class:`jicagile.TaskCollection`.
+    The task files of all the projects are read concurrently.
+    """
+    indices = [DIRECTORY_NAMES.index(name) for name in names]
+    loaded = [OrderedDict() for project in projects]
+    items = []
+    for project, collections in zip(projects, loaded):
+        directories = project_directories(project)
+        for name, index in zip(names, indices):
+            if not project.storage.uses_files:
+                # E.g. SQLite, which must be read from the thread that opened it.
+                collections[name] = project.tasks(directories[index])
+                continue
+            fpaths = project.storage.fpaths(directories[index])
+            collections[name] = jicagile.TaskCollection()
+            items.extend((collections[name], project.storage.read_task, fp)
+                         for fp in fpaths)
+
+    tasks = read_tasks(items, max_workers, lambda item: item[1](item[2]))
+    for (collection, read, fpath), task in zip(items, tasks):
+        collection.append(task)
+    return loaded
+
+
+def merged_team(projects):
+    """Return a team with the members of the teams of all the projects."""
+    team = Team()
+    for project in projects:
+        for lookup, member in project.team.items():
+            if lookup not in team:
+                team[lookup] = member
+    return team
+
+
+def labelled_tasks(labels, loaded, name):
+    """Return collection of the tasks in a directory of all the projects.
+
+    Each task is a copy with the label of its project under "project".
+    """
+    merged = jicagile.TaskCollection()
+    for label, collections in zip(labels, loaded):
+        for task in collections[name]:
+            task = jicagile.Task(**task)
+            task["project"] = label
+            merged.append(task)
+    return merged
+
+
+def stats(labels, loaded):
+    """Return the story points per project and per primary contact."""
+    projects = OrderedDict()
+    contacts = OrderedDict()
+    for label, collections in zip(labels, loaded):
+        projects[label] = OrderedDict()
+        for name, tasks in collections.items():
+            projects[label][name] = OrderedDict([
+                ("tasks", len(tasks)),
+                ("storypoints", tasks.storypoints)])
+            for task in tasks:
+                pcontact = task["primary_contact"]
+                if pcontact not in contacts:
+                    contacts[pcontact] = OrderedDict(
+                        (n, 0) for n in collections.keys())
+                contacts[pcontact][name] += task["storypoints"]
+    sorted_contacts = OrderedDict((k, contacts[k])
+                                  for k in sorted(contacts, key=lambda k: (k is not None, k)))
+    return OrderedDict([("projects", projects), ("contacts", sorted_contacts)])
@@ -0,0 +1,91 @@
+"""Record the wall time spent in the phases of an agl invocation.
+
+Phases are recorded by wrapping code in :func:`phase`::
+
+    with phase("tasks.parse", items=len(fpaths)):
+        ...
+
+Nothing is recorded unless the module level :data:`tracer` has been
+enabled, which the command line tool does when given the ``--profile``
+flag or when the ``AGL_TRACE`` environment variable is set to ``1``.
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Tracer(object):
+    """Accumulate calls, items and wall time for named phases."""
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = None
+        self.phases = OrderedDict()
+
+    def enable(self):
+        """Start recording phases."""
+        self.enabled = True
+        self.start_time = time.time()
+
+    def disable(self):
+        """Stop recording phases."""
+        self.enabled = False
+
+    def reset(self):
+        """Forget all recorded phases."""
+        self.phases = OrderedDict()
+        self.start_time = time.time()
+
+    def record(self, name, seconds, items=0):
+        """Add a call to a phase."""
+        if name not in self.phases:
+            self.phases[name] = dict(calls=0, items=0, seconds=0.0)
+        entry = self.phases[name]
+        entry["calls"] += 1
+        entry["items"] += items
+        entry["seconds"] += seconds
+
+    @contextmanager
+    def phase(self, name, items=0):
+        """Context manager recording the wall time of a phase."""
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start, items)
+
+    @property
+    def total_seconds(self):
+        """Return the wall time since the tracer was enabled."""
+        if self.start_time is None:
+            return 0.0
+        return time.time() - self.start_time
+
+    def report(self, out=sys.stderr):
+        """Write a breakdown of the phases."""
+        total = self.total_seconds
+        out.write("{:32} {:>6} {:>8} {:>10} {:>6}\n".format(
+            "phase", "calls", "items", "ms", "%"))
+        for name, entry in self.phases.items():
+            out.write("{:32} {:>6d} {:>8d} {:>10.2f} {:>6.1f}\n".format(
+                name,
+                entry["calls"],
+                entry["items"],
+                entry["seconds"] * 1000,
+                100 * entry["seconds"] / max(total, 1e-9)))
+        out.write("{:32} {:>6} {:>8} {:>10.2f} {:>6.1f}\n".format(
+            "total", "", "", total * 1000, 100.0))
+
+
+#: The tracer used throughout jicagile.
+tracer = Tracer()
+
+
+def phase(name, items=0):
+    """Return context manager recording a phase using the module tracer."""
+    return tracer.phase(name, items)
@@ -0,0 +1,330 @@
+"""Full text search over the titles of the tasks, as done by ``agl search``.
+
+The titles are split into lower case tokens with accents removed, so that
+"cafe" also finds titles with an accented "e", and stored in an inverted
+index in the SQLite file ``.agl/search.sqlite``. The ``agl add``, ``agl edit`` and ``agl mv``
+commands keep the index up to date once it exists; it is built the first
+time ``agl search`` is run. Titles edited by hand are picked up when the
+index is rebuilt with ``agl search --rebuild``.
+
+The same index resolves the fuzzy task references accepted by ``agl edit``
+and ``agl mv``, e.g. ``agl edit web-ser -s 5``. A reference matches the
+tasks whose file name starts with its slug, failing that the tasks whose
+title contains it, and failing that the tasks sharing most of its trigrams
+(runs of three characters), which forgives typos.
+"""
+
+import math
+import os
+import os.path
+import re
+import sqlite3
+import unicodedata
+
+from slugify import slugify
+
+from jicagile.locking import make_state_directory
+
+STATE_DIRNAME = ".agl"
+INDEX_FNAME = "search.sqlite"
+
+TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+#: Version of the database layout; older indexes are rebuilt.
+SCHEMA_VERSION = 2
+
+#: Fraction of the trigrams of a reference a title must share to match it.
+TRIGRAM_THRESHOLD = 0.6
+
+
+def index_fpath(directory):
+    """Return the path to the search index of the project directory."""
+    return os.path.join(directory, STATE_DIRNAME, INDEX_FNAME)
+
+
+def text_type(text):
+    """Return the text as unicode, decoding UTF-8 byte strings.
+
+    SQLite refuses byte strings that are not ASCII.
+    """
+    if isinstance(text, bytes):
+        return text.decode("utf-8")
+    return text
+
+
+def normalise(text):
+    """Return lower case text without accents."""
+    text = unicodedata.normalize("NFKD", text_type(text))
+    return u"".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokens(text):
+    """Return list of the normalised tokens in the text."""
+    return TOKEN_REGEX.findall(normalise(text))
+
+
+def trigrams(text, pad=True):
+    """Return set of the runs of three characters in the normalised text.
+
+    With pad the start and end of the text are marked by spaces.
+    """
+    text = u" ".join(tokens(text))
+    if pad:
+        text = u" {} ".format(text)
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def task_name(fpath):
+    """Return the file name of a task without its extension."""
+    return os.path.splitext(os.path.basename(fpath))[0]
+
+
+class SearchIndex(object):
+    """Inverted indexes from title tokens and trigrams to task paths."""
+
+    schema = """
+CREATE TABLE IF NOT EXISTS tasks (
+    fpath TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_name ON tasks (name);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    fpath TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_token ON postings (token, fpath);
+CREATE INDEX IF NOT EXISTS postings_fpath ON postings (fpath);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram TEXT NOT NULL,
+    fpath TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trigrams_trigram ON trigrams (trigram, fpath);
+CREATE INDEX IF NOT EXISTS trigrams_fpath ON trigrams (fpath);
+"""
+
+    def __init__(self, fpath):
+        self.fpath = fpath
+        self.connection = sqlite3.connect(fpath)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        columns = [r[1] for r in
+                   self.connection.execute("PRAGMA table_info(tasks)")]
+        if version not in (0, SCHEMA_VERSION) or (columns and "name" not in columns):
+            # Written by another version of agl.
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS tasks;"
+                "DROP TABLE IF EXISTS postings;"
+                "DROP TABLE IF EXISTS trigrams;")
+        self.connection.executescript(self.schema)
+
+    @classmethod
+    def open(cls, directory, create=False):
+        """Return the search index of the project directory.
+
+        Returns None if there is no index and create is False.
+        """
+        fpath = index_fpath(directory)
+        if not os.path.isfile(fpath):
+            if not create:
+                return None
+            make_state_directory(directory)
+        return cls(fpath)
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    @property
+    def needs_build(self):
+        """Return True if the index has to be built before it can be used."""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        return version != SCHEMA_VERSION
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def _remove(self, fpath):
+        fpath = text_type(fpath)
+        self.connection.execute("DELETE FROM tasks WHERE fpath = ?", (fpath,))
+        self.connection.execute("DELETE FROM postings WHERE fpath = ?", (fpath,))
+        self.connection.execute("DELETE FROM trigrams WHERE fpath = ?", (fpath,))
+
+    def _add(self, fpath, title):
+        fpath = text_type(fpath)
+        title = text_type(title)
+        self._remove(fpath)
+        self.connection.execute("INSERT INTO tasks VALUES (?, ?, ?)",
+                                (fpath, task_name(fpath), title))
+        self.connection.executemany("INSERT INTO postings VALUES (?, ?)",
+                                    [(t, fpath) for t in set(tokens(title))])
+        self.connection.executemany("INSERT INTO trigrams VALUES (?, ?)",
+                                    [(t, fpath) for t in trigrams(title)])
+
+    def add(self, fpath, title):
+        """Index the title of the task at the fpath."""
+        with self.connection:
+            self._add(os.path.normpath(fpath), title)
+
+    def remove(self, fpath):
+        """Remove the task at the fpath from the index."""
+        with self.connection:
+            self._remove(os.path.normpath(fpath))
+
+    def remove_all(self, fpaths):
+        """Remove several tasks from the index at once."""
+        with self.connection:
+            for fpath in fpaths:
+                self._remove(os.path.normpath(fpath))
+
+    def _moved(self, src, dest):
+        src = text_type(os.path.normpath(src))
+        dest = text_type(os.path.normpath(dest))
+        prefix = src + os.sep
+        rows = self.connection.execute(
+            "SELECT fpath FROM tasks WHERE fpath = ? OR "
+            "(fpath >= ? AND fpath < ?)",
+            (src, prefix, prefix + u"\uffff")).fetchall()
+        for (fpath,) in rows:
+            new_fpath = dest + fpath[len(src):]
+            for table in ("postings", "trigrams"):
+                self.connection.execute(
+                    "UPDATE {} SET fpath = ? WHERE fpath = ?".format(table),
+                    (new_fpath, fpath))
+            self.connection.execute(
+                "UPDATE tasks SET fpath = ?, name = ? WHERE fpath = ?",
+                (new_fpath, task_name(new_fpath), fpath))
+
+    def moved(self, src, dest):
+        """Update the paths of a task, or directory of tasks, moved to dest."""
+        with self.connection:
+            self._moved(src, dest)
+
+    def moved_all(self, moves):
+        """Update the paths of several tasks, given as (src, dest), at once."""
+        with self.connection:
+            for src, dest in moves:
+                self._moved(src, dest)
+
+    def build(self, storage, root="."):
+        """Index all the tasks in the storage below root."""
+        with self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.execute("DELETE FROM postings")
+            self.connection.execute("DELETE FROM trigrams")
+            for directory in storage.directories(root):
+                for fpath in storage.fpaths(directory):
+                    task = storage.read_task(fpath)
+                    self._add(os.path.normpath(fpath), task["title"])
+            self.connection.execute(
+                "PRAGMA user_version = {:d}".format(SCHEMA_VERSION))
+
+    def _matches(self, term):
+        """Return dictionary of the tasks with a token starting with the term.
+
+        The values are True for tasks with a token equal to the term.
+        """
+        matches = {}
+        cursor = self.connection.execute(
+            "SELECT token, fpath FROM postings WHERE token >= ? AND token < ?",
+            (term, term + u"\uffff"))
+        for token, fpath in cursor:
+            matches[fpath] = matches.get(fpath, False) or token == term
+        return matches
+
+    def search(self, query, limit=20):
+        """Return list of (score, fpath, title) of the tasks matching the query.
+
+        A task matches if each term of the query is the start of a token in
+        its title. Rare terms and whole token matches score higher.
+        """
+        terms = sorted(set(tokens(query)))
+        if not terms:
+            return []
+        total = max(len(self), 1)
+        scores = None
+        for term in terms:
+            matches = self._matches(term)
+            idf = math.log(1.0 + float(total) / max(len(matches), 1))
+            if scores is None:
+                scores = dict((fp, 0.0) for fp in matches)
+            for fpath in list(scores):
+                if fpath not in matches:
+                    del scores[fpath]
+                else:
+                    scores[fpath] += idf * (1.0 if matches[fpath] else 0.5)
+            if not scores:
+                return []
+
+        # Only look up the titles of the best scoring tasks.
+        ranked = sorted(scores.items(), key=lambda i: -i[1])
+        if len(ranked) > limit:
+            cutoff = ranked[limit - 1][1]
+            ranked = [(fp, score) for fp, score in ranked if score >= cutoff]
+        results = []
+        for fpath, score in ranked:
+            title = self.connection.execute(
+                "SELECT title FROM tasks WHERE fpath = ?", (fpath,)).fetchone()[0]
+            results.append((score, fpath, title))
+        results.sort(key=lambda r: (-r[0], len(r[2]), r[1]))
+        return results[:limit]
+
+    def _titles(self, fpaths):
+        return [(fp, self.connection.execute(
+            "SELECT title FROM tasks WHERE fpath = ?", (fp,)).fetchone()[0])
+            for fp in sorted(fpaths)]
+
+    def _trigram_counts(self, reference_trigrams):
+        """Return dictionary of the number of trigrams shared by each task."""
+        counts = {}
+        for trigram in reference_trigrams:
+            cursor = self.connection.execute(
+                "SELECT fpath FROM trigrams WHERE trigram = ?", (trigram,))
+            for (fpath,) in cursor:
+                counts[fpath] = counts.get(fpath, 0) + 1
+        return counts
+
+    def resolve(self, reference):
+        """Return sorted list of (fpath, title) of the tasks matching a reference.
+
+        The tasks whose file name starts with the slug of the reference are
+        returned if there are any, then those whose title contains the
+        reference and then those sharing most of its trigrams. A reference
+        such as ``backlog/web`` only matches tasks in that directory.
+        """
+        directory, reference = os.path.split(text_type(reference))
+        prefix = os.path.normpath(directory) + os.sep if directory else ""
+
+        def within(rows):
+            return sorted(r for r in rows if r[0].startswith(prefix))
+
+        slug = slugify(reference)
+        if slug:
+            rows = within(self.connection.execute(
+                "SELECT fpath, title FROM tasks WHERE name >= ? AND name < ?",
+                (slug, slug + u"\uffff")))
+            if rows:
+                return [r for r in rows if task_name(r[0]) == slug] or rows
+
+        text = u" ".join(tokens(reference))
+        if not text:
+            return []
+        inner = trigrams(text, pad=False)
+        if inner:
+            counts = self._trigram_counts(inner)
+            candidates = [fp for fp, n in counts.items() if n == len(inner)]
+        else:
+            # Too short for trigrams.
+            candidates = [r[0] for r in self.connection.execute(
+                "SELECT fpath FROM tasks")]
+        matches = [(fp, title) for fp, title in within(self._titles(candidates))
+                   if text in u" ".join(tokens(title))]
+        if matches or not inner:
+            return matches
+
+        padded = trigrams(text)
+        counts = dict((fp, n) for fp, n in self._trigram_counts(padded).items()
+                      if fp.startswith(prefix))
+        best = max(counts.values()) if counts else 0
+        if best < TRIGRAM_THRESHOLD * len(padded):
+            return []
+        return self._titles(fp for fp, n in counts.items() if n == best)
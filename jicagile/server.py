@@ -0,0 +1,224 @@
+"""Local HTTP server with a JSON API to a project, as run by ``agl serve``.
+
+The server listens on 127.0.0.1 only and answers GET requests for:
+
+- ``/tasks``: the tasks in the backlog, todo and done directories
+- ``/tasks/backlog``, ``/tasks/todo`` and ``/tasks/done``
+- ``/team`` and ``/themes``
+- ``/stats``: the number of tasks and story points in each directory
+- ``/history``: the story points done in each past sprint, including
+  those packed by ``agl archive pack``
+
+The project is kept in a watched :class:`jicagile.index.IndexedStorage`.
+Each response carries an ``ETag`` derived from the content of the project,
+so a client sending it back in ``If-None-Match`` gets an empty ``304 Not
+Modified`` response until something has changed.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+from collections import OrderedDict
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from jicagile.archive import is_pack, read_header, sprint_name
+from jicagile.index import IndexedStorage
+from jicagile.watch import watcher_for
+
+HOST = "127.0.0.1"
+PAST_SPRINTS_DIRNAME = "past_sprints"
+
+
+def team_data(team):
+    """Return list of dictionaries describing the team members."""
+    return [OrderedDict([("lookup", m.lookup),
+                         ("first_name", m.first_name),
+                         ("last_name", m.last_name)])
+            for lookup, m in sorted(team.items())]
+
+
+def themes_data(themes):
+    """Return list of dictionaries describing the themes."""
+    return [OrderedDict([("lookup", m.lookup),
+                         ("description", m.description)])
+            for lookup, m in sorted(themes.items())]
+
+
+class ProjectAPI(object):
+    """JSON documents describing a project, with a content fingerprint."""
+
+    def __init__(self, project, past_sprints_directory=None):
+        self.project = project
+        if past_sprints_directory is None:
+            past_sprints_directory = os.path.join(project.directory,
+                                                  PAST_SPRINTS_DIRNAME)
+        self.past_sprints_directory = past_sprints_directory
+        self.directories = OrderedDict([
+            ("backlog", project.backlog_directory),
+            ("todo", project.current_todo_directory),
+            ("done", project.current_done_directory)])
+
+        storage = project.storage
+        if not isinstance(storage, IndexedStorage):
+            storage = IndexedStorage(storage)
+            project.storage = storage
+        if storage.uses_files and storage.watcher is None:
+            storage.watch(watcher_for(list(self.directories.values())
+                                      + self.sprint_directories()))
+        self.storage = storage
+        self._cache = {}
+
+    def sprint_directories(self):
+        """Return sorted list of the past sprint directories."""
+        root = self.past_sprints_directory
+        if self.project.storage.uses_files:
+            if not os.path.isdir(root):
+                return []
+            return [os.path.join(root, d) for d in sorted(os.listdir(root))
+                    if os.path.isdir(os.path.join(root, d))]
+        return [d for d in self.project.storage.directories(root)
+                if os.path.dirname(os.path.normpath(d)) == os.path.normpath(root)]
+
+    def sprint_packs(self):
+        """Return sorted list of the packs of past sprints."""
+        root = self.past_sprints_directory
+        if not self.project.storage.uses_files or not os.path.isdir(root):
+            return []
+        return [os.path.join(root, fn) for fn in sorted(os.listdir(root))
+                if is_pack(fn)]
+
+    def fingerprint(self):
+        """Return a hash of the content of the project."""
+        parts = [self.storage.fingerprint(d) for d in self.directories.values()]
+        for directory in self.sprint_directories():
+            parts.append(directory)
+            parts.append(self.storage.fingerprint(directory))
+        for fpath in self.sprint_packs():
+            st = os.stat(fpath)
+            parts.append("{} {:d} {:d}".format(fpath, st.st_size, int(st.st_mtime)))
+        parts.append(json.dumps(team_data(self.storage.read_team())))
+        parts.append(json.dumps(themes_data(self.storage.read_themes())))
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def tasks(self, directory):
+        """Return list of the tasks in a directory, including their paths."""
+        items = []
+        for fpath, task in sorted(self.storage.refresh(directory).items()):
+            item = OrderedDict([("fpath", fpath)])
+            item.update(sorted(task.items()))
+            items.append(item)
+        return items
+
+    def stats(self):
+        """Return the number of tasks and story points in each directory."""
+        stats = OrderedDict()
+        for name, directory in self.directories.items():
+            tasks = self.storage.refresh(directory).values()
+            stats[name] = OrderedDict([
+                ("tasks", len(tasks)),
+                ("storypoints", sum(t["storypoints"] for t in tasks))])
+        return stats
+
+    def history(self):
+        """Return the story points done in each past sprint."""
+        history = []
+        for directory in self.sprint_directories():
+            tasks = self.storage.refresh(directory).values()
+            history.append(OrderedDict([
+                ("sprint", os.path.basename(directory)),
+                ("tasks", len(tasks)),
+                ("storypoints", sum(t["storypoints"] for t in tasks))]))
+        for fpath in self.sprint_packs():
+            header = read_header(fpath)
+            history.append(OrderedDict([
+                ("sprint", sprint_name(fpath)),
+                ("tasks", header["tasks"]),
+                ("storypoints", header["storypoints"])]))
+        return sorted(history, key=lambda item: item["sprint"])
+
+    def document(self, path):
+        """Return the data to serve at a path or None if there is none."""
+        path = path.rstrip("/")
+        if path == "/tasks":
+            return OrderedDict((name, self.tasks(directory))
+                               for name, directory in self.directories.items())
+        if path.startswith("/tasks/"):
+            name = path[len("/tasks/"):]
+            if name in self.directories:
+                return self.tasks(self.directories[name])
+            return None
+        if path == "/team":
+            return team_data(self.storage.read_team())
+        if path == "/themes":
+            return themes_data(self.storage.read_themes())
+        if path == "/stats":
+            return self.stats()
+        if path == "/history":
+            return self.history()
+        return None
+
+    def get(self, path):
+        """Return (etag, body) for a path; body is None if there is none.
+
+        Bodies are kept until the content of the project changes.
+        """
+        path = path.split("?", 1)[0]
+        etag = '"{}"'.format(self.fingerprint())
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == etag:
+            return cached
+        data = self.document(path)
+        body = None
+        if data is not None:
+            body = json.dumps(data, indent=2, separators=(",", ": ")).encode("utf-8")
+        self._cache[path] = (etag, body)
+        return etag, body
+
+
+def etag_matches(header, etag):
+    """Return True if an If-None-Match header matches the etag."""
+    if header is None:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Answer GET requests using the ProjectAPI of the server."""
+
+    def do_GET(self):
+        etag, body = self.server.api.get(self.path)
+        if body is None:
+            self.send_json(404, json.dumps(dict(error="Not found")).encode("utf-8"))
+            return
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_json(200, body, etag)
+
+    def send_json(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Do not log each request; dashboards poll frequently."""
+        pass
+
+
+def make_server(project, port, past_sprints_directory=None):
+    """Return an HTTP server for the project on the local port."""
+    server = HTTPServer((HOST, port), RequestHandler)
+    server.api = ProjectAPI(project, past_sprints_directory)
+    return server
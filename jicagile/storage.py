@@ -0,0 +1,631 @@
+"""Storage backends for tasks, team and themes.
+
+A :class:`jicagile.Project` reads and writes everything through a storage
+backend. Tasks are always addressed by the path they would have on disk,
+e.g. ``backlog/do-something.yml``, so that the rest of the package does not
+need to know how they are actually stored.
+"""
+
+import os
+import os.path
+import errno
+import json
+import shutil
+import sqlite3
+
+import yaml
+
+import jicagile
+from jicagile.config import Team, Themes
+from jicagile.layout import LAYOUT_FNAME, Layout, is_shard_name
+from jicagile.locking import atomic_write, makedirs
+from jicagile.metrics import increment
+
+SQLITE_FNAME = ".agl.sqlite"
+
+
+def is_task_fname(fname):
+    """Return True if the file name looks like a task file."""
+    return fname.endswith(".yml") or fname.endswith(".yaml")
+
+
+def task_fpaths(directory):
+    """Return list of the task file paths in a directory and its shards.
+
+    The paths are sorted by file name.
+    """
+    increment("directories_listed")
+    fpaths = []
+    for fn in os.listdir(directory):
+        if is_task_fname(fn):
+            fpaths.append(os.path.join(directory, fn))
+        elif is_shard_name(fn):
+            shard = os.path.join(directory, fn)
+            if os.path.isdir(shard):
+                increment("directories_listed")
+                fpaths.extend(os.path.join(shard, f) for f in os.listdir(shard)
+                              if is_task_fname(f))
+    return sort_fpaths(fpaths)
+
+
+def sort_fpaths(fpaths):
+    """Return list of task file paths sorted by file name, ignoring shards."""
+    return sorted(fpaths, key=lambda fp: (os.path.basename(fp), fp))
+
+
+def _value_lines(lines, start, indent):
+    """Return index of the line after the value of the key at start."""
+    end = start + 1
+    while end < len(lines):
+        line = lines[end]
+        if not line.strip() or not line.startswith(indent + " "):
+            break
+        end += 1
+    return end
+
+
+def _trailing_comment(line):
+    """Return the comment at the end of a one line "key: value", or ""."""
+    data = yaml.load(line, Loader=yaml.Loader)
+    pos = line.find(" #")
+    while pos != -1:
+        try:
+            if yaml.load(line[:pos], Loader=yaml.Loader) == data:
+                return line[len(line[:pos].rstrip()):]
+        except yaml.YAMLError:
+            pass
+        pos = line.find(" #", pos + 1)
+    return ""
+
+
+def update_task_text(text, task, keys):
+    """Return the YAML text of a task with the values of the keys updated.
+
+    Only the lines holding those values are replaced, so that the layout and
+    comments of the rest of the file are kept. Returns None if the text can
+    not be updated in this way.
+    """
+    lines = text.splitlines(True)
+    indent = ""
+    for i, line in enumerate(lines):
+        if line.rstrip() == "dictitems:" and i + 1 < len(lines):
+            # Written by yaml.dump as a jicagile.Task.
+            following = lines[i + 1]
+            indent = following[:len(following) - len(following.lstrip())]
+            break
+    try:
+        for key in keys:
+            new = yaml.dump({key: task[key]}, default_flow_style=False)
+            new = [indent + line for line in new.splitlines(True)]
+            start = None
+            for i, line in enumerate(lines):
+                if line.startswith(indent + key + ":"):
+                    start = i
+                    break
+            if start is None:
+                if lines and not lines[-1].endswith("\n"):
+                    lines[-1] += "\n"
+                lines.extend(new)
+                continue
+            end = _value_lines(lines, start, indent)
+            if end == start + 1 and len(new) == 1:
+                comment = _trailing_comment(lines[start].rstrip("\n"))
+                if comment:
+                    new = [new[0].rstrip("\n") + comment + "\n"]
+            lines[start:end] = new
+        updated = "".join(lines)
+        if jicagile.Task(**yaml.load(updated, Loader=yaml.Loader)) != task:
+            return None
+    except (yaml.YAMLError, TypeError, ValueError):
+        return None
+    return updated
+
+
+def move_destination(storage, src, dest):
+    """Return the path src will have once moved to dest, following ``mv``.
+
+    Tasks moved into a directory go into their shard, if it has any.
+    """
+    if storage.is_directory(dest):
+        fname = os.path.basename(os.path.normpath(src))
+        if storage.layout.shards is not None and storage.exists(src):
+            return storage.layout.fpath(dest, fname)
+        return os.path.join(dest, fname)
+    return dest
+
+
+class DirectoryStorage(object):
+    """Store each task as a YAML file in a directory tree.
+
+    This is the default backend.
+    """
+
+    uses_files = True
+    persistent = True
+
+    def __init__(self, team_fpath=".team.yml", themes_fpath=".themes.yml",
+                 layout_fpath=None):
+        self.team_fpath = team_fpath
+        self.themes_fpath = themes_fpath
+        if layout_fpath is None:
+            layout_fpath = os.path.join(os.path.dirname(team_fpath), LAYOUT_FNAME)
+        self.layout_fpath = layout_fpath
+        self._layout = None
+        self._layout_stamp = None
+
+    @property
+    def layout(self):
+        """Return the :class:`jicagile.layout.Layout` of the task files.
+
+        It is read again if the layout file changes, e.g. when another
+        process converts the project.
+        """
+        increment("files_stat")
+        try:
+            st = os.stat(self.layout_fpath)
+            stamp = (st.st_ino, st.st_mtime, st.st_size)
+        except OSError:
+            stamp = None
+        if self._layout is None or stamp != self._layout_stamp:
+            self._layout = Layout.from_file(self.layout_fpath)
+            self._layout_stamp = stamp
+        return self._layout
+
+    def makedirs(self, directory):
+        """Create a directory for tasks if it does not already exist."""
+        increment("files_stat")
+        if not os.path.isdir(directory):
+            makedirs(directory)
+
+    def directories(self, root):
+        """Return sorted list of the task directories below root."""
+        directories = []
+        for dirpath, dirnames, fnames in os.walk(root):
+            dirnames[:] = sorted([d for d in dirnames if not d.startswith(".")
+                                  and not is_shard_name(d)])
+            if dirpath != root:
+                directories.append(dirpath)
+        return directories
+
+    def fpaths(self, directory):
+        """Return list of the task file paths in a directory, sorted by file name."""
+        return task_fpaths(directory)
+
+    def exists(self, fpath):
+        """Return True if there is a task stored at the fpath."""
+        increment("files_stat")
+        return os.path.isfile(fpath)
+
+    def is_directory(self, path):
+        """Return True if the path is a directory."""
+        increment("files_stat")
+        return os.path.isdir(path)
+
+    def read_task(self, fpath):
+        """Return the task stored at the fpath."""
+        return jicagile.Task.from_file(fpath)
+
+    def write_task(self, task, fpath, keys=None):
+        """Store the task at the fpath.
+
+        If keys is given only the values of those keys have changed; their
+        lines are replaced, keeping the rest of the file as it is. The file
+        is replaced in one step, so readers never see it partly written.
+        """
+        if keys is not None and os.path.isfile(fpath):
+            with open(fpath) as fh:
+                text = fh.read()
+            text = update_task_text(text, task, keys)
+            if text is not None:
+                increment("files_written")
+                atomic_write(fpath, text)
+                return
+        shard = os.path.dirname(fpath)
+        if is_shard_name(os.path.basename(shard)) and not os.path.isdir(shard):
+            makedirs(shard)
+        increment("files_written")
+        atomic_write(fpath, yaml.dump(task, explicit_start=True,
+                                      default_flow_style=False))
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        return jicagile.TaskCollection.from_directory(directory)
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks."""
+        if self.layout.shards is not None and os.path.isfile(src) \
+                and os.path.isdir(dest):
+            # Into its shard.
+            dest = self.layout.fpath(dest, os.path.basename(src))
+            self.makedirs(os.path.dirname(dest))
+        shutil.move(src, dest)
+
+    def vcs_fpath(self, fpath):
+        """Return the path of the file holding the task under version control."""
+        return fpath
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        increment("files_stat")
+        if os.path.isfile(self.team_fpath):
+            return Team.from_file(self.team_fpath)
+        return Team()
+
+    def write_team(self, team):
+        """Store the :class:`jicagile.config.Team`."""
+        team.to_file(self.team_fpath)
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        increment("files_stat")
+        if os.path.isfile(self.themes_fpath):
+            return Themes.from_file(self.themes_fpath)
+        return Themes()
+
+    def write_themes(self, themes):
+        """Store the :class:`jicagile.config.Themes`."""
+        themes.to_file(self.themes_fpath)
+
+
+class _RootedStorage(object):
+    """Base class for backends that key tasks on paths relative to a root."""
+
+    uses_files = False
+    layout = Layout()
+
+    def _key(self, path):
+        """Return the path relative to the root of the project."""
+        return os.path.normpath(os.path.relpath(os.path.abspath(path),
+                                                os.path.abspath(self.root)))
+
+    def _path(self, key):
+        """Return the path from the key."""
+        return os.path.join(self.root, key)
+
+    def _move_key(self, src_key, dest_key):
+        """Return function mapping keys below src_key to keys below dest_key."""
+        def rename(key):
+            return dest_key + key[len(src_key):]
+        return rename
+
+
+class MemoryStorage(_RootedStorage):
+    """Keep tasks, states, team and themes in memory.
+
+    Nothing is written to disk, which makes it useful for tests and
+    benchmarks.
+    """
+
+    persistent = False
+
+    def __init__(self, root="."):
+        self.root = root
+        self.team_fpath = None
+        self.themes_fpath = None
+        self._directories = {}
+        self._team = Team()
+        self._themes = Themes()
+
+    def _tasks_in(self, key):
+        """Return the dictionary of tasks in the directory key."""
+        if key not in self._directories:
+            self.makedirs(self._path(key))
+        return self._directories[key]
+
+    def makedirs(self, directory):
+        """Create a directory for tasks if it does not already exist."""
+        key = self._key(directory)
+        while key not in ("", "."):
+            self._directories.setdefault(key, {})
+            key = os.path.dirname(key)
+
+    def directories(self, root):
+        """Return sorted list of the task directories below root."""
+        base = self._key(root)
+        keys = self._directories.keys()
+        if base != ".":
+            keys = [k for k in keys if k.startswith(base + os.sep)]
+        return [self._path(k) for k in sorted(keys)]
+
+    def fpaths(self, directory):
+        """Return sorted list of the task file paths in a directory."""
+        tasks = self._directories.get(self._key(directory), {})
+        return [self._path(k) for k in sorted(tasks)]
+
+    def exists(self, fpath):
+        """Return True if there is a task stored at the fpath."""
+        key = self._key(fpath)
+        return key in self._directories.get(os.path.dirname(key), {})
+
+    def is_directory(self, path):
+        """Return True if the path is a directory."""
+        return self._key(path) in self._directories
+
+    def read_task(self, fpath):
+        """Return the task stored at the fpath."""
+        key = self._key(fpath)
+        tasks = self._directories.get(os.path.dirname(key), {})
+        if key not in tasks:
+            raise(IOError(errno.ENOENT, "No such task", fpath))
+        return jicagile.Task(**tasks[key])
+
+    def write_task(self, task, fpath, keys=None):
+        """Store the task at the fpath."""
+        key = self._key(fpath)
+        self._tasks_in(os.path.dirname(key))[key] = jicagile.Task(**task)
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        tasks = self._directories.get(self._key(directory), {})
+        task_collection = jicagile.TaskCollection()
+        for key in sorted(tasks):
+            task_collection.append(jicagile.Task(**tasks[key]))
+        return task_collection
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks.
+
+        Follows the semantics of ``mv``: if the destination is an existing
+        directory the source is moved into it.
+        """
+        src_key = self._key(src)
+        dest_key = self._key(dest)
+        if dest_key in self._directories:
+            dest_key = os.path.join(dest_key, os.path.basename(src_key))
+
+        src_tasks = self._directories.get(os.path.dirname(src_key), {})
+        if src_key in src_tasks:
+            task = src_tasks.pop(src_key)
+            self._tasks_in(os.path.dirname(dest_key))[dest_key] = task
+            return
+
+        if src_key not in self._directories:
+            raise(OSError(errno.ENOENT, "No such task or directory", src))
+
+        rename = self._move_key(src_key, dest_key)
+        prefix = src_key + os.sep
+        for key in list(self._directories):
+            if key == src_key or key.startswith(prefix):
+                tasks = self._directories.pop(key)
+                self._directories[rename(key)] = dict(
+                    (rename(k), t) for k, t in tasks.items())
+        self.makedirs(os.path.dirname(self._path(dest_key)))
+
+    def vcs_fpath(self, fpath):
+        """Return None; tasks kept in memory are not under version control."""
+        return None
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        return self._team
+
+    def write_team(self, team):
+        """Store the :class:`jicagile.config.Team`."""
+        self._team = team
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        return self._themes
+
+    def write_themes(self, themes):
+        """Store the :class:`jicagile.config.Themes`."""
+        self._themes = themes
+
+
+class SQLiteStorage(_RootedStorage):
+    """Store tasks, states, team and themes in a single SQLite file.
+
+    Task paths are stored relative to the root directory of the project, so
+    the database can be moved along with the project.
+    """
+
+    persistent = True
+
+    schema = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    fpath TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    title TEXT,
+    storypoints INTEGER,
+    primary_contact TEXT,
+    theme TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_directory ON tasks (directory);
+CREATE TABLE IF NOT EXISTS team (
+    lookup TEXT PRIMARY KEY,
+    first_name TEXT,
+    last_name TEXT
+);
+CREATE TABLE IF NOT EXISTS themes (
+    lookup TEXT PRIMARY KEY,
+    description TEXT
+);
+"""
+
+    def __init__(self, fpath, root="."):
+        self.fpath = fpath
+        self.root = root
+        self.team_fpath = fpath
+        self.themes_fpath = fpath
+        self.connection = sqlite3.connect(fpath)
+        self.connection.executescript(self.schema)
+
+    def _is_directory(self, key):
+        cursor = self.connection.execute(
+            "SELECT 1 FROM directories WHERE path = ?", (key,))
+        return cursor.fetchone() is not None
+
+    def _is_task(self, key):
+        cursor = self.connection.execute(
+            "SELECT 1 FROM tasks WHERE fpath = ?", (key,))
+        return cursor.fetchone() is not None
+
+    def makedirs(self, directory):
+        """Create a directory for tasks if it does not already exist."""
+        key = self._key(directory)
+        with self.connection:
+            while key not in ("", "."):
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO directories VALUES (?)", (key,))
+                key = os.path.dirname(key)
+
+    def directories(self, root):
+        """Return sorted list of the task directories below root."""
+        base = self._key(root)
+        cursor = self.connection.execute(
+            "SELECT path FROM directories UNION SELECT directory FROM tasks")
+        keys = [row[0] for row in cursor]
+        if base != ".":
+            keys = [k for k in keys if k.startswith(base + os.sep)]
+        return [self._path(k) for k in sorted(keys)]
+
+    def fpaths(self, directory):
+        """Return sorted list of the task file paths in a directory."""
+        cursor = self.connection.execute(
+            "SELECT fpath FROM tasks WHERE directory = ? ORDER BY fpath",
+            (self._key(directory),))
+        return [self._path(row[0]) for row in cursor]
+
+    def exists(self, fpath):
+        """Return True if there is a task stored at the fpath."""
+        return self._is_task(self._key(fpath))
+
+    def is_directory(self, path):
+        """Return True if the path is a directory."""
+        return self._is_directory(self._key(path))
+
+    def read_task(self, fpath):
+        """Return the task stored at the fpath."""
+        cursor = self.connection.execute(
+            "SELECT data FROM tasks WHERE fpath = ?", (self._key(fpath),))
+        row = cursor.fetchone()
+        if row is None:
+            raise(IOError(errno.ENOENT, "No such task", fpath))
+        return jicagile.Task(**json.loads(row[0]))
+
+    def write_task(self, task, fpath, keys=None):
+        """Store the task at the fpath."""
+        key = self._key(fpath)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key,
+                 os.path.dirname(key),
+                 task["title"],
+                 task["storypoints"],
+                 task["primary_contact"],
+                 task["theme"],
+                 json.dumps(task)))
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        cursor = self.connection.execute(
+            "SELECT data FROM tasks WHERE directory = ? ORDER BY fpath",
+            (self._key(directory),))
+        task_collection = jicagile.TaskCollection()
+        for row in cursor:
+            task_collection.append(jicagile.Task(**json.loads(row[0])))
+        return task_collection
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks.
+
+        Follows the semantics of ``mv``: if the destination is an existing
+        directory the source is moved into it.
+        """
+        src_key = self._key(src)
+        dest_key = self._key(dest)
+        if self._is_directory(dest_key):
+            dest_key = os.path.join(dest_key, os.path.basename(src_key))
+
+        if self._is_task(src_key):
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE tasks SET fpath = ?, directory = ? WHERE fpath = ?",
+                    (dest_key, os.path.dirname(dest_key), src_key))
+            return
+
+        if not self._is_directory(src_key):
+            raise(OSError(errno.ENOENT, "No such task or directory", src))
+
+        rename = self._move_key(src_key, dest_key)
+        prefix = src_key + os.sep
+        with self.connection:
+            rows = self.connection.execute(
+                "SELECT fpath, directory FROM tasks").fetchall()
+            for fpath, directory in rows:
+                if directory == src_key or directory.startswith(prefix):
+                    self.connection.execute(
+                        "UPDATE tasks SET fpath = ?, directory = ? WHERE fpath = ?",
+                        (rename(fpath), rename(directory), fpath))
+            rows = self.connection.execute(
+                "SELECT path FROM directories").fetchall()
+            for (path,) in rows:
+                if path == src_key or path.startswith(prefix):
+                    self.connection.execute(
+                        "UPDATE directories SET path = ? WHERE path = ?",
+                        (rename(path), path))
+        self.makedirs(os.path.dirname(self._path(dest_key)))
+
+    def vcs_fpath(self, fpath):
+        """Return the path of the file holding the task under version control."""
+        return self.fpath
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        team = Team()
+        cursor = self.connection.execute(
+            "SELECT lookup, first_name, last_name FROM team ORDER BY rowid")
+        for lookup, first_name, last_name in cursor:
+            team.add_member(lookup, first_name, last_name)
+        return team
+
+    def write_team(self, team):
+        """Store the :class:`jicagile.config.Team`."""
+        with self.connection:
+            self.connection.execute("DELETE FROM team")
+            for m in team.values():
+                self.connection.execute(
+                    "INSERT INTO team VALUES (?, ?, ?)",
+                    (m.lookup, m.first_name, m.last_name))
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        themes = Themes()
+        cursor = self.connection.execute(
+            "SELECT lookup, description FROM themes ORDER BY rowid")
+        for lookup, description in cursor:
+            themes.add_member(lookup, description)
+        return themes
+
+    def write_themes(self, themes):
+        """Store the :class:`jicagile.config.Themes`."""
+        with self.connection:
+            self.connection.execute("DELETE FROM themes")
+            for m in themes.values():
+                self.connection.execute(
+                    "INSERT INTO themes VALUES (?, ?)",
+                    (m.lookup, m.description))
+
+
+def storage_for(directory):
+    """Return the storage backend in use for the project directory."""
+    sqlite_fpath = os.path.join(directory, SQLITE_FNAME)
+    if os.path.isfile(sqlite_fpath):
+        return SQLiteStorage(sqlite_fpath, root=directory)
+    return DirectoryStorage(os.path.join(directory, ".team.yml"),
+                            os.path.join(directory, ".themes.yml"))
+
+
+def copy_project(source, destination, directory):
+    """Copy the tasks, team and themes of a project between two backends."""
+    for d in source.directories(directory):
+        destination.makedirs(d)
+        for fpath in source.fpaths(d):
+            destination.write_task(source.read_task(fpath), fpath)
+    destination.write_team(source.read_team())
+    destination.write_themes(source.read_themes())
@@ -0,0 +1,212 @@
+"""Generate synthetic projects for testing and benchmarking."""
+
+import argparse
+import datetime
+import os
+import os.path
+import random
+
+import jicagile
+from jicagile.config import Team, Themes
+from jicagile.storage import DirectoryStorage, MemoryStorage
+
+STORYPOINTS = [1, 3, 5, 8]
+STORYPOINT_WEIGHTS = [0.35, 0.3, 0.25, 0.1]
+
+VERBS = ["Add", "Fix", "Refactor", "Document", "Review", "Test", "Write",
+         "Update", "Remove", "Investigate", "Benchmark", "Deploy", "Plan",
+         "Email", "Organise", "Migrate"]
+NOUNS = ["parser", "report", "pipeline", "server", "grant", "cluster",
+         "workshop", "database", "figures", "manuscript", "backup", "website",
+         "dataset", "image analysis", "sequencing run", "meeting notes",
+         "budget", "release", "appraisal form", "training course"]
+QUALIFIERS = ["for the lab", "for the new project", "before the deadline",
+              "with the collaborators", "on the cluster", "for the paper",
+              "in the wiki", "for the next release", "with the students", ""]
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace",
+               "Heidi", "Ivan", "Judy", "Mallory", "Niaj", "Olivia", "Peggy"]
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson",
+              "Johnson", "Davies", "Robinson", "Wright", "Thompson", "Evans"]
+THEME_NAMES = ["admin", "sysadmin", "research", "software", "teaching",
+               "outreach", "data", "imaging", "writing", "hiring"]
+
+
+def zipf_weights(n, skew):
+    """Return n weights following a Zipf distribution with the given skew.
+
+    A skew of 0 gives a uniform distribution.
+    """
+    return [1.0 / ((rank + 1) ** skew) for rank in range(n)]
+
+
+def weighted_choice(rng, items, weights):
+    """Return an item chosen at random according to the weights."""
+    total = sum(weights)
+    r = rng.random() * total
+    upto = 0.0
+    for item, weight in zip(items, weights):
+        upto += weight
+        if r < upto:
+            return item
+    return items[-1]
+
+
+class SyntheticProject(object):
+    """Reproducible synthetic project with a configurable shape.
+
+    The tasks are distributed over the past sprints, the current sprint and
+    the backlog. Each past sprint gets ``sprint_size`` tasks, the current
+    sprint gets ``sprint_size`` tasks split between "todo" and "done" and the
+    remaining tasks go into the backlog.
+    """
+
+    def __init__(self,
+                 num_tasks=1000,
+                 num_contacts=5,
+                 num_themes=6,
+                 num_past_sprints=0,
+                 sprint_size=20,
+                 contact_skew=1.0,
+                 theme_skew=1.0,
+                 seed=0):
+        self.num_tasks = num_tasks
+        self.num_contacts = num_contacts
+        self.num_themes = num_themes
+        self.num_past_sprints = num_past_sprints
+        self.sprint_size = sprint_size
+        self.contact_skew = contact_skew
+        self.theme_skew = theme_skew
+        self.seed = seed
+
+    @property
+    def team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        team = Team()
+        for i in range(self.num_contacts):
+            first_name = FIRST_NAMES[i % len(FIRST_NAMES)]
+            last_name = LAST_NAMES[i % len(LAST_NAMES)]
+            lookup = "{}{}{}".format(first_name[0], last_name[0], i)
+            team.add_member(lookup, first_name, last_name)
+        return team
+
+    @property
+    def themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        themes = Themes()
+        for i in range(self.num_themes):
+            lookup = THEME_NAMES[i % len(THEME_NAMES)]
+            if i >= len(THEME_NAMES):
+                lookup = "{}{}".format(lookup, i)
+            themes.add_member(lookup, "{} tasks".format(lookup))
+        return themes
+
+    def directories(self):
+        """Return list of (relative directory, number of tasks) tuples."""
+        remaining = self.num_tasks
+        directories = []
+
+        def take(directory, n):
+            n = min(n, remaining)
+            directories.append((directory, n))
+            return remaining - n
+
+        num_done = self.sprint_size // 2
+        remaining = take(os.path.join("current", "done"), num_done)
+        remaining = take(os.path.join("current", "todo"),
+                         self.sprint_size - num_done)
+        start = datetime.date(2016, 1, 4)
+        for i in range(self.num_past_sprints):
+            date = start + datetime.timedelta(days=14 * i)
+            remaining = take(os.path.join("past_sprints", date.isoformat()),
+                             self.sprint_size)
+        directories.append(("backlog", remaining))
+        return directories
+
+    def tasks(self):
+        """Yield (relative directory, :class:`jicagile.Task`) tuples."""
+        rng = random.Random(self.seed)
+        contacts = sorted(self.team.lookups)
+        contact_weights = zipf_weights(len(contacts), self.contact_skew)
+        themes = sorted(self.themes.lookups) + [""]
+        theme_weights = zipf_weights(len(themes), self.theme_skew)
+        fnames = set()
+        for directory, n in self.directories():
+            for i in range(n):
+                title = " ".join([rng.choice(VERBS),
+                                  rng.choice(NOUNS),
+                                  rng.choice(QUALIFIERS)]).strip()
+                task = jicagile.Task(title, 0)
+                fname = task.fname
+                if fname in fnames:
+                    task["title"] = "{} ({})".format(title, len(fnames))
+                    fname = task.fname
+                fnames.add(fname)
+                task["storypoints"] = weighted_choice(rng,
+                                                      STORYPOINTS,
+                                                      STORYPOINT_WEIGHTS)
+                if contacts:
+                    task["primary_contact"] = weighted_choice(rng,
+                                                              contacts,
+                                                              contact_weights)
+                task["theme"] = weighted_choice(rng, themes, theme_weights)
+                yield directory, task
+
+    def populate(self, directory, storage):
+        """Write the synthetic project into a storage backend.
+
+        :returns: :class:`jicagile.Project`
+        """
+        storage.write_team(self.team)
+        storage.write_themes(self.themes)
+        project = jicagile.Project(directory, storage=storage)
+        for d, n in self.directories():
+            storage.makedirs(os.path.join(directory, d))
+        for d, task in self.tasks():
+            storage.write_task(task, task.fpath(os.path.join(directory, d)))
+        return project
+
+    def write(self, directory):
+        """Write the synthetic project as a directory tree.
+
+        :returns: :class:`jicagile.Project`
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        storage = DirectoryStorage(os.path.join(directory, ".team.yml"),
+                                   os.path.join(directory, ".themes.yml"))
+        return self.populate(directory, storage)
+
+    def in_memory(self, directory="."):
+        """Return the synthetic project backed by in-memory storage.
+
+        :returns: :class:`jicagile.Project`
+        """
+        return self.populate(directory, MemoryStorage(root=directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory", help="Directory to write project to")
+    parser.add_argument("-n", "--num-tasks", type=int, default=1000)
+    parser.add_argument("-c", "--num-contacts", type=int, default=5)
+    parser.add_argument("-t", "--num-themes", type=int, default=6)
+    parser.add_argument("-p", "--num-past-sprints", type=int, default=0)
+    parser.add_argument("-s", "--sprint-size", type=int, default=20)
+    parser.add_argument("--contact-skew", type=float, default=1.0)
+    parser.add_argument("--theme-skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    synthetic = SyntheticProject(num_tasks=args.num_tasks,
+                                 num_contacts=args.num_contacts,
+                                 num_themes=args.num_themes,
+                                 num_past_sprints=args.num_past_sprints,
+                                 sprint_size=args.sprint_size,
+                                 contact_skew=args.contact_skew,
+                                 theme_skew=args.theme_skew,
+                                 seed=args.seed)
+    synthetic.write(args.directory)
+
+
+if __name__ == "__main__":
+    main()
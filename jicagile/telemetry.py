@@ -0,0 +1,160 @@
+"""Local log of agl invocations and summaries of it.
+
+When enabled, each ``agl`` invocation appends one JSON line to
+``.agl/telemetry.jsonl`` in the project directory. A line records the
+command, the shape of its arguments (types, not values), the size of the
+project, the duration and the phase timings. Nothing leaves the machine.
+"""
+
+import datetime
+import json
+import os
+import os.path
+import time
+from collections import OrderedDict
+
+from jicagile.locking import make_state_directory
+from jicagile.metrics import percentile
+
+STATE_DIRNAME = ".agl"
+LOG_FNAME = "telemetry.jsonl"
+ENABLED_FNAME = "telemetry.enabled"
+
+#: Arguments that are not part of the argument shape.
+IGNORED_ARGUMENTS = set(["command", "subcommand", "profile", "profile_output"])
+
+PERIODS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+}
+
+
+def log_fpath(directory):
+    """Return the path to the telemetry log of the project directory."""
+    return os.path.join(directory, STATE_DIRNAME, LOG_FNAME)
+
+
+def enabled_fpath(directory):
+    """Return the path to the file marking telemetry as enabled."""
+    return os.path.join(directory, STATE_DIRNAME, ENABLED_FNAME)
+
+
+def is_enabled(directory, environ=None):
+    """Return True if telemetry is enabled for the project directory.
+
+    The ``AGL_TELEMETRY`` environment variable, set to ``1`` or ``0``,
+    takes precedence over ``agl perf enable/disable``.
+    """
+    if environ is None:
+        environ = os.environ
+    env = environ.get("AGL_TELEMETRY")
+    if env is not None:
+        return env == "1"
+    return os.path.isfile(enabled_fpath(directory))
+
+
+def enable(directory):
+    """Enable telemetry for the project directory."""
+    make_state_directory(directory)
+    with open(enabled_fpath(directory), "w"):
+        pass
+
+
+def disable(directory):
+    """Disable telemetry for the project directory, keeping the log."""
+    if os.path.isfile(enabled_fpath(directory)):
+        os.unlink(enabled_fpath(directory))
+
+
+def command_name(args):
+    """Return the command name, including any subcommand."""
+    name = args.command
+    subcommand = getattr(args, "subcommand", None)
+    if subcommand:
+        name = "{} {}".format(name, subcommand)
+    return name
+
+
+def argument_shape(args):
+    """Return dictionary with the types of the arguments that were given."""
+    shape = OrderedDict()
+    for key, value in sorted(vars(args).items()):
+        if key in IGNORED_ARGUMENTS or value is None or value is False:
+            continue
+        if value is True:
+            shape[key] = "flag"
+        else:
+            shape[key] = type(value).__name__
+    return shape
+
+
+def project_size(project):
+    """Return the number of tasks in the backlog and current sprint."""
+    size = 0
+    for directory in [project.backlog_directory,
+                      project.current_todo_directory,
+                      project.current_done_directory]:
+        size += len(project.storage.fpaths(directory))
+    return size
+
+
+def entry(args, project, seconds, phases, status="ok"):
+    """Return the telemetry entry for an invocation."""
+    return OrderedDict([
+        ("timestamp", time.time()),
+        ("command", command_name(args)),
+        ("arguments", argument_shape(args)),
+        ("project_size", project_size(project)),
+        ("seconds", seconds),
+        ("status", status),
+        ("phases", OrderedDict((name, p["seconds"]) for name, p in phases.items())),
+    ])
+
+
+def record(directory, entry):
+    """Append an entry to the telemetry log."""
+    make_state_directory(directory)
+    with open(log_fpath(directory), "a") as fh:
+        fh.write(json.dumps(entry) + "\n")
+
+
+def read_records(directory):
+    """Yield the entries in the telemetry log, skipping malformed lines."""
+    fpath = log_fpath(directory)
+    if not os.path.isfile(fpath):
+        return
+    with open(fpath) as fh:
+        for line in fh:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarise(records, period="week"):
+    """Return list of summaries of duration per command and period.
+
+    Each summary is a dictionary with the command, the period, the number
+    of invocations, the p50, p95 and maximum duration and the median
+    project size.
+    """
+    groups = OrderedDict()
+    for r in sorted(records, key=lambda r: (r["command"], r["timestamp"])):
+        date = datetime.datetime.fromtimestamp(r["timestamp"])
+        key = (r["command"], date.strftime(PERIODS[period]))
+        groups.setdefault(key, []).append(r)
+
+    summaries = []
+    for (command, date), group in groups.items():
+        seconds = [r["seconds"] for r in group]
+        summaries.append(OrderedDict([
+            ("command", command),
+            ("period", date),
+            ("count", len(group)),
+            ("p50", percentile(seconds, 50)),
+            ("p95", percentile(seconds, 95)),
+            ("max", max(seconds)),
+            ("project_size", percentile([r["project_size"] for r in group], 50)),
+        ]))
+    return summaries
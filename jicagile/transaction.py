@@ -0,0 +1,332 @@
+"""Batched, atomic changes to the tasks of a project.
+
+Within ``with project.transaction():`` the tasks added, edited and moved,
+and the team and themes written, are kept in a :class:`TransactionStorage`
+in front of the storage of the project. Reads see the changes made so far,
+but nothing is written until the block exits without an exception; if it
+raises the changes are dropped.
+
+For backends storing one file per task the changes are then committed in
+one go: the new contents of all the files are written to temporary files
+in ``.agl``, which are synced to disk in one pass, and then renamed into
+place. If a rename fails the files already in place are put back. Other
+backends have the changes applied to them in order.
+"""
+
+import os
+import os.path
+import errno
+import shutil
+import tempfile
+
+import yaml
+
+import jicagile
+from jicagile.layout import task_directory
+from jicagile.locking import make_state_directory
+from jicagile.metrics import increment
+from jicagile.storage import move_destination, sort_fpaths, update_task_text
+
+
+def _norm(path):
+    return os.path.normpath(path)
+
+
+def fsync_directory(directory):
+    """Sync the entries of a directory to disk, where the platform allows."""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class TransactionStorage(object):
+    """Storage backend keeping changes in memory until they are committed."""
+
+    def __init__(self, backing, directory="."):
+        self.backing = backing
+        self.directory = directory
+        self.ops = []
+        self._tasks = {}
+        self._origins = {}
+        self._keys = {}
+        self._directories = set()
+        self._team = None
+        self._themes = None
+
+    def __getattr__(self, name):
+        # Delegate attributes such as uses_files and team_fpath.
+        if name == "backing":
+            raise(AttributeError(name))
+        return getattr(self.backing, name)
+
+    def makedirs(self, directory):
+        """Create a directory for tasks if it does not already exist."""
+        self.ops.append(("makedirs", directory))
+        self._makedirs(directory)
+
+    def _makedirs(self, directory):
+        key = _norm(directory)
+        while key not in ("", ".") and not self.backing.is_directory(key):
+            self._directories.add(key)
+            key = os.path.dirname(key)
+
+    def directories(self, root):
+        """Return sorted list of the task directories below root."""
+        directories = dict((_norm(d), d) for d in self.backing.directories(root))
+        prefix = _norm(root) + os.sep
+        for key in self._directories:
+            if prefix == "." + os.sep or key.startswith(prefix):
+                directories.setdefault(key, key)
+        return [directories[k] for k in sorted(directories)]
+
+    def fpaths(self, directory):
+        """Return sorted list of the task file paths in a directory."""
+        fpaths = {}
+        if self.backing.is_directory(directory):
+            fpaths = dict((_norm(fp), fp) for fp in self.backing.fpaths(directory))
+        key = _norm(directory)
+        for k, task in self._tasks.items():
+            if task_directory(k) != key:
+                continue
+            if task is None:
+                fpaths.pop(k, None)
+            else:
+                fpaths[k] = os.path.join(directory, os.path.relpath(k, key))
+        return sort_fpaths(fpaths.values())
+
+    def exists(self, fpath):
+        """Return True if there is a task stored at the fpath."""
+        key = _norm(fpath)
+        if key in self._tasks:
+            return self._tasks[key] is not None
+        return self.backing.exists(fpath)
+
+    def is_directory(self, path):
+        """Return True if the path is a directory."""
+        return _norm(path) in self._directories or self.backing.is_directory(path)
+
+    def read_task(self, fpath):
+        """Return the task stored at the fpath."""
+        key = _norm(fpath)
+        if key not in self._tasks:
+            return self.backing.read_task(fpath)
+        if self._tasks[key] is None:
+            raise(IOError(errno.ENOENT, "No such task", fpath))
+        return jicagile.Task(**self._tasks[key])
+
+    def tasks(self, directory):
+        """Return the :class:`jicagile.TaskCollection` in a directory."""
+        task_collection = jicagile.TaskCollection()
+        for fpath in self.fpaths(directory):
+            task_collection.append(self.read_task(fpath))
+        return task_collection
+
+    def write_task(self, task, fpath, keys=None):
+        """Store the task at the fpath once the transaction is committed."""
+        self.ops.append(("write_task", jicagile.Task(**task), fpath, keys))
+        key = _norm(fpath)
+        if key not in self._tasks:
+            self._origins[key] = key if self.backing.exists(fpath) else None
+            self._keys[key] = keys
+        elif self._tasks[key] is None:
+            self._origins[key] = None
+            self._keys[key] = None
+        elif keys is None or self._keys[key] is None:
+            self._keys[key] = None
+        else:
+            self._keys[key] = sorted(set(self._keys[key]) | set(keys))
+        self._tasks[key] = jicagile.Task(**task)
+
+    def _move_task(self, src_key, dest_key):
+        if src_key in self._tasks:
+            task = self._tasks[src_key]
+            origin = self._origins[src_key]
+            keys = self._keys[src_key]
+        else:
+            task = self.backing.read_task(src_key)
+            origin = src_key
+            keys = []
+        self._tasks[src_key] = None
+        self._tasks[dest_key] = task
+        self._origins[dest_key] = origin
+        self._keys[dest_key] = keys
+
+    def move(self, src, dest):
+        """Move a task or a directory of tasks once the transaction is committed.
+
+        Follows the semantics of ``mv``. The directories tasks are moved out
+        of are left in place.
+        """
+        final = _norm(move_destination(self, src, dest))
+        src_key = _norm(src)
+        if self.exists(src):
+            self.ops.append(("move", src, dest))
+            self._makedirs(task_directory(final))
+            self._move_task(src_key, final)
+            return
+        if not self.is_directory(src):
+            raise(OSError(errno.ENOENT, "No such task or directory", src))
+        self.ops.append(("move", src, dest))
+        for directory in [src] + self.directories(src):
+            self._makedirs(final + _norm(directory)[len(src_key):])
+            for fpath in self.fpaths(directory):
+                # Keeping the shards of the tasks.
+                dest_key = final + _norm(fpath)[len(src_key):]
+                self._makedirs(task_directory(dest_key))
+                self._move_task(_norm(fpath), dest_key)
+
+    def read_team(self):
+        """Return the :class:`jicagile.config.Team`."""
+        if self._team is not None:
+            return self._team
+        return self.backing.read_team()
+
+    def write_team(self, team):
+        """Store the :class:`jicagile.config.Team` once the transaction is committed."""
+        self.ops.append(("write_team", team))
+        self._team = team
+
+    def read_themes(self):
+        """Return the :class:`jicagile.config.Themes`."""
+        if self._themes is not None:
+            return self._themes
+        return self.backing.read_themes()
+
+    def write_themes(self, themes):
+        """Store the :class:`jicagile.config.Themes` once the transaction is committed."""
+        self.ops.append(("write_themes", themes))
+        self._themes = themes
+
+    @property
+    def config_written(self):
+        """Return True if the team or themes have been written."""
+        return self._team is not None or self._themes is not None
+
+    @property
+    def changed_fpaths(self):
+        """Return sorted list of the paths written or removed by the transaction.
+
+        These are the paths to stage in version control.
+        """
+        paths = set()
+        for key, task in self._tasks.items():
+            if task is not None or self.backing.exists(key):
+                paths.add(self.backing.vcs_fpath(key))
+        if self._team is not None:
+            paths.add(self.backing.team_fpath)
+        if self._themes is not None:
+            paths.add(self.backing.themes_fpath)
+        return sorted(p for p in paths if p is not None)
+
+    def commit(self):
+        """Write the changes to the backing storage."""
+        if self.backing.uses_files:
+            self._commit_files()
+        else:
+            for op in self.ops:
+                getattr(self.backing, op[0])(*op[1:])
+        if hasattr(self.backing, "invalidate"):
+            # Written behind the back of an IndexedStorage.
+            self.backing.invalidate()
+
+    def _task_text(self, key):
+        """Return the new content of the task file at key, or None if unchanged."""
+        task = self._tasks[key]
+        origin = self._origins[key]
+        keys = self._keys[key]
+        if origin is not None and keys is not None:
+            if not keys:
+                return None
+            with open(origin) as fh:
+                text = update_task_text(fh.read(), task, keys)
+            if text is not None:
+                return text
+        return yaml.dump(task, explicit_start=True, default_flow_style=False)
+
+    def _commit_files(self):
+        state_dir = make_state_directory(self.directory)
+        staging = tempfile.mkdtemp(prefix="transaction-", dir=state_dir)
+        try:
+            self._apply(staging, self._prepare(staging))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _prepare(self, staging):
+        """Return list of (source, destination) with the new files written to staging.
+
+        The sources are temporary files or, for tasks moved without
+        changes, the paths they are moved from.
+        """
+        contents = []
+        for key in sorted(self._tasks):
+            if self._tasks[key] is None:
+                continue
+            text = self._task_text(key)
+            if text is None:
+                contents.append((self._origins[key], key, None))
+            else:
+                contents.append((None, key, text))
+        if self._team is not None:
+            contents.append((None, self.backing.team_fpath, self._team.to_yaml()))
+        if self._themes is not None:
+            contents.append((None, self.backing.themes_fpath, self._themes.to_yaml()))
+
+        placements = []
+        for i, (origin, dest, text) in enumerate(contents):
+            if text is None:
+                placements.append((origin, dest))
+                continue
+            tmp_fpath = os.path.join(staging, "new-{:d}".format(i))
+            with open(tmp_fpath, "w") as fh:
+                fh.write(text)
+                fh.flush()
+                os.fsync(fh.fileno())
+            increment("files_written")
+            placements.append((tmp_fpath, dest))
+        return placements
+
+    def _apply(self, staging, placements):
+        """Move the files into place, undoing the moves made if one fails."""
+        removed = set(k for k, t in self._tasks.items() if t is None)
+        removed.update(o for o in self._origins.values() if o is not None)
+        removed.update(_norm(dest) for source, dest in placements)
+        undo = []
+        held = {}
+        try:
+            for i, fpath in enumerate(sorted(removed)):
+                if not os.path.isfile(fpath):
+                    continue
+                hold = os.path.join(staging, "old-{:d}".format(i))
+                os.rename(fpath, hold)
+                undo.append((hold, fpath))
+                held[fpath] = hold
+            for source, dest in placements:
+                source = held.get(source, source)
+                directory = os.path.dirname(dest)
+                missing = []
+                while directory and not os.path.isdir(directory):
+                    missing.append(directory)
+                    directory = os.path.dirname(directory)
+                for directory in reversed(missing):
+                    os.mkdir(directory)
+                    undo.append((None, directory))
+                os.rename(source, dest)
+                undo.append((dest, source))
+        except:
+            for source, dest in reversed(undo):
+                if source is None:
+                    os.rmdir(dest)
+                else:
+                    os.rename(source, dest)
+            raise
+        directories = set(os.path.dirname(p) for p in removed)
+        directories.update(os.path.dirname(dest) for source, dest in placements)
+        for directory in sorted(directories):
+            fsync_directory(directory)
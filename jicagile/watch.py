@@ -0,0 +1,332 @@
+"""Watch task directories for changes made outside agl.
+
+A watcher reports the task files that have been added, modified, deleted or
+moved between the directories it watches, e.g. because somebody edited a
+file by hand or pulled from Git. :class:`InotifyWatcher` uses the Linux
+inotify API; :class:`PollWatcher` compares modification times and sizes and
+works everywhere. Use :func:`watcher_for` to get the best one available::
+
+    watcher = watcher_for(["backlog", "current/todo", "current/done"])
+    for event in watcher.poll(timeout=1.0):
+        print(event.kind, event.fpath)
+
+The events can be applied to a :class:`jicagile.index.IndexedStorage` with
+:meth:`jicagile.index.IndexedStorage.watch`.
+"""
+
+import os
+import os.path
+import errno
+import select
+import struct
+import time
+from collections import namedtuple
+
+from jicagile.layout import is_shard_name
+from jicagile.metrics import increment
+from jicagile.storage import is_task_fname
+
+#: A change to a task file. The kind is one of "added", "modified",
+#: "deleted" and "moved", in which case dest is the new path of the file.
+#: The kind "invalidated" means that the changes to the directory in fpath,
+#: or to all directories if it is None, could not be tracked.
+Event = namedtuple("Event", ["kind", "fpath", "dest"])
+
+
+def _scan(directory, prefix, entries):
+    """Add the task files in the directory, and its shards, to the entries."""
+    shards = []
+    if hasattr(os, "scandir"):
+        for entry in os.scandir(directory):
+            if is_task_fname(entry.name):
+                increment("files_stat")
+                st = entry.stat()
+                entries[prefix + entry.name] = (st.st_ino, st.st_mtime, st.st_size)
+            elif not prefix and is_shard_name(entry.name) and entry.is_dir():
+                shards.append(entry.name)
+    else:
+        for fname in os.listdir(directory):
+            fpath = os.path.join(directory, fname)
+            if is_task_fname(fname):
+                increment("files_stat")
+                st = os.stat(fpath)
+                entries[prefix + fname] = (st.st_ino, st.st_mtime, st.st_size)
+            elif not prefix and is_shard_name(fname) and os.path.isdir(fpath):
+                shards.append(fname)
+    for shard in shards:
+        increment("directories_listed")
+        try:
+            _scan(os.path.join(directory, shard), shard + os.sep, entries)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+def scan(directory):
+    """Return dictionary of the task files in a directory and their stamps.
+
+    The files are keyed by their path relative to the directory, which
+    includes the shard, if any. The stamp is (inode, mtime, size). Returns
+    None if the directory does not exist.
+    """
+    increment("directories_listed")
+    entries = {}
+    try:
+        _scan(directory, "", entries)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return None
+    return entries
+
+
+class PollWatcher(object):
+    """Watch directories by comparing the stamps of the files in them."""
+
+    def __init__(self, directories, interval=1.0):
+        self.directories = [os.path.normpath(d) for d in directories]
+        self.interval = interval
+        self._entries = dict((d, scan(d)) for d in self.directories)
+
+    def is_watching(self, directory):
+        """Return True if changes to the directory are being reported."""
+        return os.path.normpath(directory) in self._entries
+
+    def _changes(self):
+        added, deleted, events = {}, {}, []
+        for directory in self.directories:
+            old = self._entries[directory] or {}
+            new = scan(directory)
+            self._entries[directory] = new
+            new = new or {}
+            for fname, stamp in new.items():
+                fpath = os.path.join(directory, fname)
+                if fname not in old:
+                    added[stamp[0]] = fpath
+                elif old[fname] != stamp:
+                    events.append(Event("modified", fpath, None))
+            for fname, stamp in old.items():
+                if fname not in new:
+                    deleted[stamp[0]] = os.path.join(directory, fname)
+
+        # A file deleted from one place and added to another is a move.
+        for inode, fpath in sorted(deleted.items(), key=lambda i: i[1]):
+            if inode in added:
+                events.append(Event("moved", fpath, added.pop(inode)))
+            else:
+                events.append(Event("deleted", fpath, None))
+        for fpath in sorted(added.values()):
+            events.append(Event("added", fpath, None))
+        return events
+
+    def poll(self, timeout=0):
+        """Return list of the changes since the last poll.
+
+        Waits up to timeout seconds, or indefinitely if it is None, for
+        changes to happen.
+        """
+        start = time.time()
+        while True:
+            events = self._changes()
+            if events:
+                return events
+            remaining = None
+            if timeout is not None:
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    return events
+            time.sleep(self.interval if remaining is None
+                       else min(self.interval, remaining))
+
+    def close(self):
+        """Stop watching."""
+        self._entries = {}
+
+
+# Constants from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _libc():
+    """Return the C library if it provides inotify, otherwise None."""
+    try:
+        import ctypes
+        # The symbols of the running interpreter include those of libc.
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (ImportError, OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher(object):
+    """Watch directories using the Linux inotify API."""
+
+    def __init__(self, directories):
+        import ctypes
+        self._libc = _libc()
+        if self._libc is None:
+            raise(OSError(errno.ENOSYS, "inotify is not available"))
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise(OSError(e, os.strerror(e)))
+        self.directories = [os.path.normpath(d) for d in directories]
+        self._watches = {}
+        self._pending = []
+        for directory in self.directories:
+            self._add_watch(directory)
+
+    def _add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd,
+                                          directory.encode("utf-8"),
+                                          WATCH_MASK)
+        if wd < 0:
+            return False
+        self._watches[wd] = directory
+        if directory in self.directories:
+            # The shards of the directory are watched along with it.
+            for name in os.listdir(directory):
+                if is_shard_name(name) and os.path.isdir(os.path.join(directory, name)):
+                    self._add_watch(os.path.join(directory, name))
+        return True
+
+    def is_watching(self, directory):
+        """Return True if changes to the directory are being reported."""
+        return os.path.normpath(directory) in self._watches.values()
+
+    def _rewatch(self):
+        """Watch directories that have been (re)created since the last poll."""
+        watched = set(self._watches.values())
+        for directory in self.directories:
+            if directory not in watched and self._add_watch(directory):
+                # Files may have been added before the watch was in place.
+                self._pending.append(Event("invalidated", directory, None))
+
+    def _read(self):
+        """Return the raw (directory, mask, cookie, name) events queued."""
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = b"".join(chunks)
+
+        raw = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8")
+            offset += length
+            raw.append((wd, mask, cookie, name))
+        return raw
+
+    def _events(self, raw):
+        events = []
+        moved_from = {}
+        for wd, mask, cookie, name in raw:
+            if mask & IN_Q_OVERFLOW:
+                events.append(Event("invalidated", None, None))
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                # The directory has gone; it is watched again if recreated.
+                del self._watches[wd]
+                if mask & IN_MOVE_SELF:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                if directory not in self.directories:
+                    # A shard.
+                    directory = os.path.dirname(directory)
+                events.append(Event("invalidated", directory, None))
+                continue
+            if mask & IN_ISDIR:
+                if (mask & (IN_CREATE | IN_MOVED_TO) and is_shard_name(name)
+                        and directory in self.directories):
+                    # Files may have been added before the watch was in place.
+                    self._add_watch(os.path.join(directory, name))
+                    events.append(Event("invalidated", directory, None))
+                continue
+            if not is_task_fname(name):
+                continue
+            fpath = os.path.join(directory, name)
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = len(events)
+                events.append(Event("deleted", fpath, None))
+            elif mask & IN_MOVED_TO:
+                index = moved_from.pop(cookie, None)
+                if index is None:
+                    events.append(Event("added", fpath, None))
+                else:
+                    events[index] = Event("moved", events[index].fpath, fpath)
+            elif mask & IN_DELETE:
+                events.append(Event("deleted", fpath, None))
+            elif mask & IN_CLOSE_WRITE:
+                events.append(Event("modified", fpath, None))
+        return events
+
+    def poll(self, timeout=0):
+        """Return list of the changes since the last poll.
+
+        Waits up to timeout seconds, or indefinitely if it is None, for
+        changes to happen. A file that is written to is reported as
+        modified, even if it is new.
+        """
+        self._rewatch()
+        if not self._pending:
+            select.select([self._fd], [], [], timeout)
+        events = self._pending + self._events(self._read())
+        self._pending = []
+        return events
+
+    def close(self):
+        """Stop watching."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._watches = {}
+
+
+def inotify_available():
+    """Return True if the inotify API can be used."""
+    return _libc() is not None
+
+
+def watcher_for(directories, interval=1.0):
+    """Return an inotify watcher if possible, otherwise a polling watcher.
+
+    Set the ``AGL_WATCH`` environment variable to ``poll`` to always poll.
+    """
+    if os.environ.get("AGL_WATCH") != "poll":
+        try:
+            return InotifyWatcher(directories)
+        except OSError:
+            pass
+    return PollWatcher(directories, interval)
@@ -0,0 +1,114 @@
+"""Interactive board unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class BoardUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_lines(self):
+        from jicagile.cli import CLI
+        from jicagile.board import Board
+        cli = CLI()
+        cli.project.add_task("Basic task", 1)
+        cli.project.add_task("Current task", 3, current=True)
+        board = Board(cli)
+        self.assertEqual(board.lines(0),
+                         [("# BACKLOG [1]", None),
+                          ("", None),
+                          ("## None [1]", None),
+                          (" [] Basic task [1]", "backlog/basic-task.yml")])
+        self.assertEqual(board.lines(2), [("# DONE [0]", None)])
+
+        board.move("backlog/basic-task.yml", 1)
+        self.assertEqual(board.lines(0), [("# BACKLOG [0]", None)])
+        self.assertEqual(board.lines(1)[3],
+                         ("*[] Basic task [1]", "backlog/basic-task.yml"))
+
+        # Moving a task back where it came from cancels the move.
+        board.move("backlog/basic-task.yml", -1)
+        self.assertEqual(board.moves, {})
+
+    def test_non_ascii(self):
+        from jicagile.cli import CLI
+        from jicagile.board import Board
+        cli = CLI()
+        cli.project.team.add_member("jo", u"J\u00f6rg", "Olsson")
+        cli.project.add_task(u"Caf\u00e9 meeting", 1, primary_contact="jo")
+        board = Board(cli)
+        lines = board.lines(0)
+        self.assertEqual(lines[2][0], u"## J\u00f6rg [1]")
+        self.assertEqual(lines[3][0], u" [] Caf\u00e9 meeting [1]")
+
+        screen = mock.MagicMock()
+        screen.getmaxyx.return_value = (24, 80)
+        with mock.patch("curses.A_NORMAL", 0, create=True), \
+                mock.patch("curses.A_BOLD", 1, create=True), \
+                mock.patch("curses.A_REVERSE", 2, create=True):
+            board.draw(screen)
+        texts = [c[0][2] for c in screen.addnstr.call_args_list]
+        self.assertTrue(all(isinstance(text, str) for text in texts))
+
+    def test_handle(self):
+        from jicagile.cli import CLI
+        from jicagile.board import Board
+        cli = CLI()
+        cli.project.add_task("Basic task", 1)
+        board = Board(cli)
+        self.assertTrue(board.handle(ord("5")))
+        self.assertEqual(cli.project.tasks("backlog").storypoints, 5)
+        self.assertTrue(board.handle(ord(">")))
+        self.assertEqual(board.column, 1)
+        self.assertEqual(board.selected(), "backlog/basic-task.yml")
+
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = False
+            self.assertFalse(board.handle(ord("q")))
+        self.assertTrue(os.path.isfile("current/todo/basic-task.yml"))
+        self.assertEqual(cli.project.tasks("./current/todo").storypoints, 5)
+
+    @mock.patch('subprocess.Popen')
+    def test_save_with_git(self, patch_popen):
+        process_mock = mock.MagicMock()
+        attrs = {"communicate.return_value": None}
+        process_mock.configure(**attrs)
+        patch_popen.return_value = process_mock
+        from jicagile.cli import CLI
+        from jicagile.board import Board
+        cli = CLI()
+        cli.project.add_task("Basic task", 1)
+        cli.project.add_task("Other task", 3)
+        cli.project.add_task("Current task", 3, current=True)
+        board = Board(cli)
+        board.move("backlog/basic-task.yml", 1)
+        board.move("backlog/other-task.yml", 2)
+        board.move("current/todo/current-task.yml", 1)
+        board.edit("backlog/other-task.yml", storypoints=8)
+
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = True
+            board.save()
+        calls = [mock.call(["git", "add", "backlog/other-task.yml"]),
+                 mock.call(["git", "mv",
+                            "backlog/other-task.yml",
+                            "current/todo/current-task.yml",
+                            "./current/done"]),
+                 mock.call(["git", "mv",
+                            "backlog/basic-task.yml",
+                            "./current/todo"])]
+        self.assertEqual(patch_popen.call_args_list, calls)
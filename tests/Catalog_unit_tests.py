@@ -0,0 +1,196 @@
+"""Catalog class unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class CatalogUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_add_and_lookup(self):
+        from jicagile.catalog import Catalog, ID_LENGTH
+        catalog = Catalog(root="project")
+        task_id = catalog.new_id()
+        self.assertEqual(len(task_id), ID_LENGTH)
+        self.assertFalse(task_id in catalog)
+
+        catalog.add(task_id, "project/backlog/a.yml")
+        self.assertTrue(task_id in catalog)
+        self.assertEqual(len(catalog), 1)
+        self.assertEqual(catalog.fpath_of(task_id), "project/backlog/a.yml")
+        self.assertEqual(catalog.ids_with_prefix(task_id[:3]),
+                         [(task_id, "project/backlog/a.yml")])
+        self.assertTrue(catalog.fpath_of("missing") is None)
+
+        # The same ID can not be used by two tasks.
+        catalog.add(task_id, "project/./backlog/a.yml")
+        with self.assertRaises(IOError):
+            catalog.add(task_id, "project/backlog/b.yml")
+
+        catalog.moved("project/backlog", "project/archive")
+        self.assertEqual(catalog.fpath_of(task_id), "project/archive/a.yml")
+        catalog.remove("project/archive/a.yml")
+        self.assertEqual(len(catalog), 0)
+
+    def test_project_ids(self):
+        import jicagile
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Basic task", 3)
+        self.assertTrue(os.path.isfile(os.path.join(".agl", "catalog.sqlite")))
+        self.assertEqual(jicagile.Task.from_file(fpath)["id"], task["id"])
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("backlog", "basic-task.yml"))
+
+        # Tasks with the same file name are not overwritten.
+        with self.assertRaises(IOError):
+            project.add_task("Basic task!", 1)
+        self.assertEqual(jicagile.Task.from_file(fpath)["storypoints"], 3)
+
+        # Title edits keep the file name and the ID.
+        edited, new_fpath = project.edit_task(fpath, title="Renamed task")
+        self.assertEqual(new_fpath, fpath)
+        self.assertEqual(edited["id"], task["id"])
+
+        project.move_task(fpath, project.current_todo_directory)
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("current", "todo", "basic-task.yml"))
+
+        # The catalog is read back by other instances.
+        other = jicagile.Project(".")
+        self.assertEqual(other.task_fpath(task["id"]),
+                         os.path.join("current", "todo", "basic-task.yml"))
+
+    def test_moved_by_hand(self):
+        import jicagile
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Basic task", 3)
+        os.rename(fpath, os.path.join("current", "done", "basic-task.yml"))
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("current", "done", "basic-task.yml"))
+
+    def test_task_without_id(self):
+        import jicagile
+        project = jicagile.Project(".")
+        fpath = os.path.join("backlog", "old-task.yml")
+        with open(fpath, "w") as fh:
+            fh.write("---\ntitle: Old task\nstorypoints: 3\n")
+        self.assertEqual(project.catalog.named("old-task"), [fpath])
+        task, fpath = project.edit_task(fpath, storypoints=5)
+        self.assertTrue("id" in task)
+        self.assertEqual(jicagile.Task.from_file(fpath)["id"], task["id"])
+        self.assertEqual(project.task_fpath(task["id"]), fpath)
+
+    def test_clashing_file_names(self):
+        import jicagile
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Basic task", 3, current=True)
+        project.move_task(fpath, project.current_done_directory)
+        done_fpath = os.path.join("current", "done", "basic-task.yml")
+        self.assertEqual(project.catalog.named("basic-task"), [done_fpath])
+
+        # Clashes anywhere in the backlog or current sprint are rejected.
+        with self.assertRaises(IOError) as cm:
+            project.add_task("Basic task", 1)
+        self.assertEqual(cm.exception.filename, done_fpath)
+        self.assertEqual(os.listdir("backlog"), [])
+
+        # Tasks of past sprints do not clash.
+        os.mkdir("past_sprints")
+        project.move_task(project.current_done_directory,
+                          os.path.join("past_sprints", "2016-01-01"))
+        project.add_task("Basic task", 1)
+
+        # Tasks removed by hand do not clash either.
+        os.unlink(os.path.join("backlog", "basic-task.yml"))
+        project.add_task("Basic task", 5, current=True)
+        self.assertEqual(project.catalog.named("basic-task"),
+                         [os.path.join("current", "todo", "basic-task.yml"),
+                          os.path.join("past_sprints", "2016-01-01", "basic-task.yml")])
+
+    def test_cli_add_clash(self):
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = True
+            with mock.patch("subprocess.Popen") as patch_popen:
+                cli = CLI()
+                cli.run(cli.parse_args(["add", "Basic task", "3"]))
+                patch_popen.reset_mock()
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["add", "Basic task", "1", "-c"]))
+                patch_popen.assert_not_called()
+        self.assertEqual(stdout.getvalue(),
+                         "Task with the same file name exists: {}\n".format(
+                             os.path.join("backlog", "basic-task.yml")))
+
+    def test_memory_storage(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        project = jicagile.Project(".", storage=MemoryStorage())
+        task, fpath = project.add_task("Basic task", 3)
+        project.move_task(fpath, project.current_todo_directory)
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("current", "todo", "basic-task.yml"))
+        self.assertFalse(os.path.isdir(".agl"))
+
+    def test_cli_accepts_ids(self):
+        from jicagile.cli import CLI
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            cli.run(cli.parse_args(["add", "Basic task", "3"]))
+            fpath = os.path.join("backlog", "basic-task.yml")
+            task_id = cli.project.storage.read_task(fpath)["id"]
+
+            cli.run(cli.parse_args(["edit", task_id, "-t", "Renamed task"]))
+            self.assertEqual(cli.project.storage.read_task(fpath)["title"],
+                             "Renamed task")
+
+            cli.run(cli.parse_args(["mv", task_id, "current/todo"]))
+            self.assertEqual(cli.project.task_fpath(task_id),
+                             os.path.join("current", "todo", "basic-task.yml"))
+            self.assertTrue(os.path.isfile(
+                os.path.join("current", "todo", "basic-task.yml")))
+
+    def test_cli_accepts_id_prefixes(self):
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            with mock.patch("jicagile.catalog.random_id",
+                            side_effect=["abcd1111", "abcd2222", "abce3333"]):
+                first, first_fpath = cli.project.add_task("First task", 3)
+                second, second_fpath = cli.project.add_task("Second task", 3)
+                third, third_fpath = cli.project.add_task("Third task", 3)
+
+            cli.run(cli.parse_args(["edit", "abce", "-s", "5"]))
+            self.assertEqual(cli.project.storage.read_task(third_fpath)["storypoints"], 5)
+
+            # Too short to be taken for an ID.
+            self.assertEqual(cli.resolve_task("abc"), "abc")
+
+            with capture_sys_output() as (stdout, stderr):
+                self.assertEqual(cli.resolve_task("abcd"), None)
+            self.assertEqual(stdout.getvalue().splitlines(), [
+                "Ambiguous task ID: abcd",
+                "Matching tasks:",
+                "  abcd1111  {}  First task".format(os.path.normpath(first_fpath)),
+                "  abcd2222  {}  Second task".format(os.path.normpath(second_fpath))])
@@ -0,0 +1,109 @@
+"""DirectoryStorage class unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+CUR_DIR = os.getcwd()
+
+
+class UpdateTaskTextUnitTests(unittest.TestCase):
+
+    def test_flat_file_with_comments(self):
+        import jicagile
+        from jicagile.storage import update_task_text
+        text = ("---\n"
+                "# Agreed at the planning meeting.\n"
+                "title: Write report\n"
+                "storypoints: 3  # Could be 5\n"
+                "primary_contact: TO\n"
+                "\n"
+                "theme: admin\n")
+        task = jicagile.Task("Write report", 5, "TO", "admin")
+        self.assertEqual(update_task_text(text, task, ["storypoints"]),
+                         "---\n"
+                         "# Agreed at the planning meeting.\n"
+                         "title: Write report\n"
+                         "storypoints: 5  # Could be 5\n"
+                         "primary_contact: TO\n"
+                         "\n"
+                         "theme: admin\n")
+
+        task["id"] = "0123abcd"
+        self.assertEqual(update_task_text(text, task, ["storypoints", "id"]),
+                         "---\n"
+                         "# Agreed at the planning meeting.\n"
+                         "title: Write report\n"
+                         "storypoints: 5  # Could be 5\n"
+                         "primary_contact: TO\n"
+                         "\n"
+                         "theme: admin\n"
+                         "id: 0123abcd\n")
+
+    def test_file_written_by_agl(self):
+        import yaml
+        import jicagile
+        from jicagile.storage import update_task_text
+        task = jicagile.Task("A title long enough to be wrapped over several lines "
+                             "when it is written to the file by yaml.dump", 3,
+                             theme="admin", id="0123abcd")
+        text = yaml.dump(task, explicit_start=True, default_flow_style=False)
+        task["title"] = "Short title"
+        task["storypoints"] = 8
+        updated = update_task_text(text, task, ["storypoints", "title"])
+        self.assertEqual(dict(yaml.load(updated, Loader=yaml.Loader)), dict(task))
+        self.assertEqual(updated.splitlines()[:3], text.splitlines()[:3])
+        self.assertTrue("  title: Short title\n" in updated)
+
+        task["title"] = "A title long enough to be wrapped over several lines " \
+                        "when it is written to the file by yaml.dump, again"
+        updated = update_task_text(updated, task, ["title"])
+        self.assertEqual(dict(yaml.load(updated, Loader=yaml.Loader)), dict(task))
+
+    def test_not_updatable(self):
+        import jicagile
+        from jicagile.storage import update_task_text
+        text = "{title: Write report, storypoints: 3}\n"
+        task = jicagile.Task("Write report", 5)
+        self.assertTrue(update_task_text(text, task, ["storypoints"]) is None)
+
+
+class DirectoryStorageUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_update_task_keeps_comments(self):
+        import jicagile
+        import jicagile.metrics
+        project = jicagile.Project(".")
+        fpath = os.path.join("backlog", "write-report.yml")
+        with open(fpath, "w") as fh:
+            fh.write("---\ntitle: Write report  # For the board\nstorypoints: 3\n")
+
+        jicagile.metrics.reset()
+        task, changed = project.update_task(fpath, title="Write report",
+                                            storypoints=3)
+        self.assertEqual(changed, [])
+        self.assertEqual(jicagile.metrics.snapshot()["files_written"], 0)
+
+        task, changed = project.update_task(fpath, storypoints=5, theme=None)
+        self.assertEqual(changed, ["storypoints", "id"])
+        self.assertEqual(jicagile.metrics.snapshot()["files_written"], 1)
+        with open(fpath) as fh:
+            self.assertEqual(fh.read(),
+                             "---\ntitle: Write report  # For the board\n"
+                             "storypoints: 5\nid: {}\n".format(task["id"]))
+
+        # Files that can not be updated line by line are written out again.
+        with open(fpath, "w") as fh:
+            fh.write("{title: Write report, storypoints: 3}\n")
+        task, changed = project.update_task(fpath, storypoints=8)
+        self.assertEqual(jicagile.Task.from_file(fpath)["storypoints"], 8)
@@ -0,0 +1,91 @@
+"""In-memory task index unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+CUR_DIR = os.getcwd()
+
+
+class IndexedStorageUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_only_changed_files_are_parsed(self):
+        import jicagile
+        import jicagile.metrics
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import storage_for
+        storage = IndexedStorage(storage_for("."))
+        project = jicagile.Project(".", storage=storage)
+        project.add_task("Basic task", 1)
+        project.add_task("Other task", 3)
+        self.assertEqual(len(project.tasks("backlog")), 2)
+
+        jicagile.metrics.reset()
+        self.assertEqual(len(project.tasks("backlog")), 2)
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 0)
+        self.assertEqual(jicagile.metrics.snapshot()["cache_hits"], 2)
+
+        # Changed outside the index, e.g. by a text editor.
+        task = jicagile.Task("Basic task with a longer title", 8)
+        storage.backing.write_task(task, "backlog/basic-task.yml")
+        jicagile.metrics.reset()
+        tasks = project.tasks("backlog")
+        self.assertEqual(tasks.storypoints, 11)
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 1)
+
+    def test_moved_and_deleted_files(self):
+        import jicagile
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import storage_for
+        storage = IndexedStorage(storage_for("."))
+        project = jicagile.Project(".", storage=storage)
+        task, fpath = project.add_task("Basic task", 1, current=True)
+        self.assertEqual(project.tasks("current/todo"), [task])
+        self.assertEqual(project.tasks("current/done"), [])
+
+        os.rename(fpath, "current/done/basic-task.yml")
+        self.assertEqual(project.tasks("current/todo"), [])
+        self.assertEqual(project.tasks("current/done"), [task])
+
+        os.unlink("current/done/basic-task.yml")
+        self.assertEqual(project.tasks("current/done"), [])
+
+    def test_memory_backing(self):
+        import jicagile
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import MemoryStorage
+        storage = IndexedStorage(MemoryStorage())
+        project = jicagile.Project(".", storage=storage)
+        self.assertFalse(storage.uses_files)
+        task, fpath = project.add_task("Basic task", 1, current=True)
+        self.assertEqual(project.tasks("current/todo"), [task])
+        project.move_task(fpath, "current/done")
+        self.assertEqual(project.tasks("current/todo"), [])
+        self.assertEqual(project.tasks("current/done"), [task])
+
+    def test_team_is_cached(self):
+        import jicagile.metrics
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import storage_for
+        storage = IndexedStorage(storage_for("."))
+        team = storage.read_team()
+        team.add_member("TO", "Tjelvar", "Olsson")
+        storage.write_team(team)
+        jicagile.metrics.reset()
+        self.assertEqual(storage.read_team().lookups, set(["TO"]))
+        self.assertEqual(storage.read_team().lookups, set(["TO"]))
+        self.assertEqual(jicagile.metrics.snapshot()["cache_hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
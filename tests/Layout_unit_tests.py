@@ -0,0 +1,135 @@
+"""Sharded layout unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class LayoutUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_shard_name(self):
+        from jicagile.layout import shard_name, is_shard_name, task_directory
+        self.assertEqual(shard_name("write-report.yml", "prefix"), "_wr")
+        self.assertEqual(shard_name("a.yml", "prefix"), "_a_")
+        self.assertEqual(shard_name("-x.yml", "prefix"), "__x")
+        hashed = shard_name("write-report.yml", "hash")
+        self.assertTrue(is_shard_name(hashed))
+        self.assertEqual(hashed, shard_name("write-report.yml", "hash"))
+        self.assertEqual(task_directory(os.path.join("backlog", "_wr", "w.yml")),
+                         "backlog")
+        self.assertEqual(task_directory(os.path.join("backlog", "w.yml")),
+                         "backlog")
+
+    def test_unknown_scheme(self):
+        from jicagile.layout import Layout
+        with self.assertRaises(ValueError):
+            Layout("random")
+
+    def test_sharded_project(self):
+        import jicagile
+        from jicagile.layout import Layout, migrate
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Write report", 3)
+        project.add_task("Another task", 1)
+
+        moves = migrate(project, Layout("prefix"))
+        self.assertEqual(len(moves), 2)
+        self.assertEqual(Layout.from_file(".layout.yml"), Layout("prefix"))
+        self.assertEqual(sorted(os.listdir("backlog")), ["_an", "_wr"])
+        sharded_fpath = os.path.join("backlog", "_wr", "write-report.yml")
+        self.assertEqual(project.task_fpath(task["id"]), sharded_fpath)
+
+        # New tasks go into their shards, listing goes through them.
+        other, other_fpath = project.add_task("Write code", 5)
+        self.assertEqual(os.path.normpath(other_fpath),
+                         os.path.join("backlog", "_wr", "write-code.yml"))
+        self.assertEqual([t["title"] for t in project.tasks(project.backlog_directory)],
+                         ["Another task", "Write code", "Write report"])
+        self.assertEqual(jicagile.TaskCollection.from_directory("backlog").storypoints, 9)
+        with self.assertRaises(IOError):
+            project.add_task("Write code", 1, current=True)
+
+        project.move_task(sharded_fpath, project.current_todo_directory)
+        self.assertTrue(os.path.isfile(os.path.join(
+            "current", "todo", "_wr", "write-report.yml")))
+        project.move_task(project.backlog_directory, "icebox")
+        self.assertEqual(len(project.tasks("icebox")), 2)
+
+        moves = migrate(project, Layout())
+        self.assertEqual(len(moves), 3)
+        self.assertFalse(os.path.exists(".layout.yml"))
+        self.assertEqual(sorted(os.listdir("icebox")),
+                         ["another-task.yml", "write-code.yml"])
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("current", "todo", "write-report.yml"))
+
+    def test_transaction(self):
+        import jicagile
+        from jicagile.layout import Layout, migrate
+        project = jicagile.Project(".")
+        migrate(project, Layout("hash"))
+        with project.transaction():
+            task, fpath = project.add_task("Write report", 3)
+            project.move_task(fpath, project.current_todo_directory)
+        self.assertEqual(project.tasks(project.current_todo_directory)[0]["title"],
+                         "Write report")
+        self.assertEqual(os.path.dirname(os.path.dirname(project.task_fpath(task["id"]))),
+                         os.path.join("current", "todo"))
+
+    def test_history(self):
+        import jicagile
+        from jicagile.layout import Layout, migrate
+        from jicagile.history import yield_historical_data
+        project = jicagile.Project(".")
+        migrate(project, Layout("hash"))
+        project.add_task("Write report", 3, current=True)
+        project.add_task("Write code", 5, current=True)
+        os.mkdir("past_sprints")
+        project.move_task(project.current_todo_directory,
+                          os.path.join("past_sprints", "2016-01-04"))
+        self.assertEqual(list(yield_historical_data("past_sprints")),
+                         ["2016-01-04,8"])
+
+    def test_cli(self):
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = True
+            with mock.patch("subprocess.Popen") as patch_popen:
+                cli = CLI()
+                cli.project.add_task("Write report", 3)
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["layout", "prefix"]))
+                self.assertEqual(stdout.getvalue(),
+                                 "Moved 1 tasks into the prefix layout\n")
+                patch_popen.assert_called_once_with(
+                    ["git", "update-index", "--add", "--remove", "--",
+                     ".layout.yml",
+                     os.path.join("backlog", "_wr", "write-report.yml"),
+                     os.path.join("backlog", "write-report.yml")])
+
+                patch_popen.reset_mock()
+                cli.run(cli.parse_args(["mv", os.path.join("backlog", "_wr", "write-report.yml"),
+                                        os.path.join("current", "todo")]))
+                patch_popen.assert_called_once_with(
+                    ["git", "mv", os.path.join("backlog", "_wr", "write-report.yml"),
+                     os.path.join("current", "todo", "_wr", "write-report.yml")])
+
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["layout"]))
+                self.assertEqual(stdout.getvalue(), "prefix\n")
@@ -0,0 +1,89 @@
+"""Live task list unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+from StringIO import StringIO
+
+CUR_DIR = os.getcwd()
+
+
+class LiveListUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def project(self):
+        import jicagile
+        from jicagile.storage import storage_for
+        project = jicagile.Project(".", storage=storage_for("."))
+        team = project.storage.read_team()
+        team.add_member("TO", "Tjelvar", "Olsson")
+        team.add_member("MH", "Matthew", "Hartley")
+        project.storage.write_team(team)
+        project.reload_config()
+        return project
+
+    def test_only_affected_groups_are_rendered(self):
+        import jicagile
+        import jicagile.metrics
+        from jicagile.cli import list_template
+        from jicagile.live import LiveList
+        project = self.project()
+        project.add_task("Task for Tjelvar", 3, primary_contact="TO")
+        project.add_task("Task for Matthew", 5, primary_contact="MH")
+
+        live_list = LiveList(project, "backlog", list_template, interval=0.01)
+        self.assertTrue(live_list.update())
+        expected = list_template.render(tasks=project.tasks("backlog"),
+                                        directory="backlog",
+                                        team=project.team)
+        self.assertEqual(live_list.text, expected)
+
+        # Nothing to render if nothing changed.
+        jicagile.metrics.reset()
+        self.assertFalse(live_list.update())
+        self.assertEqual(jicagile.metrics.snapshot()["template_renders"], 0)
+
+        # Only the group of the changed task and the header are rendered.
+        task = jicagile.Task("Longer task for Tjelvar", 8, primary_contact="TO")
+        project.storage.write_task(task, "backlog/task-for-tjelvar.yml")
+        jicagile.metrics.reset()
+        self.assertTrue(live_list.wait())
+        self.assertTrue(live_list.update())
+        self.assertEqual(jicagile.metrics.snapshot()["template_renders"], 2)
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 1)
+        expected = list_template.render(tasks=project.tasks("backlog"),
+                                        directory="backlog",
+                                        team=project.team)
+        self.assertEqual(live_list.text, expected)
+
+        os.unlink("backlog/task-for-matthew.yml")
+        self.assertTrue(live_list.wait())
+        self.assertTrue(live_list.update())
+        self.assertFalse("Matthew" in live_list.text)
+
+    def test_run(self):
+        from jicagile.cli import list_template
+        from jicagile.live import LiveList
+        project = self.project()
+        project.add_task("Task for Tjelvar", 3, primary_contact="TO")
+        project.add_task("Task for Matthew", 5, primary_contact="MH")
+        live_list = LiveList(project, "backlog", list_template,
+                             primary_contact="MH", interval=0.01)
+        out = StringIO()
+        live_list.run(out, iterations=2)
+        self.assertEqual(out.getvalue().count("BACKLOG"), 1)
+        self.assertTrue("Matthew" in out.getvalue())
+        self.assertFalse("Tjelvar" in out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
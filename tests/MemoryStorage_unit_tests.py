@@ -0,0 +1,62 @@
+"""In-memory storage backend unit tests."""
+
+import unittest
+import os.path
+
+
+class MemoryStorageUnitTests(unittest.TestCase):
+
+    def test_project_in_memory(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        storage = MemoryStorage(root="/project")
+        project = jicagile.Project("/project", storage=storage)
+        self.assertFalse(os.path.isdir("/project"))
+        self.assertEqual(storage.directories("/project"),
+                         ["/project/backlog",
+                          "/project/current",
+                          "/project/current/done",
+                          "/project/current/todo"])
+
+        task1, fpath1 = project.add_task("Basic task", 1)
+        task2, fpath2 = project.add_task("Current task", 3, current=True)
+        self.assertEqual(fpath1, "/project/backlog/basic-task.yml")
+        self.assertTrue(storage.exists(fpath1))
+        self.assertEqual(project.tasks(project.backlog_directory), [task1])
+        self.assertEqual(project.tasks(project.current_todo_directory), [task2])
+
+        task1, fpath = project.edit_task(fpath1, storypoints=5)
+        self.assertEqual(storage.read_task(fpath1)["storypoints"], 5)
+
+    def test_stored_tasks_are_copies(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        storage = MemoryStorage()
+        task = jicagile.Task("Basic task", 1)
+        storage.write_task(task, "backlog/basic-task.yml")
+        task["storypoints"] = 8
+        self.assertEqual(storage.read_task("backlog/basic-task.yml")["storypoints"], 1)
+
+    def test_move(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        storage = MemoryStorage()
+        project = jicagile.Project(".", storage=storage)
+        task, fpath = project.add_task("Basic task", 1, current=True)
+
+        project.move_task(fpath, project.current_done_directory)
+        self.assertEqual(project.tasks(project.current_todo_directory), [])
+        self.assertEqual(project.tasks(project.current_done_directory), [task])
+
+        project.move_task(project.current_done_directory, "past_sprints/2016-06-19")
+        self.assertEqual(project.tasks("past_sprints/2016-06-19"), [task])
+        self.assertEqual(project.tasks(project.current_done_directory), [])
+
+        with self.assertRaises(OSError):
+            project.move_task(fpath, project.current_done_directory)
+        with self.assertRaises(IOError):
+            storage.read_task(fpath)
+
+
+if __name__ == "__main__":
+    unittest.main()
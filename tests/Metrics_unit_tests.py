@@ -0,0 +1,74 @@
+"""Runtime metrics unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+
+class MetricsUnitTests(unittest.TestCase):
+
+    def test_increment_and_snapshot(self):
+        from jicagile.metrics import Metrics
+        metrics = Metrics()
+        metrics.increment("files_parsed")
+        metrics.increment("bytes_read", 100)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["files_parsed"], 1)
+        self.assertEqual(snapshot["bytes_read"], 100)
+        self.assertEqual(snapshot["cache_hits"], 0)
+
+        # The snapshot is a copy.
+        metrics.increment("files_parsed")
+        self.assertEqual(snapshot["files_parsed"], 1)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["files_parsed"], 0)
+
+    def test_unknown_counter(self):
+        from jicagile.metrics import Metrics
+        metrics = Metrics()
+        with self.assertRaises(KeyError):
+            metrics.increment("unknown")
+
+    def test_percentile(self):
+        from jicagile.metrics import percentile
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile([1], 95), 1)
+        self.assertEqual(percentile([], 50), None)
+
+
+class MetricsFunctionalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_task_collection_from_directory(self):
+        import jicagile
+        import jicagile.metrics
+        project = jicagile.Project(self.tmp_dir)
+        project.add_task("Basic task", 1)
+        project.add_task("Complex task", 8)
+
+        jicagile.metrics.reset()
+        jicagile.TaskCollection.from_directory(project.backlog_directory)
+        snapshot = jicagile.metrics.snapshot()
+        self.assertEqual(snapshot["directories_listed"], 1)
+        self.assertEqual(snapshot["files_parsed"], 2)
+        fpaths = [os.path.join(project.backlog_directory, fn)
+                  for fn in os.listdir(project.backlog_directory)]
+        self.assertEqual(snapshot["bytes_read"],
+                         sum([os.path.getsize(fp) for fp in fpaths]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""SQLite storage backend unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+
+class SQLiteStorageUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+        self.db_fpath = os.path.join(self.tmp_dir, ".agl.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_project_does_not_create_directories(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+        self.assertFalse(os.path.isdir(project.backlog_directory))
+        self.assertEqual(storage.directories(self.tmp_dir),
+                         [project.backlog_directory,
+                          project.current_sprint_directory,
+                          project.current_done_directory,
+                          project.current_todo_directory])
+
+    def test_add_and_edit_task(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+
+        task, fpath = project.add_task("Basic task", 1, primary_contact="TO")
+        self.assertEqual(fpath, os.path.join(self.tmp_dir, "backlog", "basic-task.yml"))
+        self.assertFalse(os.path.isfile(fpath))
+        self.assertTrue(storage.exists(fpath))
+        self.assertEqual(storage.read_task(fpath), task)
+
+        task, new_fpath = project.edit_task(fpath, storypoints=3, theme="admin")
+        self.assertEqual(new_fpath, fpath)
+        self.assertEqual(storage.read_task(fpath)["storypoints"], 3)
+        self.assertEqual(storage.read_task(fpath)["theme"], "admin")
+
+    def test_read_missing_task(self):
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        with self.assertRaises(IOError):
+            storage.read_task(os.path.join(self.tmp_dir, "missing.yml"))
+
+    def test_tasks_listing(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+        task1, fpath = project.add_task("Basic task", 1)
+        task2, fpath = project.add_task("Complex task", 8)
+        task3, fpath = project.add_task("Current task", 3, current=True)
+
+        tasks = project.tasks(project.backlog_directory)
+        self.assertEqual(tasks, [task1, task2])
+        self.assertTrue(isinstance(tasks, jicagile.TaskCollection))
+        self.assertEqual(tasks.storypoints, 9)
+        self.assertEqual(project.tasks(project.current_todo_directory), [task3])
+
+    def test_move_task(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+        task, fpath = project.add_task("Basic task", 1)
+
+        project.move_task(fpath, project.current_todo_directory)
+        self.assertFalse(storage.exists(fpath))
+        self.assertEqual(project.tasks(project.backlog_directory), [])
+        self.assertEqual(project.tasks(project.current_todo_directory), [task])
+
+        with self.assertRaises(OSError):
+            project.move_task(fpath, project.current_done_directory)
+
+    def test_move_directory(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+        task, fpath = project.add_task("Basic task", 1, current=True)
+
+        sprint_dir = os.path.join(self.tmp_dir, "past_sprints", "2016-06-19")
+        project.move_task(project.current_todo_directory, sprint_dir)
+        self.assertEqual(project.tasks(sprint_dir), [task])
+        self.assertTrue(storage.exists(os.path.join(sprint_dir, "basic-task.yml")))
+        self.assertTrue(os.path.join(self.tmp_dir, "past_sprints")
+                        in storage.directories(self.tmp_dir))
+
+    def test_team_and_themes(self):
+        import jicagile
+        from jicagile.storage import SQLiteStorage
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+
+        team = jicagile.config.Team()
+        team.add_member("TO", "Tjelvar", "Olsson")
+        storage.write_team(team)
+        themes = jicagile.config.Themes()
+        themes.add_member("admin", "forms etc")
+        storage.write_themes(themes)
+
+        storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        self.assertEqual(storage.read_team(), team)
+        self.assertEqual(storage.read_themes(), themes)
+
+        project = jicagile.Project(self.tmp_dir, storage=storage)
+        self.assertEqual(project.team.lookups, set(["TO"]))
+        self.assertEqual(project.themes.lookups, set(["admin"]))
+
+    def test_copy_project_round_trip(self):
+        import jicagile
+        from jicagile.storage import DirectoryStorage, SQLiteStorage, copy_project
+        directory_storage = DirectoryStorage(
+            os.path.join(self.tmp_dir, ".team.yml"),
+            os.path.join(self.tmp_dir, ".themes.yml"))
+        project = jicagile.Project(self.tmp_dir, storage=directory_storage)
+        task1, fpath1 = project.add_task("Basic task", 1)
+        task2, fpath2 = project.add_task("Current task", 3, current=True)
+        team = jicagile.config.Team()
+        team.add_member("TO", "Tjelvar", "Olsson")
+        directory_storage.write_team(team)
+
+        sqlite_storage = SQLiteStorage(self.db_fpath, root=self.tmp_dir)
+        copy_project(directory_storage, sqlite_storage, self.tmp_dir)
+        self.assertEqual(sqlite_storage.read_task(fpath1), task1)
+        self.assertEqual(sqlite_storage.read_task(fpath2), task2)
+        self.assertEqual(sqlite_storage.read_team(), team)
+
+        sqlite_storage.write_task(jicagile.Task("New task", 5), os.path.join(
+            self.tmp_dir, "backlog", "new-task.yml"))
+        copy_project(sqlite_storage, directory_storage, self.tmp_dir)
+        task = jicagile.Task.from_file(os.path.join(self.tmp_dir, "backlog", "new-task.yml"))
+        self.assertEqual(task["title"], "New task")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,259 @@
+"""SearchIndex class unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class SearchIndexUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tokens(self):
+        from jicagile.search import tokens
+        self.assertEqual(tokens(u"Caf\u00e9 au-lait, 2 cups"),
+                         [u"cafe", u"au", u"lait", u"2", u"cups"])
+        self.assertEqual(tokens("Plain bytes"), [u"plain", u"bytes"])
+
+    def test_open(self):
+        from jicagile.search import SearchIndex, index_fpath
+        self.assertTrue(SearchIndex.open(".") is None)
+        index = SearchIndex.open(".", create=True)
+        index.close()
+        self.assertTrue(os.path.isfile(index_fpath(".")))
+        SearchIndex.open(".").close()
+
+    def test_search(self):
+        from jicagile.search import SearchIndex
+        index = SearchIndex.open(".", create=True)
+        index.add("backlog/a.yml", u"Fix the web server")
+        index.add("backlog/b.yml", u"Write web site documentation")
+        index.add("backlog/c.yml", u"Order coffee for the caf\u00e9")
+        index.add("./backlog/d.yml", u"Serve the website")
+        self.assertEqual(len(index), 4)
+
+        # Every term must match.
+        results = index.search("web server")
+        self.assertEqual([r[1] for r in results], ["backlog/a.yml"])
+
+        # Whole words rank above prefixes.
+        results = index.search("web")
+        self.assertEqual([r[1] for r in results],
+                         ["backlog/a.yml", "backlog/b.yml", "backlog/d.yml"])
+        self.assertEqual(results[0][2], u"Fix the web server")
+        self.assertTrue(results[1][0] > results[2][0])
+
+        self.assertEqual([r[1] for r in index.search("CAFE")], ["backlog/c.yml"])
+        self.assertEqual(len(index.search("web", limit=1)), 1)
+        self.assertEqual(index.search("nothing"), [])
+        self.assertEqual(index.search("..."), [])
+
+        index.remove("backlog/a.yml")
+        self.assertEqual(index.search("web server"), [])
+        index.close()
+
+    def test_moved(self):
+        from jicagile.search import SearchIndex
+        index = SearchIndex.open(".", create=True)
+        index.add("backlog/a.yml", u"First task")
+        index.add("backlog/b.yml", u"Second task")
+        index.add("backlog_old/c.yml", u"Third task")
+
+        index.moved("backlog/a.yml", "current/todo/a.yml")
+        self.assertEqual([r[1] for r in index.search("first")],
+                         ["current/todo/a.yml"])
+
+        index.moved("backlog/", "archive")
+        self.assertEqual(sorted(r[1] for r in index.search("task")),
+                         ["archive/b.yml", "backlog_old/c.yml",
+                          "current/todo/a.yml"])
+        index.close()
+
+    def test_build(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        from jicagile.search import SearchIndex
+        project = jicagile.Project(".", storage=MemoryStorage())
+        project.add_task("Backlog task", 3)
+        project.add_task("Current task", 5, current=True)
+        index = SearchIndex.open(".", create=True)
+        index.build(project.storage, ".")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(len(index.search("task")), 2)
+        self.assertEqual(len(index.search("current")), 1)
+        index.close()
+
+    def test_non_ascii(self):
+        from jicagile.cli import CLI
+        from jicagile.search import SearchIndex
+        title = u"Caf\u00e9 r\u00e9union"
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            # Command line arguments are UTF-8 byte strings under Python 2.
+            cli.run(cli.parse_args(["add", title.encode("utf-8"), "3"]))
+            cli.run(cli.parse_args(["search", "cafe"]))
+            cli.run(cli.parse_args(["add", u"Autre r\u00e9union".encode("utf-8"), "1"]))
+
+        index = SearchIndex.open(".")
+        self.assertEqual([r[2] for r in index.search("reunion")],
+                         [title, u"Autre r\u00e9union"])
+        index.add(os.path.join("backlog", u"d\u00e9j\u00e0.yml").encode("utf-8"),
+                  u"D\u00e9j\u00e0 vu".encode("utf-8"))
+        self.assertEqual(index.resolve(u"d\u00e9j\u00e0 vu".encode("utf-8")),
+                         [(os.path.join("backlog", u"d\u00e9j\u00e0.yml"),
+                           u"D\u00e9j\u00e0 vu")])
+        index.close()
+
+    def test_cli_keeps_index_up_to_date(self):
+        from jicagile.cli import CLI
+        from jicagile.search import SearchIndex
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            cli.run(cli.parse_args(["add", "Old title", "3"]))
+            cli.run(cli.parse_args(["search", "old"]))
+            self.assertTrue(SearchIndex.open(".") is not None)
+
+            cli.run(cli.parse_args(["add", "Other task", "1"]))
+            cli.run(cli.parse_args(["edit", "backlog/old-title.yml",
+                                    "-t", "New title"]))
+            cli.run(cli.parse_args(["mv", "backlog/old-title.yml",
+                                    os.path.join("current", "todo")]))
+
+        index = SearchIndex.open(".")
+        self.assertEqual(index.search("old"), [])
+        self.assertEqual([r[1] for r in index.search("new")],
+                         [os.path.join("current", "todo", "old-title.yml")])
+        self.assertEqual([r[1] for r in index.search("other")],
+                         ["backlog/other-task.yml"])
+        index.close()
+
+    def test_cli_search_skips_missing_tasks(self):
+        from jicagile.cli import CLI
+        from jicagile.search import SearchIndex
+        from cli_unit_tests import capture_sys_output
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            cli.run(cli.parse_args(["add", "Keep me", "3"]))
+            cli.run(cli.parse_args(["add", "Remove me", "3"]))
+            with capture_sys_output() as (stdout, stderr):
+                cli.run(cli.parse_args(["search", "me"]))
+            self.assertEqual(stdout.getvalue(),
+                             "backlog/keep-me.yml  Keep me\n"
+                             "backlog/remove-me.yml  Remove me\n")
+
+            os.unlink("backlog/remove-me.yml")
+            with capture_sys_output() as (stdout, stderr):
+                cli.run(cli.parse_args(["search", "me"]))
+            self.assertEqual(stdout.getvalue(),
+                             "backlog/keep-me.yml  Keep me\n")
+
+        index = SearchIndex.open(".")
+        self.assertEqual(len(index), 1)
+        index.close()
+
+    def test_resolve(self):
+        from jicagile.search import SearchIndex
+        index = SearchIndex.open(".", create=True)
+        index.add("backlog/fix-the-web-server.yml", u"Fix the web server")
+        index.add("backlog/write-web-site-docs.yml", u"Write web site docs")
+        index.add("backlog/write-web-site-docs-again.yml", u"Write web site docs again")
+        index.add("current/todo/order-coffee.yml", u"Order coffee")
+
+        # Slug prefixes, preferring exact file names.
+        self.assertEqual(index.resolve("fix"),
+                         [("backlog/fix-the-web-server.yml", u"Fix the web server")])
+        self.assertEqual([r[0] for r in index.resolve("Write web site docs")],
+                         ["backlog/write-web-site-docs.yml"])
+        self.assertEqual([r[0] for r in index.resolve("write-web")],
+                         ["backlog/write-web-site-docs-again.yml",
+                          "backlog/write-web-site-docs.yml"])
+
+        # Substrings of titles.
+        self.assertEqual([r[0] for r in index.resolve("web server")],
+                         ["backlog/fix-the-web-server.yml"])
+        self.assertEqual([r[0] for r in index.resolve("COFFEE")],
+                         ["current/todo/order-coffee.yml"])
+        self.assertEqual(len(index.resolve("e")), 4)
+
+        # Shared trigrams, forgiving typos.
+        self.assertEqual([r[0] for r in index.resolve("order cofee")],
+                         ["current/todo/order-coffee.yml"])
+        self.assertEqual(index.resolve("something else"), [])
+
+        # Restricted to a directory.
+        self.assertEqual([r[0] for r in index.resolve("current/todo/o")],
+                         ["current/todo/order-coffee.yml"])
+        self.assertEqual(index.resolve("backlog/coffee"), [])
+        index.close()
+
+    def test_index_from_older_version_is_rebuilt(self):
+        import sqlite3
+        from jicagile.search import SearchIndex, index_fpath
+        os.mkdir(".agl")
+        connection = sqlite3.connect(index_fpath("."))
+        connection.execute("CREATE TABLE tasks (fpath TEXT PRIMARY KEY, title TEXT)")
+        connection.commit()
+        connection.close()
+        index = SearchIndex.open(".")
+        self.assertTrue(index.needs_build)
+        index.add("backlog/a.yml", u"A task")
+        self.assertEqual(len(index.resolve("task")), 1)
+        index.close()
+
+    def test_cli_resolves_fuzzy_references(self):
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            cli.run(cli.parse_args(["add", "Fix the web server", "3"]))
+            cli.run(cli.parse_args(["add", "Write web site docs", "3"]))
+
+            cli.run(cli.parse_args(["edit", "fix", "-s", "5"]))
+            task = cli.project.storage.read_task("backlog/fix-the-web-server.yml")
+            self.assertEqual(task["storypoints"], 5)
+
+            with capture_sys_output() as (stdout, stderr):
+                cli.run(cli.parse_args(["mv", "web", "current/todo"]))
+            self.assertEqual(stdout.getvalue(),
+                             "Ambiguous task reference: web\n"
+                             "Matching tasks:\n"
+                             "  backlog/fix-the-web-server.yml  Fix the web server\n"
+                             "  backlog/write-web-site-docs.yml  Write web site docs\n")
+            self.assertEqual(len(os.listdir("backlog")), 2)
+
+            cli.run(cli.parse_args(["mv", "site docs", "current/todo"]))
+            self.assertTrue(os.path.isfile("current/todo/write-web-site-docs.yml"))
+
+    def test_cli_resolves_non_ascii_references(self):
+        from jicagile.cli import CLI
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = False
+            cli = CLI()
+            cli.run(cli.parse_args(["add", u"Caf\u00e9 r\u00e9union".encode("utf-8"), "3"]))
+            with mock.patch("jicagile.Project.task_fpath") as patch_task_fpath:
+                cli.run(cli.parse_args(["edit", u"caf\u00e9".encode("utf-8"), "-s", "5"]))
+                # Only references that could be task IDs are looked up.
+                self.assertFalse(patch_task_fpath.called)
+            task = cli.project.storage.read_task("backlog/cafe-reunion.yml")
+            self.assertEqual(task["storypoints"], 5)
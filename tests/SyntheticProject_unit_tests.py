@@ -0,0 +1,71 @@
+"""Synthetic project generator unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+
+class SyntheticProjectUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_directories(self):
+        from jicagile.synthetic import SyntheticProject
+        synthetic = SyntheticProject(num_tasks=100, num_past_sprints=2, sprint_size=10)
+        self.assertEqual(synthetic.directories(),
+                         [("current/done", 5),
+                          ("current/todo", 5),
+                          ("past_sprints/2016-01-04", 10),
+                          ("past_sprints/2016-01-18", 10),
+                          ("backlog", 70)])
+
+        synthetic = SyntheticProject(num_tasks=12, num_past_sprints=2, sprint_size=10)
+        self.assertEqual(sum([n for d, n in synthetic.directories()]), 12)
+
+    def test_tasks_are_reproducible_and_unique(self):
+        from jicagile.synthetic import SyntheticProject
+        synthetic = SyntheticProject(num_tasks=500, seed=3)
+        tasks = list(synthetic.tasks())
+        self.assertEqual(len(tasks), 500)
+        self.assertEqual(tasks, list(SyntheticProject(num_tasks=500, seed=3).tasks()))
+        self.assertNotEqual(tasks, list(SyntheticProject(num_tasks=500, seed=4).tasks()))
+        self.assertEqual(len(set([t.fname for d, t in tasks])), 500)
+
+        contacts = synthetic.team.lookups
+        themes = synthetic.themes.lookups | set([""])
+        for d, task in tasks:
+            self.assertTrue(task["storypoints"] in [1, 3, 5, 8])
+            self.assertTrue(task["primary_contact"] in contacts)
+            self.assertTrue(task["theme"] in themes)
+
+    def test_in_memory(self):
+        from jicagile.synthetic import SyntheticProject
+        synthetic = SyntheticProject(num_tasks=100, num_contacts=3, num_themes=2)
+        project = synthetic.in_memory()
+        self.assertEqual(len(project.team), 3)
+        self.assertEqual(len(project.themes), 2)
+        self.assertEqual(len(project.tasks(project.backlog_directory)), 80)
+        self.assertEqual(len(project.tasks(project.current_todo_directory)), 10)
+
+    def test_write(self):
+        import jicagile
+        from jicagile.synthetic import SyntheticProject
+        synthetic = SyntheticProject(num_tasks=30, num_past_sprints=1, sprint_size=10)
+        project = synthetic.write(self.tmp_dir)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, ".team.yml")))
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, ".themes.yml")))
+        self.assertEqual(len(os.listdir(project.backlog_directory)), 10)
+        sprint_dir = os.path.join(self.tmp_dir, "past_sprints", "2016-01-04")
+        self.assertEqual(len(jicagile.TaskCollection.from_directory(sprint_dir)), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
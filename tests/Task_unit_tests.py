@@ -7,6 +7,16 @@ class TaskUnitTests(unittest.TestCase):
         task = jicagile.Task(" Do something great! ", 3)
         self.assertEqual(task.fname, "do-something-great.yml")
 
+    def test_slugs_are_remembered(self):
+        import jicagile
+        import jicagile.metrics
+        jicagile.metrics.reset()
+        self.assertEqual(jicagile.slug(u"Caf\u00e9 & cake"), "cafe-cake")
+        task = jicagile.Task(u"Caf\u00e9 & cake", 3)
+        self.assertEqual(task.fname, "cafe-cake.yml")
+        self.assertEqual(task.fname, "cafe-cake.yml")
+        self.assertEqual(jicagile.metrics.snapshot()["slugs_computed"], 1)
+
     def test_task_fpath(self):
         import jicagile
         task = jicagile.Task(" Do something great! ", 3)
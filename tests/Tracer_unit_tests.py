@@ -0,0 +1,55 @@
+"""Phase tracer unit tests."""
+
+import unittest
+from StringIO import StringIO
+
+
+class TracerUnitTests(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        from jicagile.profiling import Tracer
+        tracer = Tracer()
+        with tracer.phase("tasks.parse"):
+            pass
+        self.assertEqual(len(tracer.phases), 0)
+
+    def test_phase(self):
+        from jicagile.profiling import Tracer
+        tracer = Tracer()
+        tracer.enable()
+        with tracer.phase("tasks.parse", items=3):
+            pass
+        with tracer.phase("tasks.parse", items=2):
+            pass
+        with tracer.phase("template.render"):
+            pass
+        self.assertEqual(list(tracer.phases.keys()), ["tasks.parse", "template.render"])
+        self.assertEqual(tracer.phases["tasks.parse"]["calls"], 2)
+        self.assertEqual(tracer.phases["tasks.parse"]["items"], 5)
+        self.assertTrue(tracer.phases["tasks.parse"]["seconds"] >= 0)
+
+    def test_phase_recorded_on_exception(self):
+        from jicagile.profiling import Tracer
+        tracer = Tracer()
+        tracer.enable()
+        with self.assertRaises(RuntimeError):
+            with tracer.phase("git.add"):
+                raise(RuntimeError("git failed"))
+        self.assertEqual(tracer.phases["git.add"]["calls"], 1)
+
+    def test_report(self):
+        from jicagile.profiling import Tracer
+        tracer = Tracer()
+        tracer.enable()
+        with tracer.phase("tasks.scan"):
+            pass
+        out = StringIO()
+        tracer.report(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("tasks.scan"))
+        self.assertTrue(lines[2].startswith("total"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Project transaction unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class TransactionUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_changes_are_stored_on_exit(self):
+        import jicagile
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Keep me", 3)
+        with open(fpath, "a") as fh:
+            fh.write("# Checked by hand.\n")
+        done_fpath = os.path.join("current", "done", "keep-me.yml")
+
+        stage = mock.MagicMock()
+        with project.transaction(stage=stage):
+            other, other_fpath = project.add_task("Other task", 1, current=True)
+            project.edit_task(fpath, storypoints=5)
+            project.move_task(fpath, project.current_done_directory)
+            themes = project.storage.read_themes()
+            themes.add_member("admin", "Admin work")
+            project.storage.write_themes(themes)
+
+            # Reads see the changes, the files do not.
+            self.assertTrue(project.storage.exists(other_fpath))
+            self.assertFalse(os.path.exists(other_fpath))
+            self.assertEqual(project.storage.read_task(done_fpath)["storypoints"], 5)
+            self.assertEqual([t["title"] for t in
+                              project.tasks(project.current_done_directory)],
+                             ["Keep me"])
+            self.assertEqual(project.tasks(project.backlog_directory), [])
+            self.assertEqual(len(os.listdir("backlog")), 1)
+            stage.assert_not_called()
+
+        self.assertEqual(os.listdir("backlog"), [])
+        self.assertEqual(jicagile.Task.from_file(other_fpath)["title"], "Other task")
+        with open(done_fpath) as fh:
+            text = fh.read()
+        self.assertTrue(text.endswith("# Checked by hand.\n"))
+        self.assertEqual(jicagile.Task.from_file(done_fpath)["storypoints"], 5)
+        self.assertEqual(list(project.themes.lookups), ["admin"])
+        self.assertEqual(project.task_fpath(task["id"]), done_fpath)
+        self.assertEqual(project.task_fpath(other["id"]),
+                         os.path.normpath(other_fpath))
+        self.assertEqual(sorted(os.listdir(".agl")), [".gitignore", "catalog.sqlite", "locks"])
+        stage.assert_called_once_with(sorted(
+            [".themes.yml", os.path.normpath(fpath), done_fpath,
+             os.path.normpath(other_fpath)]))
+
+    def test_rolled_back_on_exception(self):
+        import jicagile
+        project = jicagile.Project(".")
+        task, fpath = project.add_task("Keep me", 3)
+        stage = mock.MagicMock()
+        with self.assertRaises(ValueError):
+            with project.transaction(stage=stage):
+                project.add_task("Other task", 1)
+                project.edit_task(fpath, title="Changed")
+                project.move_task(fpath, project.current_todo_directory)
+                raise(ValueError("Changed my mind"))
+
+        stage.assert_not_called()
+        self.assertTrue(isinstance(project.storage, jicagile.DirectoryStorage))
+        self.assertEqual(os.listdir("backlog"), ["keep-me.yml"])
+        self.assertEqual(jicagile.Task.from_file(fpath)["title"], "Keep me")
+        self.assertEqual(project.task_fpath(task["id"]), os.path.normpath(fpath))
+        self.assertEqual(project.catalog.named("other-task"), [])
+
+    def test_failed_commit_puts_files_back(self):
+        import jicagile
+        project = jicagile.Project(".")
+        first, first_fpath = project.add_task("First task", 3)
+        second, second_fpath = project.add_task("Second task", 3)
+
+        renames = []
+        real_rename = os.rename
+
+        def rename(src, dest):
+            renames.append((src, dest))
+            if len(renames) == 4:
+                raise(OSError("Disk on fire"))
+            real_rename(src, dest)
+
+        with mock.patch("os.rename", side_effect=rename):
+            with self.assertRaises(OSError):
+                with project.transaction():
+                    project.edit_task(first_fpath, storypoints=5)
+                    project.move_task(second_fpath, project.current_todo_directory)
+
+        # Two files held, one placed and put back, and both held put back.
+        self.assertEqual(len(renames), 7)
+        self.assertEqual(sorted(os.listdir("backlog")),
+                         ["first-task.yml", "second-task.yml"])
+        self.assertEqual(os.listdir(project.current_todo_directory), [])
+        self.assertEqual(jicagile.Task.from_file(first_fpath)["storypoints"], 3)
+        self.assertEqual(project.task_fpath(second["id"]),
+                         os.path.normpath(second_fpath))
+        self.assertEqual(sorted(os.listdir(".agl")), [".gitignore", "catalog.sqlite", "locks"])
+
+    def test_memory_storage(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        project = jicagile.Project(".", storage=MemoryStorage())
+        with project.transaction():
+            task, fpath = project.add_task("Basic task", 3)
+            project.move_task(project.backlog_directory,
+                              os.path.join(project.current_sprint_directory, "old"))
+            self.assertEqual(len(project.tasks(project.backlog_directory)), 0)
+        self.assertEqual(project.task_fpath(task["id"]),
+                         os.path.join("current", "old", "basic-task.yml"))
+        self.assertFalse(project.storage.is_directory("backlog"))
+        self.assertFalse(os.path.isdir(".agl"))
+
+    def test_cli_stage(self):
+        from jicagile.cli import CLI
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = True
+            with mock.patch("subprocess.Popen") as patch_popen:
+                cli = CLI()
+                with cli.project.transaction(stage=cli.stage):
+                    cli.project.add_task("First task", 3)
+                    cli.project.add_task("Second task", 3)
+                patch_popen.assert_called_once_with(
+                    ["git", "update-index", "--add", "--remove", "--",
+                     os.path.join("backlog", "first-task.yml"),
+                     os.path.join("backlog", "second-task.yml")])
@@ -0,0 +1,153 @@
+"""Sprint archive unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class ArchiveUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        os.makedirs(os.path.join("past_sprints", "2016-01-04"))
+        os.makedirs(os.path.join("past_sprints", "2016-01-18"))
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def write_tasks(self):
+        import jicagile
+        storage = jicagile.DirectoryStorage()
+        storage.write_task(jicagile.Task(u"Write r\u00e9port", 3, id="a1"),
+                           os.path.join("past_sprints", "2016-01-04", "write-report.yml"))
+        storage.write_task(jicagile.Task("Fix bug", 5, id="b2"),
+                           os.path.join("past_sprints", "2016-01-04", "fix-bug.yml"))
+        storage.write_task(jicagile.Task("Later task", 1, id="c3"),
+                           os.path.join("past_sprints", "2016-01-18", "later-task.yml"))
+
+    def test_write_and_read(self):
+        from jicagile.archive import (write_pack, read_header, iter_tasks,
+                                      task_collection, remove_directory)
+        self.write_tasks()
+        directory = os.path.join("past_sprints", "2016-01-04")
+        fpath, header = write_pack(directory)
+        self.assertEqual(fpath, directory + ".jsonl.gz")
+        self.assertEqual(header, dict(sprint="2016-01-04", tasks=2,
+                                      storypoints=8, version=1))
+        self.assertEqual(read_header(fpath), header)
+        self.assertEqual([(fname, task["title"]) for fname, task in iter_tasks(fpath)],
+                         [("fix-bug.yml", "Fix bug"),
+                          ("write-report.yml", u"Write r\u00e9port")])
+        self.assertEqual(task_collection(fpath).storypoints, 8)
+
+        self.assertEqual(len(remove_directory(directory)), 2)
+        self.assertEqual(sorted(os.listdir("past_sprints")),
+                         ["2016-01-04.jsonl.gz", "2016-01-18"])
+
+    def test_unpack(self):
+        import jicagile
+        from jicagile.archive import write_pack, remove_directory, unpack
+        from jicagile.layout import Layout
+        self.write_tasks()
+        directory = os.path.join("past_sprints", "2016-01-04")
+        originals = {}
+        for fname in os.listdir(directory):
+            with open(os.path.join(directory, fname)) as fh:
+                originals[fname] = fh.read()
+        fpath, header = write_pack(directory)
+        with self.assertRaises(IOError):
+            unpack(fpath, Layout())
+        remove_directory(directory)
+        written = unpack(fpath, Layout("prefix"))
+        self.assertEqual([p for t, p in written],
+                         [os.path.join(directory, "_fi", "fix-bug.yml"),
+                          os.path.join(directory, "_wr", "write-report.yml")])
+        self.assertFalse(os.path.exists(fpath))
+        task = jicagile.Task.from_file(os.path.join(directory, "_wr", "write-report.yml"))
+        self.assertEqual(task["title"], u"Write r\u00e9port")
+        self.assertEqual(task["id"], "a1")
+        for task, task_fpath in written:
+            with open(task_fpath) as fh:
+                self.assertEqual(fh.read(), originals[os.path.basename(task_fpath)])
+
+    def test_history(self):
+        from jicagile.archive import write_pack, remove_directory
+        from jicagile.history import yield_historical_data
+        self.write_tasks()
+        directory = os.path.join("past_sprints", "2016-01-04")
+        write_pack(directory)
+        remove_directory(directory)
+        with mock.patch("jicagile.Task.from_file") as patch_from_file:
+            patch_from_file.side_effect = AssertionError("Pack extracted")
+            self.assertEqual(next(yield_historical_data("past_sprints")),
+                             "2016-01-04,8")
+        self.assertEqual(list(yield_historical_data("past_sprints")),
+                         ["2016-01-04,8", "2016-01-18,1"])
+
+    def test_server_history(self):
+        import jicagile
+        from jicagile.archive import write_pack, remove_directory
+        from jicagile.storage import storage_for
+        from jicagile.server import ProjectAPI
+        self.write_tasks()
+        project = jicagile.Project(".", storage=storage_for("."))
+        api = ProjectAPI(project)
+        etag, body = api.get("/history")
+        directory = os.path.join("past_sprints", "2016-01-04")
+        write_pack(directory)
+        remove_directory(directory)
+        project.storage.invalidate()
+        new_etag, new_body = api.get("/history")
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(api.document("/history"),
+                         [dict(sprint="2016-01-04", tasks=2, storypoints=8),
+                          dict(sprint="2016-01-18", tasks=1, storypoints=1)])
+
+    def test_cli(self):
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        self.write_tasks()
+        with mock.patch("jicagile.cli.CLI.is_git_repo",
+                        new_callable=mock.PropertyMock) as patch_is_git_repo:
+            patch_is_git_repo.return_value = True
+            with mock.patch("subprocess.Popen") as patch_popen:
+                cli = CLI()
+                self.assertEqual(cli.project.task_fpath("b2"), os.path.join(
+                    "past_sprints", "2016-01-04", "fix-bug.yml"))
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["archive", "pack",
+                                            os.path.join("past_sprints", "2016-01-04")]))
+                self.assertEqual(
+                    stdout.getvalue(),
+                    "Packed 2 tasks into past_sprints/2016-01-04.jsonl.gz\n")
+                patch_popen.assert_called_once_with(
+                    ["git", "update-index", "--add", "--remove", "--",
+                     os.path.join("past_sprints", "2016-01-04.jsonl.gz"),
+                     os.path.join("past_sprints", "2016-01-04", "fix-bug.yml"),
+                     os.path.join("past_sprints", "2016-01-04", "write-report.yml")])
+                self.assertEqual(cli.project.task_fpath("b2"), None)
+
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["archive", "list"]))
+                self.assertEqual(stdout.getvalue(),
+                                 "2016-01-04  2 tasks  8 storypoints\n")
+
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["list", "past_sprints/2016-01-04.jsonl.gz"]))
+                self.assertTrue("Fix bug [5]" in stdout.getvalue())
+                self.assertTrue("# 2016-01-04 [8]" in stdout.getvalue())
+
+                with capture_sys_output() as (stdout, stderr):
+                    cli.run(cli.parse_args(["archive", "unpack",
+                                            "past_sprints/2016-01-04.jsonl.gz"]))
+                self.assertEqual(stdout.getvalue(), "Unpacked 2 tasks\n")
+                self.assertEqual(cli.project.task_fpath("b2"), os.path.join(
+                    "past_sprints", "2016-01-04", "fix-bug.yml"))
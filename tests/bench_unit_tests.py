@@ -0,0 +1,69 @@
+"""Benchmark suite unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+from StringIO import StringIO
+
+
+class BenchUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run_benchmarks(self):
+        from jicagile.bench import run_benchmarks, BENCHMARKS
+        out = StringIO()
+        results = run_benchmarks([40], self.tmp_dir, repeat=1, out=out)
+        self.assertEqual(len(results), len(BENCHMARKS))
+        self.assertEqual(len(out.getvalue().splitlines()), len(BENCHMARKS))
+        for result in results:
+            self.assertEqual(result["size"], 40)
+            self.assertTrue(result["items"] > 0)
+            self.assertTrue(result["throughput"] > 0)
+
+        names = [r["name"] for r in results]
+        self.assertTrue("TaskCollection.from_directory" in names)
+        from_directory = results[names.index("TaskCollection.from_directory")]
+        self.assertEqual(from_directory["items"], 20)
+
+    def test_only(self):
+        from jicagile.bench import run_benchmarks
+        results = run_benchmarks([10, 20], self.tmp_dir, repeat=1,
+                                 names=["list.jinja2"], out=StringIO())
+        self.assertEqual([(r["name"], r["size"]) for r in results],
+                         [("list.jinja2", 10), ("list.jinja2", 20)])
+
+    def test_edit_task_repeats_write(self):
+        from jicagile.bench import BENCHMARKS
+        from jicagile.metrics import reset, snapshot
+        benchmark = [b for b in BENCHMARKS if b.name == "Project.edit_task"][0]
+        for i in range(2):
+            args = benchmark.setup(40, self.tmp_dir)
+            reset()
+            num_items = benchmark.run(*args)
+            self.assertEqual(snapshot()["files_written"], num_items)
+
+    def test_compare(self):
+        from jicagile.bench import compare
+        baseline = {"results": [{"name": "a", "size": 10, "seconds": 1.0},
+                                {"name": "b", "size": 10, "seconds": 1.0}]}
+        results = [{"name": "a", "size": 10, "seconds": 1.1},
+                   {"name": "b", "size": 10, "seconds": 1.5},
+                   {"name": "c", "size": 10, "seconds": 9.0}]
+        regressions = compare(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        result, base, ratio = regressions[0]
+        self.assertEqual(result["name"], "b")
+        self.assertAlmostEqual(ratio, 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
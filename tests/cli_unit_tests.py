@@ -46,6 +46,19 @@ class RunCommandTest(unittest.TestCase):
         cli.run(args)
         cli.dummy.assert_called_once_with(args)
 
+    def test_subcommand_modules_are_imported_when_needed(self):
+        import subprocess
+        import jicagile
+        code = ("import sys, jicagile.cli; "
+                "print(sorted(m for m in sys.modules if m.startswith('jicagile.')))")
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.dirname(jicagile.__file__))
+        process = subprocess.Popen([sys.executable, "-c", code],
+                                   stdout=subprocess.PIPE, env=env)
+        imported = process.communicate()[0].decode("ascii")
+        for name in ["archive", "catalog", "multi", "search"]:
+            self.assertFalse("'jicagile.{}'".format(name) in imported, name)
+
 
 class AddCommandUnitTests(unittest.TestCase):
 
@@ -173,6 +186,18 @@ class ListCommandUnitTests(unittest.TestCase):
         args = cli.parse_args(["list", "dirpath", "-p", "TO"])
         self.assertEqual(args.primary_contact, "TO")
 
+    def test_several_directories(self):
+        from jicagile.cli import CLI
+        cli = CLI()
+        args = cli.parse_args(["list", "backlog", "todo", "done"])
+        self.assertEqual(args.directory, "backlog")
+        self.assertEqual(args.directories, ["todo", "done"])
+        args = cli.parse_args(["list", "--all"])
+        self.assertTrue(args.all)
+        with capture_sys_output():
+            with self.assertRaises(SystemExit):
+                cli.parse_args(["list"])
+
 class ThemeCommandUnitTests(unittest.TestCase):
 
     def setUp(self):
@@ -251,10 +276,54 @@ class MvCommandUnitTests(unittest.TestCase):
         cli = CLI()
         args = cli.parse_args(["mv", "path/to/move", "/dest/"])
         self.assertEqual(args.command, "mv")
-        self.assertEqual(args.src, "path/to/move")
+        self.assertEqual(args.src, ["path/to/move"])
         self.assertEqual(args.dest, "/dest/")
 
 
 
+class ProfileUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        from jicagile.profiling import tracer
+        tracer.disable()
+        tracer.reset()
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_profile_argument_anywhere(self):
+        from jicagile.cli import main
+        prof_fpath = os.path.join(self.tmp_dir, "agl.prof")
+        argv = ["agl", "list", "backlog", "--profile", "--profile-output", prof_fpath]
+        with mock.patch("sys.argv", argv):
+            with capture_sys_output() as (stdout, stderr):
+                main()
+        self.assertTrue("BACKLOG" in stdout.getvalue())
+        self.assertTrue("tasks.parse" in stderr.getvalue())
+        self.assertTrue("template.render" in stderr.getvalue())
+        self.assertTrue(os.path.isfile(prof_fpath))
+
+    def test_agl_trace_environment_variable(self):
+        from jicagile.cli import main
+        with mock.patch("sys.argv", ["agl", "list", "backlog"]):
+            with mock.patch.dict("os.environ", {"AGL_TRACE": "1"}):
+                with capture_sys_output() as (stdout, stderr):
+                    main()
+        self.assertTrue("cli.list" in stderr.getvalue())
+
+    def test_no_profile(self):
+        from jicagile.cli import main
+        with mock.patch("sys.argv", ["agl", "list", "backlog"]):
+            with mock.patch.dict("os.environ", {"AGL_TRACE": "0"}):
+                with capture_sys_output() as (stdout, stderr):
+                    main()
+        self.assertEqual(stderr.getvalue(), "")
+
+
 if __name__ == "__main__":
     unittest.main()
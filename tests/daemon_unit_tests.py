@@ -0,0 +1,114 @@
+"""Resident daemon unit tests."""
+
+import unittest
+import os
+import os.path
+import re
+import tempfile
+import shutil
+import threading
+import time
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+class DaemonUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        from jicagile.profiling import tracer
+        tracer.disable()
+        tracer.reset()
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_handle(self):
+        from jicagile.daemon import Daemon
+        daemon = Daemon(".")
+        daemon.load()
+        request = dict(argv=["add", "Basic task", "1"], cwd=self.tmp_dir)
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = False
+            response = daemon.handle(request)
+        self.assertEqual(response["status"], 0)
+        self.assertTrue(os.path.isfile("backlog/basic-task.yml"))
+
+        request = dict(argv=["list", "backlog"], cwd=self.tmp_dir,
+                       environ={"ANSI_COLORS_DISABLED": "1"})
+        response = daemon.handle(request)
+        self.assertEqual(response["status"], 0)
+        self.assertTrue("Basic task" in response["stdout"])
+
+        request = dict(argv=["add", "Task", "2"], cwd=self.tmp_dir)
+        response = daemon.handle(request)
+        self.assertEqual(response["status"], 2)
+        self.assertTrue("invalid choice" in response["stderr"])
+
+    def test_forwarded_tasks_are_written_as_without_daemon(self):
+        import json
+        from jicagile.cli import CLI
+        from jicagile.daemon import Daemon
+        daemon = Daemon(".")
+        daemon.load()
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = False
+            request = json.loads(json.dumps(dict(argv=["add", "Daemon task", "3"],
+                                                 cwd=self.tmp_dir)))
+            self.assertEqual(daemon.handle(request)["status"], 0)
+            request = json.loads(json.dumps(dict(
+                argv=["edit", "backlog/daemon-task.yml", "-t", "Edited task"],
+                cwd=self.tmp_dir)))
+            self.assertEqual(daemon.handle(request)["status"], 0)
+            cli = CLI()
+            cli.run(cli.parse_args(["add", "Local task", "3"]))
+            cli.run(cli.parse_args(["edit", "backlog/local-task.yml", "-t", "Edited task"]))
+
+        with open("backlog/daemon-task.yml") as fh:
+            forwarded = fh.read()
+        with open("backlog/local-task.yml") as fh:
+            local = fh.read()
+        self.assertFalse("!!python/unicode" in forwarded)
+        self.assertTrue("title: Edited task" in forwarded)
+        # The same file but for the random ID.
+        self.assertEqual(re.sub(r"id: \S+", "id: ID", forwarded),
+                         re.sub(r"id: \S+", "id: ID", local))
+
+    def test_other_directory_is_not_handled(self):
+        from jicagile.daemon import Daemon
+        daemon = Daemon(".")
+        daemon.load()
+        response = daemon.handle(dict(argv=["list", "backlog"], cwd="/"))
+        self.assertEqual(response["status"], None)
+
+    def test_forward(self):
+        from jicagile.daemon import Daemon, forward, is_running, stop, socket_fpath
+        self.assertEqual(forward(".", ["list", "backlog"]), None)
+        self.assertFalse(is_running("."))
+
+        daemon = Daemon(".")
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        for i in range(100):
+            if is_running("."):
+                break
+            time.sleep(0.05)
+        try:
+            with mock.patch("sys.stdout") as mock_stdout:
+                status = forward(".", ["list", "backlog"])
+            self.assertEqual(status, 0)
+            self.assertTrue("BACKLOG" in mock_stdout.write.call_args[0][0])
+            with mock.patch.dict("os.environ", {"AGL_NO_DAEMON": "1"}):
+                self.assertEqual(forward(".", ["list", "backlog"]), None)
+        finally:
+            self.assertTrue(stop("."))
+            thread.join()
+        self.assertFalse(os.path.exists(socket_fpath(".")))
+
+
+if __name__ == "__main__":
+    unittest.main()
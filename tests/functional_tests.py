@@ -81,9 +81,9 @@ class BasicWorkflowFunctionalTests(unittest.TestCase):
         self.assertEqual(task_from_file["title"],
                          "Create a fit-for-purpose agile tool")
         self.assertEqual(task, task_from_file)
-        self.assertEqual(new_fpath,
-                         os.path.join(backlog_dir,
-                                      "create-a-fit-for-purpose-agile-tool.yml"))
+        # The file keeps its name, and the task its ID.
+        self.assertEqual(new_fpath, fpath)
+        self.assertEqual(project.task_fpath(task["id"]), os.path.normpath(fpath))
 
         project.edit_task(fpath, primary_contact="TO")
         task_from_file = jicagile.Task.from_file(fpath)
@@ -453,6 +453,151 @@ class CLIFunctionalTests(unittest.TestCase):
         self.assertFalse(os.path.isfile(src_fpath))
         self.assertTrue(os.path.isfile(dest_fpath))
 
+    def test_mv_several(self):
+        from jicagile.cli import CLI
+        from jicagile.search import SearchIndex
+        cli = CLI()
+        for title in ["First task", "Second task", "Third task"]:
+            cli.run(cli.parse_args(["add", title, "1", "-c"]))
+        cli.run(cli.parse_args(["search", "task"]))
+        task_id = cli.project.storage.read_task(
+            os.path.join("current", "todo", "first-task.yml"))["id"]
+        done = os.path.join("current", "done")
+
+        # Nothing is moved if one of the tasks can not be found.
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(cli.parse_args(["mv", "current/todo/*.yml", "missing.yml", done]))
+        self.assertEqual(stdout.getvalue(), "No such task: missing.yml\n")
+        self.assertEqual(len(os.listdir(done)), 0)
+
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(cli.parse_args(["mv", "current/todo/*.yml", "backlog/*.yml", done]))
+        self.assertEqual(stdout.getvalue(), "No tasks match: backlog/*.yml\n")
+
+        cli.run(cli.parse_args(["mv", "current/todo/[fs]*.yml", "third", done]))
+        self.assertEqual(os.listdir(os.path.join("current", "todo")), [])
+        self.assertEqual(sorted(os.listdir(done)),
+                         ["first-task.yml", "second-task.yml", "third-task.yml"])
+        self.assertEqual(cli.project.task_fpath(task_id),
+                         os.path.join(done, "first-task.yml"))
+        index = SearchIndex.open(".")
+        self.assertEqual([r[1] for r in index.search("second")],
+                         [os.path.join(done, "second-task.yml")])
+        index.close()
+
+    def test_mv_several_to_same_path(self):
+        import jicagile
+        from jicagile.cli import CLI
+        cli = CLI()
+        storage = jicagile.DirectoryStorage()
+        sprint = os.path.join("past_sprints", "2016-01-01")
+        os.makedirs(sprint)
+        storage.write_task(jicagile.Task("Write report", 1),
+                           os.path.join("backlog", "write-report.yml"))
+        storage.write_task(jicagile.Task("Write report", 3),
+                           os.path.join(sprint, "write-report.yml"))
+        done = os.path.join("current", "done")
+
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(cli.parse_args(["mv", "backlog/write-report.yml",
+                                    os.path.join(sprint, "write-report.yml"), done]))
+        self.assertEqual(stdout.getvalue(), "Several tasks would be moved to: {}\n".format(
+            os.path.join(done, "write-report.yml")))
+        self.assertEqual(os.listdir(done), [])
+        self.assertEqual(os.listdir("backlog"), ["write-report.yml"])
+        self.assertEqual(os.listdir(sprint), ["write-report.yml"])
+
+    def test_list_all(self):
+        from jicagile.cli import CLI
+        cli = CLI()
+        cli.run(cli.parse_args(["add", "Basic task", "1"]))
+        cli.run(cli.parse_args(["add", "-c", "Other task", "3"]))
+
+        for argv in [["list", "--all"], ["list", "backlog", "todo", "done"]]:
+            args = cli.parse_args(argv)
+            with capture_sys_output() as (stdout, stderr):
+                cli.run(args)
+                text = ansi_escape.sub('', stdout.getvalue())
+                expected = """# BACKLOG [1]
+
+## None's tasks [1]
+
+[] Basic task [1]
+
+# TODO [3]
+
+## None's tasks [3]
+
+[] Other task [3]
+
+# DONE [0]
+
+# TOTAL [4]
+"""
+                self.assertEqual(text, expected, "\n" + text + expected)
+
+    def test_sqlite_import(self):
+        import jicagile
+        from jicagile.cli import CLI
+        cli = CLI()
+        args = cli.parse_args(["add", "Basic task", "1"])
+        cli.run(args)
+        args = cli.parse_args(["sqlite", "import"])
+        cli.run(args)
+        os.unlink(os.path.join("backlog", "basic-task.yml"))
+
+        # The SQLite file is used from now on.
+        cli = CLI()
+        self.assertFalse(cli.project.storage.uses_files)
+        args = cli.parse_args(["add", "-c", "Other task", "3"])
+        cli.run(args)
+        args = cli.parse_args(["mv", os.path.join("backlog", "basic-task.yml"),
+                               os.path.join("current", "todo")])
+        cli.run(args)
+
+        args = cli.parse_args(["list", "todo"])
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(args)
+            text = ansi_escape.sub('', stdout.getvalue())
+            expected = """# TODO [4]
+
+## None's tasks [4]
+
+[] Basic task [1]
+[] Other task [3]
+"""
+            self.assertEqual(text, expected, "\n" + text + expected)
+
+        args = cli.parse_args(["sqlite", "export"])
+        cli.run(args)
+        task = jicagile.Task.from_file(os.path.join("current", "todo", "other-task.yml"))
+        self.assertEqual(task["storypoints"], 3)
+
+    def test_stats(self):
+        import json
+        import jicagile.metrics
+        from jicagile.cli import CLI
+        cli = CLI()
+        cli.run(cli.parse_args(["add", "Basic task", "1"]))
+        cli.run(cli.parse_args(["add", "-c", "Other task", "3"]))
+        cli.run(cli.parse_args(["add", "-c", "Big task", "8"]))
+
+        args = cli.parse_args(["stats"])
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(args)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ["backlog", "1", "tasks", "1", "storypoints"])
+        self.assertEqual(lines[1].split(), ["todo", "2", "tasks", "11", "storypoints"])
+        self.assertEqual(lines[2].split(), ["done", "0", "tasks", "0", "storypoints"])
+
+        jicagile.metrics.reset()
+        args = cli.parse_args(["stats", "--internals", "--json"])
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(args)
+        data = json.loads(stdout.getvalue())
+        self.assertEqual(data["stats"]["todo"]["storypoints"], 11)
+        self.assertEqual(data["internals"]["files_parsed"], 3)
+        self.assertEqual(data["internals"]["directories_listed"], 3)
 
 
 class ThemesFunctionalTests(unittest.TestCase):
@@ -81,6 +81,23 @@ class GitIntegrationTests(unittest.TestCase):
         patch_popen.assert_called_with(["git", "add", task_fpath])
 
 
+    @mock.patch('subprocess.Popen')
+    def test_edit_without_changes(self, patch_popen):
+        from jicagile.cli import CLI
+        cli = CLI()
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = False  # Just creating a task to work with not testing git integration.
+            cli.run(cli.parse_args(["add", "Basic task", "1"]))
+
+        task_fpath = os.path.join(self.tmp_dir, "backlog", "basic-task.yml")
+        mtime = os.path.getmtime(task_fpath)
+        args = cli.parse_args(["edit", task_fpath, "-s", "1", "-t", "Basic task"])
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = True
+            cli.run(args)
+        patch_popen.assert_not_called()
+        self.assertEqual(os.path.getmtime(task_fpath), mtime)
+
     def test_edit_title_without_git(self):
         import jicagile
         from jicagile.cli import CLI
@@ -100,10 +117,11 @@ class GitIntegrationTests(unittest.TestCase):
                               "-t", "Complicated task"])
         cli.run(args)
 
-        self.assertFalse(os.path.isfile(org_task_fpath))
-        self.assertTrue(os.path.isfile(new_task_fpath))
+        # Title edits do not rename the file.
+        self.assertTrue(os.path.isfile(org_task_fpath))
+        self.assertFalse(os.path.isfile(new_task_fpath))
 
-        task_from_file = jicagile.Task.from_file(new_task_fpath)
+        task_from_file = jicagile.Task.from_file(org_task_fpath)
         self.assertEqual(task_from_file["title"], "Complicated task")
 
     @mock.patch('subprocess.Popen')
@@ -134,8 +152,7 @@ class GitIntegrationTests(unittest.TestCase):
             mock_is_git_repo.return_value = True  # This is where we test git integration.
             cli.run(args)
 
-        calls = [mock.call(["git", "add", org_task_fpath]),
-                 mock.call(["git", "mv", org_task_fpath, new_task_fpath])]
+        calls = [mock.call(["git", "add", org_task_fpath])]
         self.assertEqual(patch_popen.call_args_list, calls)
 
     def test_is_git_repo(self):
@@ -208,6 +225,29 @@ class GitIntegrationTests(unittest.TestCase):
 
         patch_popen.assert_called_with(["git", "mv", "path/to/move", "/dest/"])
 
+    @mock.patch('subprocess.Popen')
+    def test_mv_several_with_git(self, patch_popen):
+        process_mock = mock.MagicMock()
+        attrs = {"communicate.return_value": None}
+        process_mock.configure(**attrs)
+        patch_popen.return_value = process_mock
+        from jicagile.cli import CLI
+        cli = CLI()
+        cli.project.add_task("First task", 1)
+        cli.project.add_task("Second task", 1)
+
+        args = cli.parse_args(["mv", "backlog/*.yml", "current/done"])
+        with mock.patch("jicagile.cli.CLI.is_git_repo", new_callable=mock.PropertyMock) as mock_is_git_repo:
+            mock_is_git_repo.return_value = True
+            cli.run(args)
+        # One check of the repository, however many tasks are moved.
+        self.assertEqual(mock_is_git_repo.call_count, 1)
+
+        patch_popen.assert_called_once_with(["git", "mv",
+                                             "backlog/first-task.yml",
+                                             "backlog/second-task.yml",
+                                             "current/done"])
+
     @mock.patch('subprocess.Popen')
     def test_theme_without_git(self, patch_popen):
         process_mock = mock.MagicMock()
@@ -0,0 +1,44 @@
+"""CLI latency harness unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+from StringIO import StringIO
+
+
+class LatencyUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_command_args_alternate(self):
+        from jicagile.latency import command_args
+        fpath = os.path.join("backlog", "task.yml")
+        self.assertEqual(command_args("mv", 0, fpath),
+                         ["mv", fpath, os.path.join("current", "todo")])
+        self.assertEqual(command_args("mv", 1, fpath),
+                         ["mv", os.path.join("current", "todo", "task.yml"), "backlog"])
+        self.assertEqual(command_args("theme", 0, fpath)[:2], ["theme", "add"])
+        self.assertEqual(command_args("theme", 1, fpath)[:2], ["theme", "rm"])
+        with self.assertRaises(ValueError):
+            command_args("unknown", 0, fpath)
+
+    def test_run_latency(self):
+        from jicagile.latency import run_latency
+        results = run_latency([40], self.tmp_dir, runs=2,
+                              commands=["list", "mv"], git_modes=(False,),
+                              out=StringIO())
+        self.assertEqual([r["name"] for r in results], ["agl list", "agl mv"])
+        for result in results:
+            self.assertTrue(result["p50"] <= result["p95"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Concurrent loading unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+CUR_DIR = os.getcwd()
+
+
+def get_asyncio(test):
+    try:
+        import asyncio
+    except ImportError:
+        test.skipTest("asyncio is not available")
+    return asyncio
+
+
+class LoadingUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        import jicagile
+        from jicagile.storage import storage_for
+        self.project = jicagile.Project(".", storage=storage_for("."))
+        for i in range(20):
+            self.project.add_task("Task {}".format(i), 1 + i % 3)
+        self.project.add_task("Current task", 3, current=True)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_from_directory(self):
+        import jicagile
+        import jicagile.metrics
+        sequential = jicagile.TaskCollection.from_directory("backlog")
+        jicagile.metrics.reset()
+        concurrent = jicagile.TaskCollection.from_directory("backlog", max_workers=4)
+        self.assertEqual(concurrent, sequential)
+        self.assertTrue(isinstance(concurrent, jicagile.TaskCollection))
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 20)
+
+    def test_load_directories(self):
+        import jicagile
+        from jicagile.loading import load_directories
+        from jicagile.storage import MemoryStorage
+        backlog, todo = load_directories(self.project.storage,
+                                         ["backlog", "current/todo"])
+        self.assertEqual(backlog, self.project.tasks("backlog"))
+        self.assertEqual(todo, self.project.tasks("current/todo"))
+
+        storage = MemoryStorage()
+        project = jicagile.Project(".", storage=storage)
+        task, fpath = project.add_task("Basic task", 1)
+        self.assertEqual(load_directories(storage, ["backlog"]), [[task]])
+
+    def test_afrom_directory(self):
+        asyncio = get_asyncio(self)
+        import jicagile
+        loop = asyncio.new_event_loop()
+        try:
+            tasks = loop.run_until_complete(
+                jicagile.TaskCollection.afrom_directory("backlog", loop=loop))
+        finally:
+            loop.close()
+        self.assertEqual(tasks, self.project.tasks("backlog"))
+
+    def test_aopen(self):
+        asyncio = get_asyncio(self)
+        import jicagile
+        loop = asyncio.new_event_loop()
+        try:
+            project = loop.run_until_complete(jicagile.Project.aopen(".", loop=loop))
+            tasks = loop.run_until_complete(
+                project.atasks(project.current_todo_directory, loop=loop))
+        finally:
+            loop.close()
+        self.assertEqual(tasks, self.project.tasks("current/todo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
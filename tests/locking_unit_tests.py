@@ -0,0 +1,153 @@
+"""Locking module unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+import multiprocessing
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+def _increment_storypoints(times):
+    import jicagile
+    project = jicagile.Project(".")
+    fpath = os.path.join("backlog", "shared-task.yml")
+    for i in range(times):
+        with project.locks.writing(fpath):
+            task = project.storage.read_task(fpath)
+            project.update_task(fpath, storypoints=task["storypoints"] + 1)
+
+
+def _add_team_member(lookup):
+    from jicagile.cli import CLI
+    with mock.patch("jicagile.cli.CLI.is_git_repo",
+                    new_callable=mock.PropertyMock) as patch_is_git_repo:
+        patch_is_git_repo.return_value = False
+        cli = CLI()
+        cli.run(cli.parse_args(["teammember", "add", lookup, "First", "Last"]))
+
+
+class LockingUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_atomic_write(self):
+        from jicagile.locking import atomic_write
+        atomic_write("test.yml", "---\nfirst: 1\n")
+        os.chmod("test.yml", 0o640)
+        atomic_write("test.yml", "---\nsecond: 2\n")
+        with open("test.yml") as fh:
+            self.assertEqual(fh.read(), "---\nsecond: 2\n")
+        self.assertEqual(os.stat("test.yml").st_mode & 0o777, 0o640)
+
+        with mock.patch("os.rename", side_effect=OSError("Disk on fire")):
+            with self.assertRaises(OSError):
+                atomic_write("test.yml", "---\nthird: 3\n")
+        with open("test.yml") as fh:
+            self.assertEqual(fh.read(), "---\nsecond: 2\n")
+        self.assertEqual(os.listdir("."), ["test.yml"])
+
+    def test_readers_do_not_block_each_other(self):
+        import fcntl
+        import jicagile
+        project = jicagile.Project(".")
+        lock_fpath = os.path.join(".agl", "locks", "project.lock")
+
+        def try_lock(operation):
+            with open(lock_fpath, "a") as fh:
+                try:
+                    fcntl.flock(fh.fileno(), operation | fcntl.LOCK_NB)
+                except IOError:
+                    return False
+                return True
+
+        with project.locks.reading():
+            self.assertTrue(try_lock(fcntl.LOCK_SH))
+            self.assertFalse(try_lock(fcntl.LOCK_EX))
+        with project.locks.writing(os.path.join("backlog", "a.yml")):
+            self.assertTrue(try_lock(fcntl.LOCK_SH))
+        with project.locks.exclusive():
+            self.assertFalse(try_lock(fcntl.LOCK_SH))
+            # Reentrant within the process.
+            with project.locks.reading():
+                project.add_task("Basic task", 3)
+            self.assertFalse(try_lock(fcntl.LOCK_SH))
+        self.assertTrue(try_lock(fcntl.LOCK_EX))
+
+    def test_unwritable_locks_directory(self):
+        import errno
+        import jicagile
+        project = jicagile.Project(".")
+        project.add_task("Basic task", 3)
+        locks_directory = os.path.join(".agl", "locks")
+        shutil.rmtree(locks_directory)
+        os.mkdir(locks_directory, 0o555)
+
+        # Permissions are not enforced for root, so refuse as they would be.
+        real_open = os.open
+        def open_lock(fpath, *args):
+            if os.path.dirname(os.path.normpath(fpath)) == locks_directory:
+                raise OSError(errno.EACCES, "Permission denied", fpath)
+            return real_open(fpath, *args)
+
+        project = jicagile.Project(".")
+        with mock.patch("os.open", side_effect=open_lock):
+            self.assertEqual([t["title"] for t in project.tasks(project.backlog_directory)],
+                             ["Basic task"])
+            with self.assertRaises(OSError):
+                project.add_task("Other task", 1)
+        self.assertEqual(os.listdir(locks_directory), [])
+
+    def test_state_directory_is_ignored(self):
+        import jicagile
+        from jicagile.locking import make_state_directory
+        project = jicagile.Project(".")
+        project.add_task("Basic task", 3)
+        with open(os.path.join(".agl", ".gitignore")) as fh:
+            self.assertEqual(fh.read(), "*\n")
+
+        # An existing state directory is left as it is.
+        os.unlink(os.path.join(".agl", ".gitignore"))
+        self.assertEqual(make_state_directory("."), os.path.join(".", ".agl"))
+        self.assertFalse(os.path.exists(os.path.join(".agl", ".gitignore")))
+
+    def test_memory_storage_is_not_locked(self):
+        import jicagile
+        from jicagile.storage import MemoryStorage
+        project = jicagile.Project(".", storage=MemoryStorage())
+        with project.locks.exclusive():
+            project.add_task("Basic task", 3)
+        self.assertFalse(os.path.isdir(".agl"))
+
+    def test_concurrent_processes(self):
+        import jicagile
+        project = jicagile.Project(".")
+        project.add_task("Shared task", 0)
+
+        processes = [multiprocessing.Process(target=_increment_storypoints,
+                                             args=(10,))
+                     for i in range(4)]
+        processes.extend(multiprocessing.Process(target=_add_team_member,
+                                                 args=("m{}".format(i),))
+                         for i in range(4))
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        task = jicagile.Task.from_file(os.path.join("backlog", "shared-task.yml"))
+        self.assertEqual(task["storypoints"], 40)
+        project.reload_config()
+        self.assertEqual(sorted(project.team.lookups), ["m0", "m1", "m2", "m3"])
+        self.assertEqual(os.listdir("backlog"), ["shared-task.yml"])
@@ -0,0 +1,94 @@
+"""Multiple project aggregation unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+CUR_DIR = os.getcwd()
+
+
+class MultiUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        import jicagile
+        from jicagile.storage import storage_for
+        os.mkdir("alpha")
+        os.mkdir("beta")
+        alpha = jicagile.Project("alpha", storage=storage_for("alpha"))
+        team = alpha.storage.read_team()
+        team.add_member("TO", "Tjelvar", "Olsson")
+        alpha.storage.write_team(team)
+        os.symlink(os.path.join("..", "alpha", ".team.yml"),
+                   os.path.join("beta", ".team.yml"))
+        beta = jicagile.Project("beta", storage=storage_for("beta"))
+        alpha.add_task("Alpha task", 3, primary_contact="TO")
+        alpha.add_task("Alpha now", 5, current=True)
+        beta.add_task("Beta task", 8, primary_contact="TO", current=True)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_project_roots(self):
+        from jicagile.multi import project_roots, project_labels
+        with open("projects.txt", "w") as fh:
+            fh.write("alpha\n# A comment\n\nbeta\n")
+        self.assertEqual(project_roots(["projects.txt"]), ["alpha", "beta"])
+        self.assertEqual(project_roots(["alpha", "beta"]), ["alpha", "beta"])
+        self.assertEqual(project_labels(["alpha", "x/alpha", "beta"]),
+                         ["alpha", "x/alpha", "beta"])
+        self.assertEqual(project_labels(["./alpha/", "beta"]), ["alpha", "beta"])
+
+    def test_shared_team_is_read_once(self):
+        import jicagile.metrics
+        from jicagile.multi import open_projects
+        jicagile.metrics.reset()
+        alpha, beta = open_projects(["alpha", "beta"])
+        # One team file and no themes files.
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 1)
+        self.assertTrue(alpha.team is beta.team)
+
+    def test_missing_root(self):
+        from jicagile.multi import open_projects
+        from jicagile.cli import CLI
+        from cli_unit_tests import capture_sys_output
+        with self.assertRaises(IOError):
+            open_projects(["alpha", "nonexistent"])
+        self.assertFalse(os.path.exists("nonexistent"))
+
+        cli = CLI()
+        with capture_sys_output() as (stdout, stderr):
+            cli.run(cli.parse_args(["multi", "stats", "--projects", "alpha", "nonexistent"]))
+        self.assertEqual(stdout.getvalue(), "No such project directory: nonexistent\n")
+        self.assertFalse(os.path.exists("nonexistent"))
+
+    def test_load_and_stats(self):
+        from jicagile.multi import (open_projects, load_projects,
+                                    labelled_tasks, stats)
+        projects = open_projects(["alpha", "beta"])
+        loaded = load_projects(projects)
+        self.assertEqual(list(loaded[0].keys()), ["backlog", "todo", "done"])
+        self.assertEqual(loaded[0]["todo"].storypoints, 5)
+        self.assertEqual(loaded[1]["todo"].storypoints, 8)
+
+        todo = labelled_tasks(["alpha", "beta"], loaded, "todo")
+        self.assertEqual(sorted(t["project"] for t in todo), ["alpha", "beta"])
+        self.assertFalse("project" in loaded[0]["todo"][0])
+
+        data = stats(["alpha", "beta"], loaded)
+        self.assertEqual(data["projects"]["beta"]["todo"],
+                         dict(tasks=1, storypoints=8))
+        self.assertEqual(list(data["contacts"].keys()), [None, "TO"])
+        self.assertEqual(data["contacts"]["TO"],
+                         dict(backlog=3, todo=8, done=0))
+
+        loaded = load_projects(projects, ["done"])
+        self.assertEqual(list(loaded[1].keys()), ["done"])
+
+
+if __name__ == "__main__":
+    unittest.main()
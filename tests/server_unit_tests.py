@@ -0,0 +1,99 @@
+"""JSON API server unit tests."""
+
+import unittest
+import os
+import os.path
+import json
+import tempfile
+import shutil
+import threading
+
+CUR_DIR = os.getcwd()
+
+
+class ProjectAPIUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_documents(self):
+        import jicagile
+        from jicagile.storage import storage_for
+        from jicagile.server import ProjectAPI
+        project = jicagile.Project(".", storage=storage_for("."))
+        project.add_task("Basic task", 1)
+        project.add_task("Current task", 3, current=True)
+        os.makedirs("past_sprints/2016-01-04")
+        project.storage.write_task(jicagile.Task("Old task", 5),
+                                   "past_sprints/2016-01-04/old-task.yml")
+        api = ProjectAPI(project)
+
+        tasks = api.document("/tasks")
+        self.assertEqual(list(tasks.keys()), ["backlog", "todo", "done"])
+        self.assertEqual(tasks["backlog"][0]["fpath"], "backlog/basic-task.yml")
+        self.assertEqual(tasks["backlog"][0]["title"], "Basic task")
+        self.assertEqual(api.document("/tasks/todo")[0]["storypoints"], 3)
+        self.assertEqual(api.document("/stats")["todo"],
+                         dict(tasks=1, storypoints=3))
+        self.assertEqual(api.document("/history"),
+                         [dict(sprint="2016-01-04", tasks=1, storypoints=5)])
+        self.assertEqual(api.document("/team"), [])
+        self.assertEqual(api.document("/nothing"), None)
+
+    def test_fingerprint(self):
+        import jicagile
+        from jicagile.storage import storage_for
+        from jicagile.server import ProjectAPI
+        project = jicagile.Project(".", storage=storage_for("."))
+        project.add_task("Basic task", 1)
+        api = ProjectAPI(project)
+        etag, body = api.get("/tasks")
+        self.assertEqual(api.get("/tasks"), (etag, body))
+
+        project.edit_task("backlog/basic-task.yml", storypoints=3)
+        new_etag, body = api.get("/tasks")
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(json.loads(body.decode("utf-8"))["backlog"][0]["storypoints"], 3)
+
+        # Same content, same fingerprint.
+        project.edit_task("backlog/basic-task.yml", storypoints=1)
+        self.assertEqual(api.get("/tasks")[0], etag)
+
+    def test_http(self):
+        import jicagile
+        from jicagile.storage import storage_for
+        from jicagile.server import make_server
+        try:
+            from urllib2 import urlopen, Request, HTTPError
+        except ImportError:
+            from urllib.request import urlopen, Request
+            from urllib.error import HTTPError
+        project = jicagile.Project(".", storage=storage_for("."))
+        project.add_task("Basic task", 1)
+        server = make_server(project, 0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = "http://127.0.0.1:{}/stats".format(server.server_address[1])
+        try:
+            response = urlopen(url)
+            etag = response.headers["ETag"]
+            self.assertEqual(json.loads(response.read().decode("utf-8"))["backlog"]["tasks"], 1)
+            with self.assertRaises(HTTPError) as cm:
+                urlopen(Request(url, headers={"If-None-Match": etag}))
+            self.assertEqual(cm.exception.code, 304)
+            with self.assertRaises(HTTPError) as cm:
+                urlopen(url + "/nothing")
+            self.assertEqual(cm.exception.code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""Local telemetry unit tests."""
+
+import unittest
+import os
+import os.path
+import json
+import tempfile
+import shutil
+from contextlib import contextmanager
+from StringIO import StringIO
+import sys
+
+import mock
+
+CUR_DIR = os.getcwd()
+
+
+@contextmanager
+def capture_sys_output():
+    capture_out, capture_err = StringIO(), StringIO()
+    current_out, current_err = sys.stdout, sys.stderr
+    try:
+        sys.stdout, sys.stderr = capture_out, capture_err
+        yield capture_out, capture_err
+    finally:
+        sys.stdout, sys.stderr = current_out, current_err
+
+
+class TelemetryUnitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_enable_and_disable(self):
+        from jicagile import telemetry
+        with mock.patch.dict("os.environ", {}):
+            os.environ.pop("AGL_TELEMETRY", None)
+            self.assertFalse(telemetry.is_enabled(self.tmp_dir))
+            telemetry.enable(self.tmp_dir)
+            self.assertTrue(telemetry.is_enabled(self.tmp_dir))
+            os.environ["AGL_TELEMETRY"] = "0"
+            self.assertFalse(telemetry.is_enabled(self.tmp_dir))
+            del os.environ["AGL_TELEMETRY"]
+            telemetry.disable(self.tmp_dir)
+            self.assertFalse(telemetry.is_enabled(self.tmp_dir))
+            os.environ["AGL_TELEMETRY"] = "1"
+            self.assertTrue(telemetry.is_enabled(self.tmp_dir))
+
+    def test_argument_shape(self):
+        import argparse
+        from jicagile import telemetry
+        args = argparse.Namespace(command="add", title="Secret title",
+                                  storypoints=3, current=True,
+                                  primary_contact=None, theme=None,
+                                  profile=False, profile_output=None)
+        self.assertEqual(telemetry.command_name(args), "add")
+        self.assertEqual(dict(telemetry.argument_shape(args)),
+                         {"title": "str", "storypoints": "int", "current": "flag"})
+
+        args = argparse.Namespace(command="theme", subcommand="add")
+        self.assertEqual(telemetry.command_name(args), "theme add")
+
+    def test_record_and_read(self):
+        from jicagile import telemetry
+        telemetry.record(self.tmp_dir, {"command": "list", "seconds": 0.1})
+        telemetry.record(self.tmp_dir, {"command": "add", "seconds": 0.2})
+        with open(telemetry.log_fpath(self.tmp_dir), "a") as fh:
+            fh.write("{truncated\n")
+        records = list(telemetry.read_records(self.tmp_dir))
+        self.assertEqual([r["command"] for r in records], ["list", "add"])
+
+    def test_summarise(self):
+        from jicagile import telemetry
+        day = 24 * 60 * 60
+        records = [dict(command="list", timestamp=day * 10 + i, seconds=0.1 * i,
+                        project_size=100) for i in range(1, 11)]
+        records.append(dict(command="list", timestamp=day * 40, seconds=1.0,
+                            project_size=1000))
+        records.append(dict(command="add", timestamp=day * 10, seconds=0.2,
+                            project_size=100))
+        summaries = telemetry.summarise(records, period="month")
+        self.assertEqual([(s["command"], s["count"]) for s in summaries],
+                         [("add", 1), ("list", 10), ("list", 1)])
+        self.assertAlmostEqual(summaries[1]["p50"], 0.5)
+        self.assertAlmostEqual(summaries[1]["p95"], 1.0)
+        self.assertEqual(summaries[2]["project_size"], 1000)
+
+
+class TelemetryCLITests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        if not os.path.isdir(self.tmp_dir):
+            os.mkdir(self.tmp_dir)
+        os.chdir(self.tmp_dir)
+
+    def tearDown(self):
+        from jicagile.profiling import tracer
+        tracer.disable()
+        tracer.reset()
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_invocations_are_logged(self):
+        from jicagile import telemetry
+        from jicagile.cli import main
+        with mock.patch.dict("os.environ", {}):
+            os.environ.pop("AGL_TELEMETRY", None)
+            os.environ.pop("AGL_TRACE", None)
+            with mock.patch("sys.argv", ["agl", "perf", "enable"]):
+                main()
+            with mock.patch("sys.argv", ["agl", "add", "Secret task", "3"]):
+                main()
+            with mock.patch("sys.argv", ["agl", "list", "backlog"]):
+                with capture_sys_output() as (stdout, stderr):
+                    main()
+            self.assertEqual(stderr.getvalue(), "")
+
+            records = list(telemetry.read_records("."))
+            self.assertEqual([r["command"] for r in records], ["add", "list"])
+            self.assertEqual(records[0]["arguments"]["title"], "str")
+            self.assertFalse("Secret" in json.dumps(records))
+            self.assertEqual(records[1]["project_size"], 1)
+            self.assertTrue("cli.list" in records[1]["phases"])
+
+            with mock.patch("sys.argv", ["agl", "perf", "report", "--json"]):
+                with capture_sys_output() as (stdout, stderr):
+                    main()
+            summaries = json.loads(stdout.getvalue())
+            self.assertEqual([s["command"] for s in summaries], ["add", "list"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Filesystem watcher unit tests."""
+
+import unittest
+import os
+import os.path
+import tempfile
+import shutil
+
+CUR_DIR = os.getcwd()
+
+
+def write(fpath, text):
+    with open(fpath, "w") as fh:
+        fh.write(text)
+
+
+class WatcherTests(object):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.chdir(self.tmp_dir)
+        for directory in ["backlog", "current", "current/todo", "current/done"]:
+            os.mkdir(directory)
+        self.directories = ["backlog", "current/todo", "current/done"]
+
+    def tearDown(self):
+        self.watcher.close()
+        os.chdir(CUR_DIR)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_events(self):
+        from jicagile.watch import Event
+        self.watcher = self.watcher_class(self.directories)
+        self.assertEqual(self.watcher.poll(0), [])
+        self.assertTrue(self.watcher.is_watching("./backlog"))
+
+        write("backlog/task.yml", "title: Task\n")
+        write("backlog/notes.txt", "Not a task\n")
+        self.assertEqual(self.watcher.poll(1), [self.added("backlog/task.yml")])
+
+        write("backlog/task.yml", "title: Longer task\n")
+        self.assertEqual(self.watcher.poll(1),
+                         [Event("modified", "backlog/task.yml", None)])
+
+        os.rename("backlog/task.yml", "current/todo/task.yml")
+        self.assertEqual(self.watcher.poll(1),
+                         [Event("moved", "backlog/task.yml", "current/todo/task.yml")])
+
+        os.unlink("current/todo/task.yml")
+        self.assertEqual(self.watcher.poll(1),
+                         [Event("deleted", "current/todo/task.yml", None)])
+        self.assertEqual(self.watcher.poll(0), [])
+
+    def test_indexed_storage(self):
+        import jicagile
+        import jicagile.metrics
+        from jicagile.index import IndexedStorage
+        from jicagile.storage import storage_for
+        storage = IndexedStorage(storage_for("."))
+        self.watcher = self.watcher_class(self.directories)
+        storage.watch(self.watcher)
+        project = jicagile.Project(".", storage=storage)
+        task, fpath = project.add_task("Basic task", 1, current=True)
+        self.assertEqual(project.tasks("current/todo"), [task])
+        self.assertEqual(project.tasks("current/done"), [])
+
+        jicagile.metrics.reset()
+        os.rename(fpath, "current/done/basic-task.yml")
+        self.assertEqual(project.tasks("current/todo"), [])
+        self.assertEqual(project.tasks("current/done"), [task])
+        self.assertEqual(jicagile.metrics.snapshot()["files_parsed"], 0)
+
+        project.edit_task("current/done/basic-task.yml", storypoints=3)
+        self.assertEqual(project.tasks("current/done").storypoints, 3)
+
+        # A directory moved away and recreated is read again.
+        os.rename("current/done", "current/old")
+        os.mkdir("current/done")
+        self.assertEqual(project.tasks("current/done"), [])
+
+
+class PollWatcherUnitTests(WatcherTests, unittest.TestCase):
+
+    def setUp(self):
+        from jicagile.watch import PollWatcher
+        WatcherTests.setUp(self)
+        self.watcher_class = lambda directories: PollWatcher(directories, 0.01)
+
+    def added(self, fpath):
+        from jicagile.watch import Event
+        return Event("added", fpath, None)
+
+
+class InotifyWatcherUnitTests(WatcherTests, unittest.TestCase):
+
+    def setUp(self):
+        from jicagile.watch import InotifyWatcher, inotify_available
+        if not inotify_available():
+            self.skipTest("inotify is not available")
+        WatcherTests.setUp(self)
+        self.watcher_class = InotifyWatcher
+
+    def added(self, fpath):
+        # Files written to are reported when they are closed.
+        from jicagile.watch import Event
+        return Event("modified", fpath, None)
+
+
+if __name__ == "__main__":
+    unittest.main()